@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark riproducibile di 'sudoku.solve' su Data/Sudoku.json, con risultati raggruppati per difficoltà.
+
+   Per ogni livello di difficoltà vengono riportati:
+      - percentili della latenza (p50, p95, p99) in millisecondi;
+      - sudoku risolti al secondo;
+      - picco di memoria allocata durante la risoluzione (tracemalloc);
+      - numero di sudoku che hanno avuto bisogno della ricerca (backtracking);
+      - numero di soluzioni diverse da 'schema_risolto'.
+   I risultati possono essere salvati su file e confrontati con una baseline: se un livello diventa più lento
+   della soglia indicata il programma termina con codice di uscita 1.
+
+   Esempio:
+      python benchmark.py --output risultati.json --baseline Data/benchmark_baseline.json
+      python benchmark.py --scala       # tempi di risoluzione su schemi 9x9, 16x16 e 25x25
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+
+from sudoku import TECNICHE_DIFFICOLTA, livello_stimato, sudoku
+#---------------------------------------------------------------------------------#
+# MISURAZIONE
+#---------------------------------------------------------------------------------#
+# region MISURAZIONE
+def __confronta_soluzione__(S : sudoku,
+                            record : dict) -> str:
+   """Confronta la soluzione trovata con 'schema_risolto'.
+      Output:
+         - "corretto" se coincidono;
+         - "riferimento non valido" se non coincidono ma 'schema_risolto' contiene errori e la soluzione trovata è valida;
+         - "errato" altrimenti.
+   """
+   riferimento = np.array(record["schema_risolto"])
+   if S.solved and (S.sudoku == riferimento).all():
+      return "corretto"
+   if S.solved and not S.check(riferimento):
+      return "riferimento non valido"
+   return "errato"
+
+def misura(records : list,
+           engine : str = "tecniche",
+           ripetizioni : int = 3) -> dict:
+   """Esegue il benchmark sui record forniti.
+      Input:
+         - records (list) record nel formato di Data/Sudoku.json;
+         - engine (str, default "tecniche") engine passato a 'sudoku.solve';
+         - ripetizioni (int, default 3) risoluzioni per sudoku, viene tenuto il tempo mediano.
+      Output:
+         - dizionario {difficoltà: statistiche} più la chiave "totale" con le statistiche complessive.
+   """
+   tempi = defaultdict(list)
+   ricerca = defaultdict(int)
+   esiti = defaultdict(lambda: defaultdict(int))
+   memoria = defaultdict(int)
+
+   # Riscaldamento, per non misurare il costo degli import e delle prime allocazioni
+   sudoku(records[0]["schema_iniziale"]).solve(engine=engine)
+
+   for record in records:
+      livello = str(record["difficoltà"])
+
+      # Tempo: mediana su più ripetizioni
+      misure = []
+      for _ in range(ripetizioni):
+         S = sudoku(record["schema_iniziale"])
+         inizio = time.perf_counter()
+         S.solve(engine=engine)
+         misure.append(time.perf_counter() - inizio)
+      tempi[livello].append(float(np.median(misure)))
+
+      ricerca[livello] += S.statistiche_ricerca["attivazioni"] > 0
+      esiti[livello][__confronta_soluzione__(S, record)] += 1
+
+      # Memoria: misurata in una risoluzione separata, tracemalloc rallenta l'esecuzione
+      tracemalloc.start()
+      sudoku(record["schema_iniziale"]).solve(engine=engine)
+      memoria[livello] = max(memoria[livello], tracemalloc.get_traced_memory()[1])
+      tracemalloc.stop()
+
+   risultati = {}
+   for livello in sorted(tempi) + ["totale"]:
+      if livello == "totale":
+         t = [x for l in tempi for x in tempi[l]]
+         n_ricerca = sum(ricerca.values())
+         esiti_livello = defaultdict(int)
+         for l in esiti:
+            for esito, n in esiti[l].items():
+               esiti_livello[esito] += n
+         picco = max(memoria.values())
+      else:
+         t, n_ricerca, esiti_livello, picco = tempi[livello], ricerca[livello], esiti[livello], memoria[livello]
+
+      t_ms = np.array(t) * 1000
+      risultati[livello] = {"sudoku": len(t),
+                            "p50_ms": round(float(np.percentile(t_ms, 50)), 4),
+                            "p95_ms": round(float(np.percentile(t_ms, 95)), 4),
+                            "p99_ms": round(float(np.percentile(t_ms, 99)), 4),
+                            "sudoku_al_secondo": round(len(t) / sum(t), 2),
+                            "picco_memoria_kb": round(picco / 1024, 1),
+                            "ricerca": n_ricerca,
+                            "corretti": esiti_livello.get("corretto", 0),
+                            "riferimento_non_valido": esiti_livello.get("riferimento non valido", 0),
+                            "errati": esiti_livello.get("errato", 0)}
+   return risultati
+# endregion
+#---------------------------------------------------------------------------------#
+# CONFRONTO CON LA BASELINE
+#---------------------------------------------------------------------------------#
+# region BASELINE
+def confronta(risultati : dict,
+              baseline : dict,
+              soglia : float = 2.0,
+              minimo_ms : float = 0.5) -> list:
+   """Confronta i risultati con una baseline.
+      Input:
+         - risultati (dict) output di 'misura';
+         - baseline (dict) output di 'misura' salvato in precedenza;
+         - soglia (float, default 2.0) rapporto massimo ammesso tra p50/p95 attuali e della baseline;
+         - minimo_ms (float, default 0.5) differenze assolute sotto questo valore vengono ignorate (rumore di misura).
+      Output:
+         - lista di messaggi, vuota se non ci sono regressioni.
+   """
+   regressioni = []
+   for livello, statistiche in risultati.items():
+      if livello not in baseline:
+         continue
+      for chiave in ("p50_ms", "p95_ms"):
+         attuale, riferimento = statistiche[chiave], baseline[livello][chiave]
+         if attuale > riferimento * soglia and attuale - riferimento > minimo_ms:
+            regressioni.append(f"Difficoltà {livello}: {chiave} {attuale:.3f} ms contro {riferimento:.3f} ms della baseline ({attuale/riferimento:.1f}x)")
+      if statistiche["errati"] > baseline[livello].get("errati", 0):
+         regressioni.append(f"Difficoltà {livello}: {statistiche['errati']} soluzioni errate (baseline {baseline[livello].get('errati', 0)})")
+   return regressioni
+
+def mostra(risultati : dict):
+   """Stampa a schermo la tabella dei risultati."""
+   print(f"{'Livello':>8} {'N':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sudoku/s':>9} {'mem KB':>8} {'ricerca':>8} {'corretti':>9} {'rif. err.':>9} {'errati':>7}")
+   for livello, s in risultati.items():
+      print(f"{livello:>8} {s['sudoku']:>4} {s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} {s['p99_ms']:>9.3f} {s['sudoku_al_secondo']:>9.1f} "
+            f"{s['picco_memoria_kb']:>8.1f} {s['ricerca']:>8} {s['corretti']:>9} {s['riferimento_non_valido']:>9} {s['errati']:>7}")
+# endregion
+
+#---------------------------------------------------------------------------------#
+# CALIBRAZIONE DELLA DIFFICOLTÀ
+#---------------------------------------------------------------------------------#
+# region CALIBRAZIONE
+def __ranghi__(valori : np.ndarray) -> np.ndarray:
+   """Ranghi dei valori, con rango medio per i valori uguali (per la correlazione di Spearman)."""
+   valori = np.asarray(valori, dtype=float)
+   ordine = np.argsort(valori, kind="stable")
+   ranghi = np.empty(len(valori))
+   ranghi[ordine] = np.arange(len(valori))
+   for valore in np.unique(valori):
+      uguali = valori == valore
+      ranghi[uguali] = ranghi[uguali].mean()
+   return ranghi
+
+def calibrazione(records : list) -> dict:
+   """Confronta 'sudoku.rate' con le difficoltà assegnate a mano ('difficoltà' dei record).
+      Output:
+         - dizionario con:
+            - "livelli": {difficoltà: {"sudoku", "tecniche" (conteggio della tecnica più difficile), "punteggio_min",
+              "punteggio_mediano", "punteggio_max", "ms_medi"}};
+            - "spearman": correlazione di Spearman tra punteggio e difficoltà;
+            - "confusione": {difficoltà: {livello stimato: numero di sudoku}} (vedi 'livello_stimato');
+            - "esatti", "entro_uno": frazione di sudoku con livello stimato uguale o distante al massimo 1.
+   """
+   etichette, punteggi, livelli = [], [], defaultdict(lambda: {"tecniche": defaultdict(int), "punteggi": [], "tempi": []})
+   confusione = defaultdict(lambda: defaultdict(int))
+   for record in records:
+      inizio = time.perf_counter()
+      valutazione = sudoku(record["schema_iniziale"]).rate()
+      durata = time.perf_counter() - inizio
+
+      etichetta = record["difficoltà"]
+      livello = livelli[etichetta]
+      livello["tecniche"][valutazione["tecnica"]] += 1
+      livello["punteggi"].append(valutazione["punteggio"])
+      livello["tempi"].append(durata)
+      confusione[etichetta][livello_stimato(valutazione)] += 1
+      etichette.append(etichetta)
+      punteggi.append(valutazione["punteggio"])
+
+   esatti = sum(confusione[e][e] for e in confusione)
+   entro_uno = sum(n for e in confusione for l, n in confusione[e].items() if abs(e - l) <= 1)
+   return {"livelli": {str(e): {"sudoku": len(livelli[e]["punteggi"]),
+                                "tecniche": dict(livelli[e]["tecniche"]),
+                                "punteggio_min": min(livelli[e]["punteggi"]),
+                                "punteggio_mediano": float(np.median(livelli[e]["punteggi"])),
+                                "punteggio_max": max(livelli[e]["punteggi"]),
+                                "ms_medi": round(1000 * float(np.mean(livelli[e]["tempi"])), 3)}
+                       for e in sorted(livelli)},
+           "spearman": round(float(np.corrcoef(__ranghi__(punteggi), __ranghi__(etichette))[0,1]), 3),
+           "confusione": {str(e): {str(l): confusione[e][l] for l in sorted(confusione[e])} for e in sorted(confusione)},
+           "esatti": round(esatti / len(records), 3),
+           "entro_uno": round(entro_uno / len(records), 3)}
+
+def mostra_calibrazione(risultati : dict):
+   """Stampa a schermo il report di calibrazione."""
+   print(f"{'Difficoltà':>10} {'N':>4} {'punteggio min/mediano/max':>26} {'ms':>7}  tecnica più difficile")
+   for etichetta, s in risultati["livelli"].items():
+      tecniche = ", ".join(f"{t} {n}" for t, n in sorted(s["tecniche"].items(), key=lambda x: TECNICHE_DIFFICOLTA[x[0]]))
+      punteggi = f"{s['punteggio_min']:.2f} / {s['punteggio_mediano']:.2f} / {s['punteggio_max']:.2f}"
+      print(f"{etichetta:>10} {s['sudoku']:>4} {punteggi:>26} {s['ms_medi']:>7.2f}  {tecniche}")
+   print(f"\nCorrelazione di Spearman punteggio - difficoltà: {risultati['spearman']:.3f}")
+   print("\nLivello stimato (colonne) per difficoltà assegnata (righe):")
+   print(f"{'':>10}" + "".join(f"{l:>5}" for l in range(1,6)))
+   for etichetta, riga in risultati["confusione"].items():
+      print(f"{etichetta:>10}" + "".join(f"{riga.get(str(l), 0):>5}" for l in range(1,6)))
+   print(f"\nLivello esatto: {100*risultati['esatti']:.1f}%, entro un livello: {100*risultati['entro_uno']:.1f}%")
+# endregion
+#---------------------------------------------------------------------------------#
+# SCALA: DAL 9x9 AL 25x25
+#---------------------------------------------------------------------------------#
+# region SCALA
+def __schema_casuale__(box : int,
+                       frazione_vuote : float,
+                       rng : np.random.Generator) -> np.ndarray:
+   """Schema (box^2)x(box^2) casuale con soluzione: schema completo a schema fisso, rimescolato con rinumerazione e permutazioni
+      di righe e colonne che mantengono le fasce, poi svuotato di 'frazione_vuote' delle celle (la soluzione può non essere unica).
+   """
+   n = box*box
+   righe, colonne = np.indices((n,n))
+   griglia = ((righe % box)*box + righe // box + colonne) % n + 1
+   permutazione = lambda: np.concatenate([box*fascia + rng.permutation(box) for fascia in rng.permutation(box)])
+   griglia = np.concatenate([[0], rng.permutation(n) + 1])[griglia][np.ix_(permutazione(), permutazione())]
+   griglia.flat[rng.choice(n*n, int(n*n*frazione_vuote), replace=False)] = 0
+   return griglia
+
+def scala(dimensioni : list = (3, 4, 5),
+          sudoku_per_dimensione : int = 10,
+          frazione_vuote : float = 0.45,
+          seme : int = 0) -> dict:
+   """Misura come cresce il tempo di 'sudoku.solve' passando dal 9x9 al 16x16 e al 25x25, su schemi casuali riproducibili.
+      Output:
+         - {box: {"lato", "sudoku", "risolti", "ms_p50", "ms_p95", "ms_max", "nodi_mediani"}}.
+   """
+   rng = np.random.default_rng(seme)
+   risultati = {}
+   for box in dimensioni:
+      tempi, nodi, risolti = [], [], 0
+      for _ in range(sudoku_per_dimensione):
+         S = sudoku(__schema_casuale__(box, frazione_vuote, rng), box=box)
+         inizio = time.perf_counter()
+         S.solve(engine="ricerca")
+         tempi.append(time.perf_counter() - inizio)
+         nodi.append(S.statistiche_ricerca["nodi"])
+         risolti += bool(S.solved)
+      ms = 1000*np.array(tempi)
+      risultati[str(box)] = {"lato": box*box,
+                             "sudoku": sudoku_per_dimensione,
+                             "risolti": risolti,
+                             "ms_p50": round(float(np.percentile(ms, 50)), 3),
+                             "ms_p95": round(float(np.percentile(ms, 95)), 3),
+                             "ms_max": round(float(ms.max()), 3),
+                             "nodi_mediani": float(np.median(nodi))}
+   return risultati
+
+def mostra_scala(risultati : dict):
+   """Stampa a schermo il benchmark di scala."""
+   print(f"{'Schema':>8} {'N':>4} {'risolti':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'nodi mediani':>13}")
+   for s in risultati.values():
+      schema = f"{s['lato']}x{s['lato']}"
+      print(f"{schema:>8} {s['sudoku']:>4} {s['risolti']:>8} {s['ms_p50']:>9.2f} {s['ms_p95']:>9.2f} {s['ms_max']:>9.2f} {s['nodi_mediani']:>13.0f}")
+# endregion
+if __name__ == "__main__":
+   import argparse
+
+   parser = argparse.ArgumentParser(description="Benchmark di sudoku.solve per livello di difficoltà.")
+   parser.add_argument("--corpus", default="Data/Sudoku.json", help="file json dei sudoku")
+   parser.add_argument("--engine", default="tecniche", choices=["tecniche","ricerca","dlx"])
+   parser.add_argument("--ripetizioni", type=int, default=3, help="risoluzioni per sudoku (tempo mediano)")
+   parser.add_argument("--output", default=None, help="file json in cui salvare i risultati")
+   parser.add_argument("--baseline", default=None, help="file json della baseline con cui confrontare i risultati")
+   parser.add_argument("--soglia", type=float, default=2.0, help="rallentamento massimo ammesso rispetto alla baseline")
+   parser.add_argument("--calibrazione", action="store_true",
+                       help="confrontare 'sudoku.rate' con le difficoltà del corpus invece di misurare i tempi")
+   parser.add_argument("--scala", action="store_true",
+                       help="misurare come cresce il tempo di risoluzione dal 9x9 al 25x25 su schemi casuali")
+   parser.add_argument("--vuote", type=float, default=0.45, help="frazione di celle vuote degli schemi di '--scala'")
+   args = parser.parse_args()
+
+   if args.scala:
+      risultati = scala(frazione_vuote=args.vuote)
+      mostra_scala(risultati)
+      if args.output:
+         with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(risultati, f, indent=2, ensure_ascii=False)
+      sys.exit(0)
+
+   with open(args.corpus, encoding="utf-8") as f:
+      records = json.load(f)
+
+   if args.calibrazione:
+      risultati = calibrazione(records)
+      mostra_calibrazione(risultati)
+      if args.output:
+         with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(risultati, f, indent=2, ensure_ascii=False)
+      sys.exit(0)
+
+   risultati = misura(records, engine=args.engine, ripetizioni=args.ripetizioni)
+   mostra(risultati)
+
+   if args.output:
+      with open(args.output, "w", encoding="utf-8") as f:
+         json.dump({"engine": args.engine, "risultati": risultati}, f, indent=2, ensure_ascii=False)
+
+   if args.baseline:
+      with open(args.baseline, encoding="utf-8") as f:
+         baseline = json.load(f)
+      if baseline.get("engine", args.engine) != args.engine:
+         print(f"Attenzione: la baseline è stata misurata con engine '{baseline['engine']}'")
+      regressioni = confronta(risultati, baseline["risultati"], soglia=args.soglia)
+      if regressioni:
+         print("\nREGRESSIONI RISPETTO ALLA BASELINE:")
+         for messaggio in regressioni:
+            print(f" - {messaggio}")
+         sys.exit(1)
+      print("\nNessuna regressione rispetto alla baseline.")
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Cache delle soluzioni basata sulla forma canonica dei sudoku.
+
+   Due sudoku sono equivalenti se uno si ottiene dall'altro tramite:
+      - rinumerazione dei numeri (es. tutti gli 1 diventano 7 e viceversa);
+      - scambio di righe all'interno di una fascia orizzontale di 3 righe, o scambio delle fasce;
+      - scambio di colonne all'interno di una fascia verticale di 3 colonne, o scambio delle fasce;
+      - trasposizione.
+   La forma canonica è un rappresentante invariante per simmetria: lo schema minimo (celle vuote considerate maggiori di
+   ogni numero, numeri rinumerati in ordine di apparizione) tra gli equivalenti che iniziano con una delle righe o colonne
+   più piene. Non è in generale il minimo lessicografico su tutti gli equivalenti, ma la scelta delle prime righe non
+   dipende dalla simmetria applicata, perciò sudoku equivalenti hanno la stessa forma canonica e la soluzione di uno può
+   essere riutilizzata per tutti gli altri tramite la trasformazione inversa.
+"""
+
+import itertools
+from collections import Counter, OrderedDict
+from typing import Union
+
+import numpy as np
+
+from sudoku import sudoku
+#---------------------------------------------------------------------------------#
+# FORMA CANONICA
+#---------------------------------------------------------------------------------#
+# region FORMA CANONICA
+def __permutazioni_colonne__() -> np.ndarray:
+   """Le 1296 permutazioni di colonna ammesse (6 ordini delle fasce x 6^3 ordini interni), formato (1296,9):
+      la colonna j dello schema trasformato è la colonna PERMUTAZIONI_COLONNE[p][j] dello schema originale.
+   """
+   permutazioni = []
+   for fasce in itertools.permutations(range(3)):
+      for interne in itertools.product(itertools.permutations(range(3)), repeat=3):
+         permutazioni.append([3*fascia + interna for fascia in fasce for interna in interne[fascia]])
+   return np.array(permutazioni, dtype=np.int8)
+
+PERMUTAZIONI_COLONNE = __permutazioni_colonne__()
+VUOTA = 10                                           # Valore delle celle vuote nei confronti lessicografici
+PESI = 11 ** np.arange(8, -1, -1, dtype=np.int64)    # Per trasformare una riga in un unico intero confrontabile
+
+def __rinumera_riga__(valori : np.ndarray,
+                      etichette : np.ndarray,
+                      prossima : np.ndarray) -> np.ndarray:
+   """Rinumera una riga per ogni candidato assegnando le nuove etichette in ordine di apparizione.
+      Input:
+         - valori (np.ndarray) righe (C,9) con i numeri originali;
+         - etichette (np.ndarray) (C,10) nuova etichetta di ogni numero originale (0 se non ancora assegnata), aggiornata sul posto;
+         - prossima (np.ndarray) (C,) prossima etichetta libera, aggiornata sul posto.
+      Output:
+         - righe rinumerate (C,9), con VUOTA nelle celle vuote.
+   """
+   indici = np.arange(valori.shape[0])
+   riga = np.empty(valori.shape, dtype=np.int64)
+   for j in range(9):
+      v = valori[:,j]
+      nuovi = (v > 0) & (etichette[indici, v] == 0)
+      etichette[indici[nuovi], v[nuovi]] = prossima[nuovi]
+      prossima[nuovi] += 1
+      riga[:,j] = np.where(v > 0, etichette[indici, v], VUOTA)
+   return riga
+
+SOGLIA_EQUIVALENTI = 1024 # Numero di candidati oltre il quale si cercano quelli equivalenti
+
+def __candidati_distinti__(versioni : np.ndarray,
+                           trasposto : np.ndarray,
+                           righe : np.ndarray,
+                           colonne : np.ndarray,
+                           etichette : np.ndarray,
+                           prossima : np.ndarray) -> np.ndarray:
+   """Indici di un rappresentante per ogni gruppo di candidati equivalenti.
+      Due candidati sono equivalenti se hanno le stesse righe già usate, la stessa fascia corrente e, dopo la loro
+      permutazione di colonna e rinumerazione, le righe ancora da scegliere identiche (i numeri non ancora rinumerati
+      vengono rinominati in ordine di apparizione). Qualsiasi scelta futura produce allora lo stesso schema.
+   """
+   n = len(trasposto)
+   indici = np.arange(n)
+   usate = np.zeros((n,9), dtype=bool)
+   usate[indici[:,None], righe] = True
+
+   # Righe rimaste, permutate e rinumerate
+   resto = np.take_along_axis(versioni[trasposto], np.broadcast_to(PERMUTAZIONI_COLONNE[colonne].astype(np.int64)[:,None,:], (n,9,9)), axis=2)
+   resto = resto.reshape(n,81)
+   etichette, prossima = etichette.copy(), prossima.copy()
+   rinumerato = np.empty((n,81), dtype=np.int64)
+   for j in range(81):
+      v = resto[:,j]
+      nuovi = (v > 0) & (etichette[indici, v] == 0)
+      etichette[indici[nuovi], v[nuovi]] = prossima[nuovi]
+      prossima[nuovi] += 1
+      rinumerato[:,j] = etichette[indici, v]
+   rinumerato[np.repeat(usate, 9, axis=1)] = VUOTA + 1
+
+   chiavi = np.concatenate([usate, (righe[:,-1] // 3)[:,None], rinumerato], axis=1)
+   return np.unique(chiavi, axis=0, return_index=True)[1]
+
+def canonical_form(schema : Union[list, np.ndarray]):
+   """Calcola la forma canonica di uno schema e la trasformazione che la produce.
+      La ricerca costruisce lo schema canonico una riga alla volta (branch and bound): al primo passo si provano le
+      combinazioni di trasposizione, prima riga e permutazione di colonna con le sole righe (o colonne) più piene come
+      prima riga, poi ad ogni riga si tengono solo i candidati che producono il prefisso minimo. Il risultato è quindi
+      invariante per le simmetrie ma non è necessariamente il minimo lessicografico tra tutti gli schemi equivalenti.
+      Input:
+         - schema ((list, np.ndarray)) schema 9x9, zeri per le celle vuote.
+      Output:
+         - forma (np.ndarray) schema canonico 9x9;
+         - trasformazione (dict) con chiavi "trasposto", "righe", "colonne", "etichette" (vedi 'applica_trasformazione').
+   """
+   griglia = np.asarray(schema, dtype=np.int64)
+   if griglia.shape != (9,9):
+      raise TypeError("La matrice deve essere in formato 9x9")
+   versioni = np.stack([griglia, griglia.T])  # (2,9,9)
+
+   # region Prima riga: solo le righe (o colonne) con più numeri possono produrre il prefisso minimo
+   pieni = (versioni != 0).sum(axis=2)        # (2,9)
+   trasposto, prima_riga = np.nonzero(pieni == pieni.max())
+   n_permutazioni = len(PERMUTAZIONI_COLONNE)
+   trasposto = np.repeat(trasposto, n_permutazioni)
+   righe = np.repeat(prima_riga, n_permutazioni)[:,None]
+   colonne = np.tile(np.arange(n_permutazioni), len(prima_riga))
+   etichette = np.zeros((len(trasposto), 10), dtype=np.int64)
+   prossima = np.ones(len(trasposto), dtype=np.int64)
+   # endregion
+
+   forma = []
+   for k in range(9):
+      if k > 0:
+         # Righe ammesse in posizione k: una riga di una fascia non ancora usata se inizia una nuova fascia,
+         # altrimenti una riga non ancora usata della fascia corrente.
+         usate = np.zeros((len(trasposto), 9), dtype=bool)
+         usate[np.arange(len(trasposto))[:,None], righe] = True
+         fasce_usate = usate.reshape(-1,3,3).any(axis=2)                      # (C,3)
+         if k % 3 == 0:
+            ammesse = np.repeat(~fasce_usate, 3, axis=1)
+         else:
+            fascia_corrente = righe[:,k-1] // 3
+            ammesse = (np.arange(9)[None,:] // 3 == fascia_corrente[:,None]) & ~usate
+         candidato, riga_nuova = np.nonzero(ammesse)
+         trasposto, colonne = trasposto[candidato], colonne[candidato]
+         righe = np.concatenate([righe[candidato], riga_nuova[:,None]], axis=1)
+         etichette, prossima = etichette[candidato].copy(), prossima[candidato].copy()
+
+      permutazioni = PERMUTAZIONI_COLONNE[colonne].astype(np.int64)
+      if k == 0:
+         # Nella prima riga ogni numero riceve un'etichetta nuova: la riga minima dipende solo dalle celle piene,
+         # perciò i candidati si filtrano prima della rinumerazione (la parte più costosa con migliaia di candidati)
+         vuote = np.take_along_axis(versioni[trasposto, righe[:,0]] == 0, permutazioni, axis=1) @ PESI
+         migliori = vuote == vuote.min()
+         trasposto, righe, colonne, permutazioni = trasposto[migliori], righe[migliori], colonne[migliori], permutazioni[migliori]
+         etichette, prossima = etichette[migliori], prossima[migliori]
+
+      valori = np.take_along_axis(versioni[trasposto, righe[:,k]], permutazioni, axis=1)
+      riga = __rinumera_riga__(valori, etichette, prossima)
+
+      # Tenere solo i candidati con la riga minima
+      chiavi = riga @ PESI
+      migliori = chiavi == chiavi.min()
+      trasposto, righe, colonne = trasposto[migliori], righe[migliori], colonne[migliori]
+      etichette, prossima = etichette[migliori], prossima[migliori]
+      forma.append(riga[migliori][0])
+
+      # Con molti candidati a pari merito (es. schemi con righe vuote) eliminare quelli equivalenti
+      if len(trasposto) > SOGLIA_EQUIVALENTI and k < 8:
+         unici = __candidati_distinti__(versioni, trasposto, righe, colonne, etichette, prossima)
+         trasposto, righe, colonne = trasposto[unici], righe[unici], colonne[unici]
+         etichette, prossima = etichette[unici], prossima[unici]
+
+   forma = np.array(forma)
+   forma[forma == VUOTA] = 0
+
+   # Completare la rinumerazione con i numeri assenti dallo schema, in ordine crescente
+   etichette = etichette[0].copy()
+   libere = iter(range(int(prossima[0]), 10))
+   for numero in range(1,10):
+      if etichette[numero] == 0:
+         etichette[numero] = next(libere)
+
+   trasformazione = {"trasposto": bool(trasposto[0]),
+                     "righe": righe[0].copy(),
+                     "colonne": PERMUTAZIONI_COLONNE[colonne[0]].astype(np.int64),
+                     "etichette": etichette}
+   return forma, trasformazione
+
+def applica_trasformazione(schema : Union[list, np.ndarray],
+                           trasformazione : dict) -> np.ndarray:
+   """Applica una trasformazione (output di 'canonical_form') ad uno schema, es. per ottenere la forma canonica di una soluzione."""
+   griglia = np.asarray(schema, dtype=np.int64)
+   if trasformazione["trasposto"]:
+      griglia = griglia.T
+   return trasformazione["etichette"][griglia[np.ix_(trasformazione["righe"], trasformazione["colonne"])]]
+
+def inverti_trasformazione(schema : Union[list, np.ndarray],
+                           trasformazione : dict) -> np.ndarray:
+   """Riporta uno schema in forma canonica (es. la soluzione della forma canonica) nella forma originale."""
+   inverse = np.zeros(10, dtype=np.int64)
+   inverse[trasformazione["etichette"]] = np.arange(10)
+   griglia = np.empty((9,9), dtype=np.int64)
+   griglia[np.ix_(trasformazione["righe"], trasformazione["colonne"])] = inverse[np.asarray(schema, dtype=np.int64)]
+   return griglia.T if trasformazione["trasposto"] else griglia
+
+def invariante(schema : Union[list, np.ndarray]) -> tuple:
+   """Chiave economica uguale per tutti gli schemi equivalenti (ma non viceversa): numero di numeri per riga e per
+      colonna raggruppati per fascia, numero di numeri per quadrante e frequenze dei numeri, tutti ordinati.
+      Due schemi con chiavi diverse non sono equivalenti, perciò la forma canonica serve solo a chiavi uguali.
+      Input:
+         - schema ((list, np.ndarray)) schema 9x9, zeri per le celle vuote.
+      Output:
+         - chiave (tuple) confrontabile e utilizzabile come chiave di un dizionario.
+   """
+   griglia = np.asarray(schema, dtype=np.int64)
+   if griglia.shape != (9,9):
+      raise TypeError("La matrice deve essere in formato 9x9")
+   piene = griglia != 0
+   fasce = lambda conteggi: tuple(sorted(tuple(sorted(fascia)) for fascia in conteggi.reshape(3,3).tolist()))
+   righe_colonne = tuple(sorted([fasce(piene.sum(axis=1)), fasce(piene.sum(axis=0))])) # La trasposizione le scambia
+   quadranti = tuple(sorted(piene.reshape(3,3,3,3).sum(axis=(1,3)).ravel().tolist()))
+   frequenze = tuple(sorted(np.bincount(griglia[piene], minlength=10)[1:].tolist()))
+   return righe_colonne, quadranti, frequenze
+# endregion
+#---------------------------------------------------------------------------------#
+# CACHE
+#---------------------------------------------------------------------------------#
+# region CACHE
+class cache_soluzioni:
+   """Cache delle soluzioni da mettere davanti a 'sudoku.solve'.
+      Calcolare la forma canonica costa più di una risoluzione, perciò ogni schema riceve prima una chiave invariante
+      economica ('invariante'): se nessuno schema già visto ha la stessa chiave il sudoku non può essere equivalente
+      a nessuno di essi e viene risolto direttamente. Solo quando la chiave è già presente si calcolano le forme
+      canoniche (anche, una volta sola, quelle degli schemi già visti con la stessa chiave) e le soluzioni vengono
+      riutilizzate tra sudoku equivalenti. Gli schemi già visti identici vengono trovati direttamente.
+      La dimensione è limitata: superata la capacità viene eliminata la soluzione usata meno di recente (LRU).
+   """
+   def __init__(self,
+                capacita : int = 10000,
+                engine : str = "ricerca"):
+      """Input:
+            - capacita (int, default 10000) numero massimo di soluzioni salvate;
+            - engine (str, default "ricerca") engine passato a 'sudoku.solve' per i sudoku non presenti in cache.
+      """
+      self.capacita = capacita
+      self.engine = engine
+      self.hit = 0
+      self.miss = 0
+      self.__soluzioni__ = OrderedDict() # forma canonica (bytes) -> soluzione canonica (bytes), None se il sudoku non ha soluzione
+      self.__esatti__ = OrderedDict()    # schema originale (bytes) -> soluzione nella forma originale (bytes)
+      self.__invarianti__ = OrderedDict() # chiave invariante -> schemi originali (bytes) di cui non è ancora stata calcolata la forma canonica
+
+   def __salva__(self,
+                 archivio : OrderedDict,
+                 chiave,
+                 valore) -> None:
+      """Inserisce una coppia in uno dei dizionari LRU, eliminando la più vecchia oltre la capacità."""
+      archivio[chiave] = valore
+      archivio.move_to_end(chiave)
+      if len(archivio) > self.capacita:
+         archivio.popitem(last=False)
+
+   def __canonizza_in_attesa__(self,
+                               chiave_invariante) -> None:
+      """Salva per forma canonica le soluzioni degli schemi già visti con la stessa chiave invariante."""
+      for originale in self.__invarianti__[chiave_invariante]:
+         if originale not in self.__esatti__: # Eliminato dalla LRU nel frattempo
+            continue
+         soluzione = self.__esatti__[originale]
+         forma, trasformazione = canonical_form(np.frombuffer(originale, dtype=np.uint8).reshape(9,9))
+         if soluzione is not None:
+            soluzione = applica_trasformazione(np.frombuffer(soluzione, dtype=np.uint8).reshape(9,9), trasformazione).astype(np.uint8).tobytes()
+         self.__salva__(self.__soluzioni__, forma.astype(np.uint8).tobytes(), soluzione)
+      self.__invarianti__[chiave_invariante] = []
+
+   def solve(self,
+             schema : Union[list, np.ndarray]):
+      """Restituisce la soluzione (np.ndarray 9x9) dello schema, None se non risolvibile."""
+      griglia = np.asarray(schema, dtype=np.int64)
+      originale = griglia.astype(np.uint8).tobytes()
+      if originale in self.__esatti__:
+         self.hit += 1
+         self.__esatti__.move_to_end(originale)
+         soluzione = self.__esatti__[originale]
+         return None if soluzione is None else np.frombuffer(soluzione, dtype=np.uint8).reshape(9,9).astype(np.int64)
+      chiave_invariante = invariante(griglia)
+
+      # region Chiave invariante mai vista: nessuno schema equivalente in cache, si risolve direttamente
+      if chiave_invariante not in self.__invarianti__:
+         self.miss += 1
+         S = sudoku(griglia)
+         S.solve(engine=self.engine)
+         soluzione = S.sudoku.astype(np.int64) if S.solved else None
+         self.__salva__(self.__invarianti__, chiave_invariante, [originale])
+         self.__salva__(self.__esatti__, originale, None if soluzione is None else soluzione.astype(np.uint8).tobytes())
+         return soluzione
+      # endregion
+
+      self.__invarianti__.move_to_end(chiave_invariante)
+      self.__canonizza_in_attesa__(chiave_invariante)
+      forma, trasformazione = canonical_form(griglia)
+      chiave = forma.astype(np.uint8).tobytes()
+
+      if chiave in self.__soluzioni__:
+         self.hit += 1
+         self.__soluzioni__.move_to_end(chiave)
+         soluzione = self.__soluzioni__[chiave]
+      else:
+         self.miss += 1
+         S = sudoku(forma)
+         S.solve(engine=self.engine)
+         soluzione = S.sudoku.astype(np.uint8).tobytes() if S.solved else None
+         self.__salva__(self.__soluzioni__, chiave, soluzione)
+
+      if soluzione is not None:
+         soluzione = inverti_trasformazione(np.frombuffer(soluzione, dtype=np.uint8).reshape(9,9), trasformazione)
+      self.__salva__(self.__esatti__, originale, None if soluzione is None else soluzione.astype(np.uint8).tobytes())
+      return soluzione
+
+   def statistiche(self) -> dict:
+      """Hit, miss, percentuale di hit e dimensione attuale della cache (schemi con soluzione salvata)."""
+      richieste = self.hit + self.miss
+      return {"hit": self.hit,
+              "miss": self.miss,
+              "hit_rate": self.hit / richieste if richieste else 0.0,
+              "dimensione": len(self),
+              "capacita": self.capacita}
+
+   def __len__(self) -> int:
+      return len(self.__esatti__)
+# endregion
+#---------------------------------------------------------------------------------#
+# DEDUPLICAZIONE
+#---------------------------------------------------------------------------------#
+def deduplica(records : list) -> tuple:
+   """Elimina da un corpus i sudoku equivalenti (stessa forma canonica).
+      Input:
+         - records (list) record nel formato di Data/Sudoku.json o schemi 9x9.
+      Output:
+         - unici (list) record con forma canonica mai vista prima, in ordine di apparizione;
+         - duplicati (dict) posizione di ogni record scartato -> posizione del record equivalente tenuto.
+   """
+   schemi = [record["schema_iniziale"] if isinstance(record, dict) else record for record in records]
+   invarianti = [invariante(schema) for schema in schemi]
+   ripetuti = {chiave for chiave, volte in Counter(invarianti).items() if volte > 1}
+
+   visti = {}
+   unici, duplicati = [], {}
+   for posizione, (record, schema, chiave) in enumerate(zip(records, schemi, invarianti)):
+      # Forma canonica solo per le chiavi invarianti condivise da più schemi
+      if chiave in ripetuti:
+         chiave = canonical_form(schema)[0].astype(np.uint8).tobytes()
+      if chiave in visti:
+         duplicati[posizione] = visti[chiave]
+      else:
+         visti[chiave] = posizione
+         unici.append(record)
+   return unici, duplicati
+
+if __name__ == "__main__":
+   import argparse
+   import json
+
+   parser = argparse.ArgumentParser(description="Trovare i sudoku equivalenti in un corpus json.")
+   parser.add_argument("percorso", nargs="?", default="Data/Sudoku.json", help="file json del corpus")
+   args = parser.parse_args()
+
+   with open(args.percorso, encoding="utf-8") as f:
+      records = json.load(f)
+   unici, duplicati = deduplica(records)
+   print(f"{len(records)} sudoku, {len(unici)} unici a meno di simmetrie, {len(duplicati)} duplicati.")
+   for posizione, originale in duplicati.items():
+      print(f" - record {posizione} equivalente al record {originale}")
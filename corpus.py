@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Risoluzione di interi corpus di sudoku (es. Data/Sudoku.json) su tutti i core disponibili.
+
+   I sudoku vengono inviati ai processi a blocchi, così il costo di serializzazione (pickle) viene
+   ammortizzato su più schemi. I risultati vengono restituiti nello stesso ordine dell'input,
+   con il tempo di risoluzione di ogni sudoku.
+"""
+
+import collections
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Union
+
+import numpy as np
+
+from sudoku import sudoku
+#---------------------------------------------------------------------------------#
+# CARICAMENTO DATI
+#---------------------------------------------------------------------------------#
+def carica_corpus(percorso : str = "Data/Sudoku.json") -> list:
+   """Carica un corpus di sudoku in formato json (stesso schema di Data/Sudoku.json).
+      Input:
+         - percorso (str, default "Data/Sudoku.json") percorso del file json.
+      Output:
+         - lista di record con chiavi 'schema_iniziale', 'indice', 'difficoltà', ...
+   """
+   with open(percorso, encoding="utf-8") as f:
+      return json.load(f)
+
+#---------------------------------------------------------------------------------#
+# RISOLUZIONE NEI PROCESSI
+#---------------------------------------------------------------------------------#
+# region WORKER
+def __risultato_vuoto__(record : Union[dict, list, np.ndarray]) -> dict:
+   """Risultato di partenza per un record: non risolto, senza soluzione e senza errori."""
+   if isinstance(record, dict):
+      indice, difficolta = record.get("indice"), record.get("difficoltà")
+   else:
+      indice, difficolta = None, None
+   return {"indice": indice, "difficoltà": difficolta, "solved": False, "stato": None, "soluzione": None,
+           "numeri_aggiunti": 0, "tempo": 0.0, "errore": None}
+
+def __risolvi_record__(record : Union[dict, list, np.ndarray],
+                       engine : str,
+                       timeout : float = None) -> dict:
+   """Risolve un singolo record del corpus. Qualsiasi errore viene salvato nel risultato invece di essere propagato,
+      così un sudoku problematico non fa perdere il resto del blocco.
+      Input:
+         - record (dict, list, np.ndarray) record con chiave 'schema_iniziale' oppure direttamente lo schema;
+         - engine (str) engine passato a 'sudoku.solve';
+         - timeout (float, default None) secondi massimi per sudoku, controllati in modo cooperativo da 'sudoku.solve'.
+      Output:
+         - dizionario con indice, difficoltà, esito ('solved' e 'stato' di 'sudoku.solve'), soluzione (parziale se il tempo
+           è scaduto), numeri aggiunti, tempo ed eventuale errore.
+   """
+   schema = record["schema_iniziale"] if isinstance(record, dict) else record
+   risultato = __risultato_vuoto__(record)
+
+   inizio = time.perf_counter()
+   try:
+      S = sudoku(schema)
+      S.solve(engine=engine, timeout=timeout)
+      risultato["solved"] = bool(S.solved)
+      risultato["stato"] = S.stato
+      risultato["soluzione"] = np.asarray(S.sudoku).tolist()
+      risultato["numeri_aggiunti"] = int(S.numeri_aggiunti)
+      if S.stato == "tempo_scaduto":
+         risultato["errore"] = f"Tempo massimo di {timeout} secondi superato"
+   except Exception as e:
+      risultato["errore"] = f"{type(e).__name__}: {e}"
+   risultato["tempo"] = time.perf_counter() - inizio
+   return risultato
+
+# Stato di avanzamento di ogni sudoku condiviso con i processi (0 da fare, 1 in corso, 2 completato).
+# Serve ad individuare i sudoku in corso quando un processo termina in modo anomalo.
+__STATO_LAVORI__ = None
+
+def __inizializza_processo__(stato):
+   global __STATO_LAVORI__
+   __STATO_LAVORI__ = stato
+
+def __risolvi_blocco__(blocco : list,
+                       engine : str,
+                       timeout : float = None) -> list:
+   """Risolve un blocco di coppie (posizione, record). Restituisce la lista di coppie (posizione, risultato)."""
+   risultati = []
+   for posizione, record in blocco:
+      if __STATO_LAVORI__ is not None:
+         __STATO_LAVORI__[posizione] = 1
+      risultati.append((posizione, __risolvi_record__(record, engine, timeout)))
+      if __STATO_LAVORI__ is not None:
+         __STATO_LAVORI__[posizione] = 2
+   return risultati
+# endregion
+
+#---------------------------------------------------------------------------------#
+# RISOLUZIONE DEL CORPUS
+#---------------------------------------------------------------------------------#
+# region SOLVE CORPUS
+def __esegui_blocchi__(blocchi : list,
+                       risultati : list,
+                       processi : int,
+                       engine : str,
+                       timeout : float,
+                       stato) -> list:
+   """Esegue i blocchi su un nuovo pool di processi salvando i risultati in 'risultati'.
+      Output:
+         - lista dei lavori (posizione, record) persi per la terminazione anomala di un processo.
+   """
+   persi = []
+   with ProcessPoolExecutor(max_workers=processi, initializer=__inizializza_processo__, initargs=(stato,)) as pool:
+      futures = {pool.submit(__risolvi_blocco__, blocco, engine, timeout): blocco for blocco in blocchi}
+      for future in as_completed(futures):
+         try:
+            for posizione, risultato in future.result():
+               risultati[posizione] = risultato
+         except BrokenProcessPool:
+            persi.extend(futures[future])
+   return persi
+
+def solve_corpus(records : list,
+                 processi : int = None,
+                 dimensione_blocco : int = None,
+                 engine : str = "tecniche",
+                 timeout : float = None) -> list:
+   """Risolve un corpus di sudoku distribuendo il lavoro su un pool di processi.
+      Input:
+         - records (list) record nel formato di Data/Sudoku.json ('schema_iniziale', 'indice', 'difficoltà') o schemi 9x9;
+         - processi (int, default None) numero di processi, se None tutti i core disponibili;
+         - dimensione_blocco (int, default None) sudoku per blocco inviato ai processi, se None circa 4 blocchi per processo;
+         - engine (str, default "tecniche") engine passato a 'sudoku.solve';
+         - timeout (float, default None) secondi massimi per ogni sudoku.
+      Output:
+         - lista dei risultati (vedi '__risolvi_record__') nello stesso ordine di 'records'.
+      Errori e timeout di un sudoku vengono salvati nel suo risultato senza toccare il resto del blocco.
+      Se invece un processo termina in modo anomalo (es. memoria esaurita) il pool va perso: i sudoku che erano in corso
+      vengono rieseguiti uno alla volta in un processo dedicato, così solo quello responsabile viene segnato con un errore,
+      mentre tutti gli altri sudoku non completati vengono rinviati a blocchi ad un nuovo pool.
+   """
+   processi = processi or os.cpu_count() or 1
+   lavori = list(enumerate(records))
+   if dimensione_blocco is None:
+      dimensione_blocco = max(1, math.ceil(len(lavori) / (processi*4)))
+
+   risultati = [None]*len(lavori)
+   stato = multiprocessing.Array("b", len(lavori), lock=False)
+
+   da_fare = lavori
+   while da_fare:
+      blocchi = [da_fare[i:i+dimensione_blocco] for i in range(0, len(da_fare), dimensione_blocco)]
+      persi = __esegui_blocchi__(blocchi, risultati, processi, engine, timeout, stato)
+
+      # Sudoku in corso al momento della terminazione anomala, se non se ne trova nessuno sono sospetti tutti.
+      sospetti = [lavoro for lavoro in persi if stato[lavoro[0]] == 1] or persi
+      posizioni_sospette = {posizione for posizione, _ in sospetti}
+      da_fare = [lavoro for lavoro in persi if lavoro[0] not in posizioni_sospette]
+      for posizione, _ in da_fare:
+         stato[posizione] = 0
+
+      for lavoro in sospetti:
+         stato[lavoro[0]] = 0
+         if __esegui_blocchi__([[lavoro]], risultati, 1, engine, timeout, stato):
+            posizione, record = lavoro
+            risultati[posizione] = __risultato_vuoto__(record)
+            risultati[posizione]["errore"] = "Il processo è terminato in modo anomalo"
+   return risultati
+# endregion
+#---------------------------------------------------------------------------------#
+# STREAMING
+#---------------------------------------------------------------------------------#
+# region STREAMING
+def __apri__(sorgente, modalita : str):
+   """Apre un file, '-' per stdin/stdout. Restituisce (file, da chiudere)."""
+   if not isinstance(sorgente, str):
+      return sorgente, False
+   if sorgente == "-":
+      return (sys.stdin if "r" in modalita else sys.stdout), False
+   return open(sorgente, modalita, encoding="utf-8"), True
+
+def __oggetti_json__(f,
+                     testo : str = "",
+                     dimensione_lettura : int = 1 << 16):
+   """Legge uno alla volta gli elementi di un array json (es. Data/Sudoku.json, record o schemi 9x9) o gli oggetti
+      di un file json lines, tenendo in memoria solo il testo non ancora decodificato.
+      Di un array viene saltata solo la parentesi esterna: ogni elemento è decodificato per intero, così un array
+      di schemi restituisce uno schema alla volta come 'carica_corpus'.
+   """
+   decoder = json.JSONDecoder()
+   fine_file = False
+   array = None          # True per un array json, False per json lines, None finché non è letto il primo carattere
+   separatore = False    # Nell'array, dopo un elemento è atteso ',' oppure ']'
+   while True:
+      testo = testo.lstrip()
+      if not testo:
+         if fine_file:
+            if array:
+               raise ValueError("Array json non chiuso: manca ']' alla fine del file")
+            return
+         testo = f.read(dimensione_lettura)
+         fine_file = not testo
+         continue
+
+      if array is None:
+         array = testo[0] == "["
+         if array:
+            testo = testo[1:]
+            continue
+      if array:
+         if testo[0] == "]":
+            return
+         if separatore:
+            if testo[0] != ",":
+               raise ValueError(f"Array json non valido: atteso ',' o ']' tra gli elementi, trovato {testo[:20]!r}")
+            testo, separatore = testo[1:], False
+            continue
+
+      try:
+         oggetto, posizione = decoder.raw_decode(testo)
+         # Un valore che arriva fino alla fine del testo letto potrebbe continuare nel blocco successivo (es. un numero)
+         completo = posizione < len(testo) or fine_file
+      except json.JSONDecodeError:
+         if fine_file:
+            raise
+         completo = False
+      if not completo:
+         blocco = f.read(dimensione_lettura)
+         fine_file = not blocco
+         testo += blocco
+         continue
+      testo = testo[posizione:]
+      separatore = array
+      yield oggetto
+
+def leggi_schemi(sorgente = "-"):
+   """Generatore dei record di un file di sudoku, letto un sudoku alla volta.
+      Formati riconosciuti (dal primo carattere del file):
+         - array json di record nel formato di Data/Sudoku.json o di schemi 9x9, oppure json lines di record;
+         - una riga di 81 caratteri per sudoku, '.' o '0' per le celle vuote (righe vuote o che iniziano con '#' ignorate,
+           eventuale testo dopo il primo spazio ignorato).
+      Input:
+         - sorgente (str o file, default "-") percorso del file, '-' per stdin, oppure file già aperto.
+      Output:
+         - record con chiavi 'schema_iniziale', 'indice', 'difficoltà' (per il formato a righe 'indice' è la posizione del sudoku
+           nel file, a partire da 0, e 'difficoltà' è None).
+   """
+   f, da_chiudere = __apri__(sorgente, "r")
+   try:
+      primo, righe_vuote = f.read(1), 0
+      while primo and primo.isspace():
+         righe_vuote += primo == "\n"
+         primo = f.read(1)
+      if primo in ("[", "{"):
+         yield from __oggetti_json__(f, testo=primo)
+         return
+
+      indice = 0
+      for numero_riga, riga in enumerate(itertools.chain([primo + f.readline()], f), start=righe_vuote + 1):
+         riga = riga.strip()
+         if not riga or riga.startswith("#"):
+            continue
+         celle = riga.split()[0].replace(".", "0")
+         if len(celle) != 81 or not celle.isdigit():
+            raise ValueError(f"Riga {numero_riga}: attese 81 cifre ('.' o '0' per le celle vuote)")
+         yield {"schema_iniziale": [[int(c) for c in celle[i:i+9]] for i in range(0, 81, 9)],
+                "indice": indice,
+                "difficoltà": None}
+         indice += 1
+   finally:
+      if da_chiudere:
+         f.close()
+
+def solve_stream(records,
+                 processi : int = None,
+                 dimensione_blocco : int = 64,
+                 blocchi_in_volo : int = None,
+                 engine : str = "tecniche",
+                 timeout : float = None):
+   """Risolve un flusso di sudoku restituendo i risultati man mano che sono pronti, nello stesso ordine dell'input.
+      Al contrario di 'solve_corpus' l'input non viene mai caricato tutto in memoria: vengono letti dal flusso solo i
+      blocchi necessari a tenere occupati i processi (al massimo 'blocchi_in_volo'). Essendo un generatore, se chi consuma
+      i risultati è lento (es. scrittura su disco o pipe) la lettura dell'input si ferma finché non vengono richiesti altri risultati.
+      Input:
+         - records (iterabile) record nel formato di Data/Sudoku.json o schemi 9x9, es. output di 'leggi_schemi';
+         - processi (int, default None) numero di processi, se None tutti i core disponibili;
+         - dimensione_blocco (int, default 64) sudoku per blocco inviato ai processi;
+         - blocchi_in_volo (int, default None) blocchi inviati e non ancora restituiti, se None 2 per processo;
+         - engine (str, default "tecniche") engine passato a 'sudoku.solve';
+         - timeout (float, default None) secondi massimi per ogni sudoku.
+      Output:
+         - generatore dei risultati (vedi '__risolvi_record__').
+      Se un processo termina in modo anomalo i blocchi persi vengono risolti con 'solve_corpus', che isola il sudoku responsabile.
+   """
+   processi = processi or os.cpu_count() or 1
+   blocchi_in_volo = blocchi_in_volo or 2*processi
+   iteratore = iter(records)
+
+   def prossimo_blocco():
+      return list(itertools.islice(iteratore, dimensione_blocco))
+
+   pool = ProcessPoolExecutor(max_workers=processi)
+   try:
+      in_volo = collections.deque()
+      blocco = prossimo_blocco()
+      while blocco or in_volo:
+         # Riempire la finestra dei blocchi in volo
+         while blocco and len(in_volo) < blocchi_in_volo:
+            lavori = list(enumerate(blocco))
+            in_volo.append((lavori, pool.submit(__risolvi_blocco__, lavori, engine, timeout)))
+            blocco = prossimo_blocco()
+
+         lavori, future = in_volo.popleft()
+         try:
+            risultati = [risultato for _, risultato in future.result()]
+         except BrokenProcessPool:
+            # Tutti i blocchi in volo sono persi: risolverli isolando il responsabile e ripartire con un nuovo pool
+            pool.shutdown(wait=False)
+            persi = [lavori] + [l for l, _ in in_volo]
+            in_volo.clear()
+            pool = ProcessPoolExecutor(max_workers=processi)
+            for lavori in persi:
+               yield from solve_corpus([record for _, record in lavori], processi=processi,
+                                       dimensione_blocco=dimensione_blocco, engine=engine, timeout=timeout)
+            continue
+         yield from risultati
+   finally:
+      pool.shutdown(wait=False, cancel_futures=True)
+
+def scrivi_risultati(risultati,
+                     destinazione = "-") -> int:
+   """Scrive i risultati in formato json lines (un risultato per riga) man mano che arrivano.
+      Input:
+         - risultati (iterabile) es. output di 'solve_stream';
+         - destinazione (str o file, default "-") percorso del file, '-' per stdout, oppure file già aperto.
+      Output:
+         - numero di risultati scritti.
+   """
+   f, da_chiudere = __apri__(destinazione, "w")
+   n = 0
+   try:
+      for risultato in risultati:
+         f.write(json.dumps(risultato, ensure_ascii=False) + "\n")
+         n += 1
+      f.flush()
+   finally:
+      if da_chiudere:
+         f.close()
+   return n
+# endregion
+
+if __name__ == "__main__":
+   import argparse
+
+   parser = argparse.ArgumentParser(description="Risolvere un corpus di sudoku in formato json su più processi.")
+   parser.add_argument("percorso", nargs="?", default="Data/Sudoku.json", help="file json del corpus, '-' per stdin con --stream")
+   parser.add_argument("--processi", type=int, default=None, help="numero di processi (default: tutti i core)")
+   parser.add_argument("--dimensione-blocco", type=int, default=None, help="sudoku per blocco inviato ai processi")
+   parser.add_argument("--engine", default="tecniche", choices=["tecniche","ricerca","dlx"])
+   parser.add_argument("--timeout", type=float, default=None, help="secondi massimi per sudoku")
+   parser.add_argument("--output", default=None, help="file json in cui salvare i risultati ('-' per stdout con --stream)")
+   parser.add_argument("--stream", action="store_true",
+                       help="leggere l'input un sudoku alla volta (json o 81 caratteri per riga) e scrivere i risultati in json lines man mano")
+   args = parser.parse_args()
+
+   if args.stream:
+      risultati = solve_stream(leggi_schemi(args.percorso), processi=args.processi, dimensione_blocco=args.dimensione_blocco or 64,
+                               engine=args.engine, timeout=args.timeout)
+      try:
+         scrivi_risultati(risultati, args.output or "-")
+      except BrokenPipeError:
+         # L'output è stato chiuso prima della fine (es. '| head'), non è un errore
+         os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+      sys.exit(0)
+
+   records = carica_corpus(args.percorso)
+   inizio = time.perf_counter()
+   risultati = solve_corpus(records, processi=args.processi, dimensione_blocco=args.dimensione_blocco,
+                            engine=args.engine, timeout=args.timeout)
+   durata = time.perf_counter() - inizio
+
+   risolti = sum(r["solved"] for r in risultati)
+   errori = sum(r["errore"] is not None for r in risultati)
+   print(f"Risolti {risolti}/{len(risultati)} sudoku in {durata:.2f} secondi ({len(risultati)/durata:.1f} sudoku/s). Errori: {errori}.")
+
+   if args.output:
+      with open(args.output, "w", encoding="utf-8") as f:
+         json.dump(risultati, f, ensure_ascii=False)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Formato binario compatto per corpus di sudoku e lettore basato su 'numpy.memmap'.
+
+   Struttura del file:
+      - intestazione di 16 byte: "SDKB", versione (1 byte), bit per cella (1 byte, 4 o 8), campi presenti (1 byte),
+        1 byte libero, numero di schemi (8 byte, little endian);
+      - N record di lunghezza fissa, uno per schema:
+         - schema iniziale: 41 byte con 4 bit per cella (due celle per byte, la prima nei 4 bit alti), 81 byte con 8 bit per cella;
+         - soluzione (opzionale): stessa codifica dello schema;
+         - difficoltà (opzionale): 1 byte, 0 se non nota.
+   I record hanno lunghezza fissa, perciò l'accesso allo schema i è O(1) e l'apertura del file legge solo l'intestazione.
+   Con 4 bit per cella le celle vanno spacchettate (copia dei soli schemi richiesti), con 8 bit per cella il lettore
+   restituisce direttamente viste (N,9,9) sul file, senza copie.
+
+   Conversione da json:
+      python corpus_binario.py Data/Sudoku.json Data/Sudoku.sdkb
+"""
+
+import json
+import struct
+from typing import Union
+
+import numpy as np
+#---------------------------------------------------------------------------------#
+# CODIFICA
+#---------------------------------------------------------------------------------#
+# region CODIFICA
+MAGIC = b"SDKB"
+VERSIONE = 1
+INTESTAZIONE = struct.Struct("<4sBBBxQ")  # 16 byte
+CON_SOLUZIONE = 1                         # Bit dei campi presenti
+CON_DIFFICOLTA = 2
+
+def impacchetta(griglie : np.ndarray) -> np.ndarray:
+   """Schemi (N,9,9) -> (N,41) byte con 4 bit per cella."""
+   celle = np.asarray(griglie, dtype=np.uint8).reshape(-1,81)
+   celle = np.concatenate([celle, np.zeros((len(celle),1), dtype=np.uint8)], axis=1)  # 82 celle, numero pari
+   return (celle[:,0::2] << 4) | celle[:,1::2]
+
+def spacchetta(impacchettati : np.ndarray) -> np.ndarray:
+   """(N,41) byte con 4 bit per cella -> schemi (N,9,9) di np.uint8."""
+   impacchettati = np.asarray(impacchettati, dtype=np.uint8).reshape(-1,41)
+   celle = np.empty((len(impacchettati),82), dtype=np.uint8)
+   celle[:,0::2] = impacchettati >> 4
+   celle[:,1::2] = impacchettati & 15
+   return celle[:,:81].reshape(-1,9,9)
+
+def __tipo_record__(bit_per_cella : int,
+                    campi : int) -> np.dtype:
+   """dtype strutturato di un record, usato sia in scrittura sia dal memmap."""
+   forma = (41,) if bit_per_cella == 4 else (9,9)
+   tipo = [("schema", np.uint8, forma)]
+   if campi & CON_SOLUZIONE:
+      tipo.append(("soluzione", np.uint8, forma))
+   if campi & CON_DIFFICOLTA:
+      tipo.append(("difficolta", np.uint8))
+   return np.dtype(tipo)
+# endregion
+#---------------------------------------------------------------------------------#
+# SCRITTURA
+#---------------------------------------------------------------------------------#
+# region SCRITTURA
+def scrivi_corpus(percorso : str,
+                  schemi : np.ndarray,
+                  soluzioni : np.ndarray = None,
+                  difficolta : np.ndarray = None,
+                  bit_per_cella : int = 4):
+   """Scrive un corpus in formato binario.
+      Input:
+         - percorso (str) file di destinazione;
+         - schemi (np.ndarray) schemi iniziali (N,9,9), zeri per le celle vuote;
+         - soluzioni (np.ndarray, default None) soluzioni (N,9,9), se None il campo non viene scritto;
+         - difficolta (np.ndarray, default None) difficoltà (N,) tra 0 e 255, se None il campo non viene scritto;
+         - bit_per_cella (int, default 4) 4 per il formato compatto (41 byte), 8 per avere viste senza copie in lettura (81 byte).
+   """
+   if bit_per_cella not in (4, 8):
+      raise ValueError("bit_per_cella deve essere 4 oppure 8")
+   schemi = np.asarray(schemi).reshape(-1,9,9)
+   campi = (CON_SOLUZIONE if soluzioni is not None else 0) | (CON_DIFFICOLTA if difficolta is not None else 0)
+   codifica = impacchetta if bit_per_cella == 4 else (lambda g: np.asarray(g, dtype=np.uint8).reshape(-1,9,9))
+
+   record = np.zeros(len(schemi), dtype=__tipo_record__(bit_per_cella, campi))
+   record["schema"] = codifica(schemi)
+   if soluzioni is not None:
+      record["soluzione"] = codifica(soluzioni)
+   if difficolta is not None:
+      record["difficolta"] = difficolta
+
+   with open(percorso, "wb") as f:
+      f.write(INTESTAZIONE.pack(MAGIC, VERSIONE, bit_per_cella, campi, len(schemi)))
+      f.write(record.tobytes())
+
+def converti_json(percorso_json : str,
+                  percorso_binario : str,
+                  bit_per_cella : int = 4) -> int:
+   """Converte un corpus nel formato di Data/Sudoku.json in formato binario, con soluzione e difficoltà.
+      Output:
+         - numero di schemi convertiti.
+   """
+   with open(percorso_json, encoding="utf-8") as f:
+      records = json.load(f)
+   schemi = np.array([r["schema_iniziale"] for r in records], dtype=np.uint8)
+   soluzioni = np.array([r["schema_risolto"] if r.get("schema_risolto") is not None else np.zeros((9,9)) for r in records], dtype=np.uint8)
+   difficolta = np.array([r.get("difficoltà") or 0 for r in records], dtype=np.uint8)
+   scrivi_corpus(percorso_binario, schemi, soluzioni, difficolta, bit_per_cella)
+   return len(records)
+# endregion
+#---------------------------------------------------------------------------------#
+# LETTURA
+#---------------------------------------------------------------------------------#
+# region LETTURA
+class corpus_binario:
+   """Lettore di un corpus in formato binario. Il file viene mappato in memoria, nessun dato viene letto o decodificato
+      finché non viene richiesto.
+      Attributi:
+         - record (np.memmap) record grezzi (N,) con dtype strutturato;
+         - bit_per_cella (int) 4 o 8;
+         - con_soluzione, con_difficolta (bool) campi presenti nel file.
+   """
+   def __init__(self,
+                percorso : str):
+      with open(percorso, "rb") as f:
+         magic, versione, bit_per_cella, campi, n = INTESTAZIONE.unpack(f.read(INTESTAZIONE.size))
+      if magic != MAGIC or versione != VERSIONE:
+         raise ValueError(f"{percorso} non è un corpus binario di sudoku (versione {VERSIONE})")
+
+      self.percorso = percorso
+      self.bit_per_cella = bit_per_cella
+      self.con_soluzione = bool(campi & CON_SOLUZIONE)
+      self.con_difficolta = bool(campi & CON_DIFFICOLTA)
+      self.record = np.memmap(percorso, dtype=__tipo_record__(bit_per_cella, campi), mode="r",
+                              offset=INTESTAZIONE.size, shape=(n,))
+
+   def __len__(self) -> int:
+      return len(self.record)
+
+   def __decodifica__(self,
+                      campo : np.ndarray) -> np.ndarray:
+      return spacchetta(campo) if self.bit_per_cella == 4 else campo
+
+   def schemi(self,
+              inizio : int = 0,
+              fine : int = None) -> np.ndarray:
+      """Schemi iniziali [inizio, fine) in formato (n,9,9). Con 8 bit per cella è una vista sul file, altrimenti una copia spacchettata."""
+      return self.__decodifica__(self.record["schema"][inizio:fine])
+
+   def soluzioni(self,
+                 inizio : int = 0,
+                 fine : int = None) -> np.ndarray:
+      """Soluzioni [inizio, fine) in formato (n,9,9), vedi 'schemi'."""
+      if not self.con_soluzione:
+         raise KeyError("Il corpus non contiene le soluzioni")
+      return self.__decodifica__(self.record["soluzione"][inizio:fine])
+
+   def difficolta(self) -> np.ndarray:
+      """Difficoltà di tutti gli schemi (N,), vista sul file."""
+      if not self.con_difficolta:
+         raise KeyError("Il corpus non contiene le difficoltà")
+      return self.record["difficolta"]
+
+   def __getitem__(self,
+                   i : int) -> np.ndarray:
+      """Schema iniziale i in formato 9x9."""
+      if i < 0:
+         i += len(self)
+      if not 0 <= i < len(self):
+         raise IndexError(i)
+      return self.schemi(i, i+1)[0]
+
+   def blocchi(self,
+               dimensione_blocco : int = 100000):
+      """Scorre il corpus a blocchi di schemi (n,9,9), es. per 'solve_many' o 'check_many' senza caricare tutto in memoria."""
+      for inizio in range(0, len(self), dimensione_blocco):
+         yield self.schemi(inizio, inizio + dimensione_blocco)
+# endregion
+
+if __name__ == "__main__":
+   import argparse
+
+   parser = argparse.ArgumentParser(description="Convertire un corpus json (formato Data/Sudoku.json) nel formato binario.")
+   parser.add_argument("json", help="file json del corpus")
+   parser.add_argument("output", help="file binario di destinazione")
+   parser.add_argument("--bit-per-cella", type=int, default=4, choices=[4,8])
+   args = parser.parse_args()
+
+   n = converti_json(args.json, args.output, args.bit_per_cella)
+   print(f"Convertiti {n} sudoku in {args.output}.")
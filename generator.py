@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Generatore di sudoku con soluzione unica ad un livello di difficoltà richiesto (1-5, stessa scala di Data/Sudoku.json).
+
+   Per ogni sudoku:
+      - viene creato uno schema completo casuale;
+      - vengono tolti numeri in ordine casuale finché la soluzione resta unica ('sudoku.is_unique'),
+        fino al numero di celle vuote tipico del livello richiesto;
+      - lo schema ottenuto viene valutato con 'sudoku.rate', se il livello non è quello richiesto si riparte.
+   I record prodotti hanno lo stesso formato di Data/Sudoku.json.
+
+   Esempio:
+      python generator.py --livello 3 -n 100 --output nuovi.json
+      python generator.py -n 20          # 20 sudoku per ogni livello, con sudoku generati al secondo per livello
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sudoku import livello_stimato, sudoku
+#---------------------------------------------------------------------------------#
+# SCHEMA COMPLETO
+#---------------------------------------------------------------------------------#
+# region SCHEMA COMPLETO
+def __permutazione_simmetrica__(rng : np.random.Generator) -> np.ndarray:
+   """Permutazione casuale di righe (o colonne) che mantiene la struttura del sudoku: ordine delle fasce e ordine interno."""
+   return np.concatenate([3*fascia + rng.permutation(3) for fascia in rng.permutation(3)])
+
+def griglia_completa(rng : np.random.Generator) -> np.ndarray:
+   """Schema completo casuale 9x9.
+      I tre quadranti sulla diagonale sono indipendenti: vengono riempiti con permutazioni casuali e lo schema viene
+      completato con la ricerca. Infine vengono applicate rinumerazione, permutazioni di righe e colonne e trasposizione casuali.
+   """
+   griglia = np.zeros((9,9), dtype=np.int64)
+   for q in range(3):
+      griglia[3*q:3*q+3, 3*q:3*q+3] = rng.permutation(9).reshape(3,3) + 1
+
+   S = sudoku(griglia)
+   S.solve(engine="ricerca")
+
+   etichette = np.concatenate([[0], rng.permutation(9) + 1])
+   griglia = etichette[S.sudoku][np.ix_(__permutazione_simmetrica__(rng), __permutazione_simmetrica__(rng))]
+   return griglia.T if rng.random() < 0.5 else griglia
+# endregion
+#---------------------------------------------------------------------------------#
+# DIFFICOLTÀ
+#---------------------------------------------------------------------------------#
+# region DIFFICOLTÀ
+# Celle vuote tipiche di ogni livello in Data/Sudoku.json, usate come obiettivo durante la rimozione dei numeri.
+CELLE_VUOTE_LIVELLO = {1: (41, 44), 2: (45, 47), 3: (46, 48), 4: (47, 48), 5: (49, 58)}
+
+def valuta_livello(schema : np.ndarray) -> int:
+   """Livello di difficoltà (1-5) di uno schema, stimato da 'sudoku.rate' (vedi 'livello_stimato')."""
+   return livello_stimato(sudoku(schema).rate())
+# endregion
+#---------------------------------------------------------------------------------#
+# GENERAZIONE
+#---------------------------------------------------------------------------------#
+# region GENERAZIONE
+def genera_sudoku(livello : int,
+                  rng : np.random.Generator = None,
+                  tentativi_massimi : int = 1000) -> dict:
+   """Genera un sudoku con soluzione unica del livello richiesto.
+      Input:
+         - livello (int) difficoltà da 1 a 5;
+         - rng (np.random.Generator, default None) generatore di numeri casuali, se None uno nuovo;
+         - tentativi_massimi (int, default 1000) schemi completi da provare prima di rinunciare.
+      Output:
+         - record nel formato di Data/Sudoku.json ('indice' è None).
+   """
+   if livello not in CELLE_VUOTE_LIVELLO:
+      raise ValueError(f"Livello non valido: {livello}, deve essere tra 1 e 5")
+   rng = rng or np.random.default_rng()
+   minimo, massimo = CELLE_VUOTE_LIVELLO[livello]
+
+   for _ in range(tentativi_massimi):
+      soluzione = griglia_completa(rng)
+      schema = soluzione.copy()
+      S = sudoku(soluzione)  # Istanza usata solo per 'is_unique' sugli schemi intermedi
+      obiettivo = rng.integers(minimo, massimo + 1)
+
+      vuote = 0
+      for cella in rng.permutation(81):
+         riga, colonna = divmod(int(cella), 9)
+         numero = schema[riga, colonna]
+         schema[riga, colonna] = 0
+         if S.is_unique(schema):
+            vuote += 1
+            if vuote == obiettivo:
+               break
+         else:
+            schema[riga, colonna] = numero
+
+      if vuote >= minimo and valuta_livello(schema) == livello:
+         return {"schema_iniziale": schema.tolist(),
+                 "schema_risolto": soluzione.tolist(),
+                 "difficoltà": livello,
+                 "fonte": "Generatore",
+                 "autore": "generator.py",
+                 "indice": None}
+   raise RuntimeError(f"Nessun sudoku di livello {livello} generato in {tentativi_massimi} tentativi")
+
+def __genera_blocco__(livello : int,
+                      n : int,
+                      seme : int) -> list:
+   """Genera nel processo 'n' sudoku di un livello."""
+   rng = np.random.default_rng(seme)
+   return [genera_sudoku(livello, rng) for _ in range(n)]
+
+def genera(n : int,
+           livelli : list = (1, 2, 3, 4, 5),
+           processi : int = None,
+           seme : int = None) -> tuple:
+   """Genera 'n' sudoku per ogni livello richiesto su più processi.
+      Input:
+         - n (int) sudoku da generare per ogni livello;
+         - livelli (list, default (1,2,3,4,5)) livelli da generare;
+         - processi (int, default None) numero di processi, se None tutti i core disponibili;
+         - seme (int, default None) seme per rendere la generazione riproducibile.
+      Output:
+         - records (list) sudoku generati, livello per livello, con 'indice' progressivo;
+         - statistiche (dict) {livello: {"sudoku", "secondi", "sudoku_al_secondo"}}, tempo dall'inizio del livello
+           al completamento del suo ultimo blocco.
+         Con n = 0 non viene avviato nessun processo e il risultato è ([], {}).
+   """
+   if n < 0:
+      raise ValueError(f"Il numero di sudoku da generare deve essere >= 0, non {n}")
+   if n == 0:
+      return [], {}
+   processi = processi or os.cpu_count() or 1
+   semi = np.random.SeedSequence(seme)
+   records, statistiche = [], {}
+   with ProcessPoolExecutor(max_workers=processi) as pool:
+      for livello in livelli:
+         inizio = time.perf_counter()
+         dimensioni = [len(b) for b in np.array_split(np.arange(n), min(n, processi*4)) if len(b)]
+         figli = semi.spawn(len(dimensioni))
+         blocchi = pool.map(__genera_blocco__, [livello]*len(dimensioni), dimensioni,
+                            [int(f.generate_state(1)[0]) for f in figli])
+         for blocco in blocchi:
+            records.extend(blocco)
+         durata = time.perf_counter() - inizio
+         statistiche[livello] = {"sudoku": n, "secondi": round(durata, 3), "sudoku_al_secondo": round(n / durata, 2)}
+
+   for indice, record in enumerate(records):
+      record["indice"] = indice
+   return records, statistiche
+# endregion
+
+if __name__ == "__main__":
+   import argparse
+
+   parser = argparse.ArgumentParser(description="Generare sudoku con soluzione unica per livello di difficoltà.")
+   parser.add_argument("-n", type=int, default=10, help="sudoku da generare per livello")
+   parser.add_argument("--livello", type=int, default=None, choices=[1,2,3,4,5], help="livello da generare (default: tutti)")
+   parser.add_argument("--processi", type=int, default=None, help="numero di processi (default: tutti i core)")
+   parser.add_argument("--seme", type=int, default=None, help="seme per una generazione riproducibile")
+   parser.add_argument("--output", default=None, help="file json in cui salvare i sudoku generati")
+   args = parser.parse_args()
+
+   livelli = [args.livello] if args.livello else [1, 2, 3, 4, 5]
+   records, statistiche = genera(args.n, livelli, processi=args.processi, seme=args.seme)
+   for livello, s in statistiche.items():
+      print(f"Livello {livello}: {s['sudoku']} sudoku in {s['secondi']:.2f} secondi ({s['sudoku_al_secondo']:.1f} sudoku/s)")
+
+   if args.output:
+      with open(args.output, "w", encoding="utf-8") as f:
+         json.dump(records, f, indent=3, ensure_ascii=False)
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Estrazione degli schemi di sudoku dalle immagini (es. Data/Immagini), senza servizi esterni e senza OCR.
+
+   Per ogni immagine:
+      - il PNG viene letto con Pillow se installato, altrimenti decodificato con zlib e NumPy (vedi '__decodifica_png__');
+      - la griglia viene trovata dalle proiezioni dei pixel scuri su righe e colonne: le linee della griglia sono
+        le righe (colonne) con più pixel scuri, il bordo esterno sono la prima e l'ultima linea;
+      - la griglia viene divisa in 81 celle, per ogni cella viene tolto il bordo e controllato se contiene una cifra;
+      - la cifra viene ritagliata, centrata in un quadrato e ridotta a LATO_CIFRA x LATO_CIFRA pixel, poi classificata
+        con il modello a template: per ogni cifra la media delle cifre di addestramento, vince la correlazione più alta.
+   Il modello viene addestrato sulle immagini del corpus usando 'schema_iniziale' di Data/Sudoku.json come etichette
+   (immagine "sudoku NN.png" -> record in posizione NN del file) e salvato in MODELLO.
+
+   Esempio:
+      python immagini.py --addestra                  # addestra il modello su Data/Immagini e lo salva in MODELLO
+      python immagini.py Data/Immagini --verifica    # estrae tutti gli schemi e li confronta con Data/Sudoku.json
+      python immagini.py Data/Immagini --validazione # addestramento su metà delle immagini, verifica sull'altra metà
+"""
+
+import glob
+import json
+import math
+import os
+import re
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+   from PIL import Image
+except ImportError:  # Pillow è opzionale, senza i PNG vengono decodificati con '__decodifica_png__'
+   Image = None
+#---------------------------------------------------------------------------------#
+# LETTURA PNG
+#---------------------------------------------------------------------------------#
+# region LETTURA PNG
+CANALI_PNG = {0: 1, 2: 3, 4: 2, 6: 4}  # Tipo di colore -> canali: grigio, RGB, grigio + alfa, RGBA
+
+def __paeth__(a : np.ndarray,
+              b : np.ndarray,
+              c : np.ndarray) -> np.ndarray:
+   """Predittore Paeth del formato PNG, vettoriale (a = sinistra, b = sopra, c = sopra a sinistra)."""
+   p = a + b - c
+   pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+   return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+def __decodifica_png__(percorso : str) -> np.ndarray:
+   """Decodifica un PNG a 8 bit non interlacciato con zlib e NumPy.
+      I filtri delle righe (None, Sub, Up, Average, Paeth) dipendono dal byte a sinistra, da quello sopra e da quello sopra
+      a sinistra, perciò vengono invertiti per antidiagonali: tutti i pixel con la stessa somma riga + colonna insieme.
+      Output:
+         - immagine (altezza, larghezza, canali) di np.uint8.
+   """
+   with open(percorso, "rb") as f:
+      dati = f.read()
+   if dati[:8] != b"\x89PNG\r\n\x1a\n":
+      raise ValueError(f"{percorso} non è un file PNG")
+
+   compressi, i = [], 8
+   while i < len(dati):
+      lunghezza, tipo = struct.unpack(">I4s", dati[i:i+8])
+      contenuto = dati[i+8:i+8+lunghezza]
+      if tipo == b"IHDR":
+         larghezza, altezza, profondita, colore, _, _, interlacciato = struct.unpack(">IIBBBBB", contenuto)
+      elif tipo == b"IDAT":
+         compressi.append(contenuto)
+      elif tipo == b"IEND":
+         break
+      i += 12 + lunghezza
+   if profondita != 8 or interlacciato or colore not in CANALI_PNG:
+      raise ValueError(f"{percorso}: supportati solo PNG a 8 bit non interlacciati in grigio o RGB, con o senza alfa")
+
+   canali = CANALI_PNG[colore]
+   righe = np.frombuffer(zlib.decompress(b"".join(compressi)), dtype=np.uint8).reshape(altezza, larghezza*canali + 1)
+   filtri = righe[:,0].astype(np.int16)
+   filtrati = righe[:,1:].reshape(altezza, larghezza, canali).astype(np.int16)
+
+   # Immagine ricostruita con una riga ed una colonna di zeri prima dell'immagine: a, b, c sono sempre definiti.
+   # Sulle immagini appiattite (pixel, canali) le antidiagonali sono slice con passo costante, quindi viste senza copie.
+   ricostruita = np.zeros((altezza+1, larghezza+1, canali), dtype=np.int16)
+   piatta = ricostruita.reshape(-1, canali)
+   filtrati = filtrati.reshape(-1, canali)
+   passo = larghezza + 1
+   for d in range(altezza + larghezza - 1):
+      y0, y1 = max(0, d - larghezza + 1), min(altezza, d + 1)
+      inizio = passo + 1 + d + y0*larghezza                 # Pixel (y0+1, d-y0+1) dell'immagine con bordo
+      fine = inizio + (y1 - y0 - 1)*larghezza + 1
+      a = piatta[inizio-1:fine-1:larghezza]                 # sinistra
+      b = piatta[inizio-passo:fine-passo:larghezza]         # sopra
+      c = piatta[inizio-passo-1:fine-passo-1:larghezza]     # sopra a sinistra
+      f = filtri[y0:y1,None]
+      predizione = np.where(f == 1, a,
+                   np.where(f == 2, b,
+                   np.where(f == 3, (a + b) >> 1,
+                   np.where(f == 4, __paeth__(a, b, c), 0))))
+      piatta[inizio:fine:larghezza] = (filtrati[d + y0*(larghezza-1) : d + (y1-1)*(larghezza-1) + 1 : larghezza-1] + predizione) & 255
+   return ricostruita[1:,1:].astype(np.uint8)
+
+def leggi_immagine(percorso : str) -> np.ndarray:
+   """Immagine in scala di grigi (altezza, larghezza) di np.float32 tra 0 (nero) e 1 (bianco), trasparenza su sfondo bianco."""
+   if Image is not None:
+      with Image.open(percorso) as immagine:
+         pixel = np.asarray(immagine.convert("RGBA"))
+   else:
+      pixel = __decodifica_png__(percorso)
+
+   pixel = pixel.astype(np.float32) / 255
+   canali = pixel.shape[2] if pixel.ndim == 3 else 1
+   if canali in (2, 4):
+      alfa = pixel[...,-1]
+      pixel = pixel[...,:-1]
+   else:
+      alfa = 1.0
+   grigio = pixel.mean(axis=2) if pixel.ndim == 3 else pixel
+   return 1 - alfa*(1 - grigio)
+# endregion
+#---------------------------------------------------------------------------------#
+# GRIGLIA E CELLE
+#---------------------------------------------------------------------------------#
+# region GRIGLIA
+SOGLIA_SCURO = 0.5       # Pixel più scuri di questa soglia sono inchiostro
+SOGLIA_LINEA = 0.5       # Frazione della proiezione massima oltre la quale una riga (o colonna) è una linea della griglia
+BORDO_CELLA = 0.15       # Frazione del lato della cella tolta su ogni lato, per non leggere le linee della griglia
+MINIMO_INCHIOSTRO = 0.02 # Frazione minima di pixel scuri in una cella per considerarla piena
+LATO_CIFRA = 16          # Lato in pixel delle cifre normalizzate
+
+def __linee__(proiezione : np.ndarray) -> np.ndarray:
+   """Centri delle linee della griglia lungo un asse, dalla proiezione dei pixel scuri.
+      Le linee sono i tratti consecutivi con proiezione oltre SOGLIA_LINEA del massimo. Se le linee trovate sono 10
+      vengono usate così come sono, altrimenti (linee sottili perse, scansioni rumorose) le 10 linee vengono
+      distribuite uniformemente tra la prima e l'ultima.
+   """
+   sopra = proiezione > SOGLIA_LINEA*proiezione.max()
+   bordi = np.flatnonzero(np.diff(np.concatenate([[0], sopra.astype(np.int8), [0]])))
+   centri = (bordi[0::2] + bordi[1::2] - 1) / 2
+   if len(centri) < 2:
+      raise ValueError("Griglia del sudoku non trovata")
+   if len(centri) == 10:
+      return centri
+   return np.linspace(centri[0], centri[-1], 10)
+
+def trova_celle(grigio : np.ndarray) -> list:
+   """Divide la griglia in 81 celle.
+      Input:
+         - grigio (np.ndarray) immagine in scala di grigi (vedi 'leggi_immagine').
+      Output:
+         - lista di 81 immagini (una per cella, riga per riga), senza il bordo della cella.
+   """
+   scuro = grigio < SOGLIA_SCURO
+   righe = __linee__(scuro.sum(axis=1))
+   colonne = __linee__(scuro.sum(axis=0))
+   celle = []
+   for r in range(9):
+      margine_r = BORDO_CELLA*(righe[r+1] - righe[r])
+      y0, y1 = int(righe[r] + margine_r), int(math.ceil(righe[r+1] - margine_r))
+      for c in range(9):
+         margine_c = BORDO_CELLA*(colonne[c+1] - colonne[c])
+         x0, x1 = int(colonne[c] + margine_c), int(math.ceil(colonne[c+1] - margine_c))
+         celle.append(grigio[y0:y1, x0:x1])
+   return celle
+
+def __ridimensiona__(immagine : np.ndarray,
+                     lato : int) -> np.ndarray:
+   """Riduce un'immagine a lato x lato pixel con la media dei pixel di ogni blocco (immagine integrale)."""
+   integrale = np.pad(immagine.cumsum(axis=0).cumsum(axis=1), ((1,0),(1,0)))
+   ys = np.linspace(0, immagine.shape[0], lato + 1).round().astype(int)
+   xs = np.linspace(0, immagine.shape[1], lato + 1).round().astype(int)
+   ys[1:] = np.maximum(ys[1:], ys[:-1] + 1)
+   xs[1:] = np.maximum(xs[1:], xs[:-1] + 1)
+   somme = integrale[np.ix_(ys[1:], xs[1:])] - integrale[np.ix_(ys[:-1], xs[1:])] \
+           - integrale[np.ix_(ys[1:], xs[:-1])] + integrale[np.ix_(ys[:-1], xs[:-1])]
+   return somme / np.outer(np.diff(ys), np.diff(xs))
+
+def caratteristiche_cella(cella : np.ndarray) -> np.ndarray:
+   """Vettore delle caratteristiche di una cella, None se la cella è vuota.
+      L'inchiostro della cifra viene ritagliato, centrato in un quadrato (senza deformarlo) e ridotto a LATO_CIFRA x LATO_CIFRA;
+      il vettore è normalizzato (media 0, norma 1), così il prodotto scalare tra due vettori è la loro correlazione.
+   """
+   inchiostro = (cella < SOGLIA_SCURO)
+   if inchiostro.mean() < MINIMO_INCHIOSTRO:
+      return None
+   ys, xs = np.nonzero(inchiostro)
+   ritaglio = 1 - cella[ys.min():ys.max()+1, xs.min():xs.max()+1]
+   altezza, larghezza = ritaglio.shape
+   lato = max(altezza, larghezza)
+   quadrato = np.zeros((lato, lato), dtype=np.float32)
+   y0, x0 = (lato - altezza) // 2, (lato - larghezza) // 2
+   quadrato[y0:y0+altezza, x0:x0+larghezza] = ritaglio
+
+   vettore = __ridimensiona__(quadrato, LATO_CIFRA).ravel()
+   vettore = vettore - vettore.mean()
+   return vettore / (np.linalg.norm(vettore) or 1)
+
+def caratteristiche_immagine(percorso : str) -> list:
+   """Caratteristiche delle 81 celle di un'immagine (None per le celle vuote)."""
+   return [caratteristiche_cella(cella) for cella in trova_celle(leggi_immagine(percorso))]
+# endregion
+#---------------------------------------------------------------------------------#
+# MODELLO
+#---------------------------------------------------------------------------------#
+# region MODELLO
+MODELLO = "Data/modello_cifre.npz"
+
+def __indice_immagine__(percorso : str) -> int:
+   """Posizione in Data/Sudoku.json del record di un'immagine del corpus ("sudoku NN.png" -> NN), None se il nome non corrisponde.
+      Il campo 'indice' dei record non basta: ricomincia da 0 per ogni numero della rivista.
+   """
+   trovato = re.search(r"(\d+)\.png$", os.path.basename(percorso), re.IGNORECASE)
+   return int(trovato.group(1)) if trovato else None
+
+def addestra(caratteristiche : list,
+             schemi : list) -> np.ndarray:
+   """Addestra il modello a template.
+      Input:
+         - caratteristiche (list) per ogni immagine le caratteristiche delle 81 celle (vedi 'caratteristiche_immagine');
+         - schemi (list) per ogni immagine lo schema 9x9 corretto, usato come etichetta delle celle.
+      Output:
+         - template (np.ndarray) formato (9, LATO_CIFRA^2): per ogni cifra da 1 a 9 la media normalizzata delle sue celle.
+   """
+   somme = np.zeros((9, LATO_CIFRA*LATO_CIFRA))
+   for celle, schema in zip(caratteristiche, schemi):
+      for vettore, numero in zip(celle, np.asarray(schema).ravel()):
+         if vettore is not None and numero:
+            somme[numero-1] += vettore
+   if not np.all(somme.any(axis=1)):
+      raise ValueError("Ogni cifra da 1 a 9 deve comparire almeno una volta nelle immagini di addestramento")
+   return somme / np.linalg.norm(somme, axis=1, keepdims=True)
+
+def classifica(caratteristiche : list,
+               template : np.ndarray) -> np.ndarray:
+   """Schema 9x9 dalle caratteristiche delle 81 celle: 0 per le celle vuote, altrimenti la cifra con il template più correlato."""
+   schema = np.zeros(81, dtype=np.int64)
+   piene = [i for i, vettore in enumerate(caratteristiche) if vettore is not None]
+   if piene:
+      correlazioni = np.stack([caratteristiche[i] for i in piene]) @ template.T
+      schema[piene] = correlazioni.argmax(axis=1) + 1
+   return schema.reshape(9,9)
+
+def salva_modello(template : np.ndarray,
+                  percorso : str = MODELLO):
+   np.savez_compressed(percorso, template=template, lato_cifra=LATO_CIFRA)
+
+def carica_modello(percorso : str = MODELLO) -> np.ndarray:
+   """Template salvati da 'salva_modello'."""
+   if not os.path.exists(percorso):
+      raise FileNotFoundError(f"Modello {percorso} non trovato, va prima addestrato con: python immagini.py --addestra")
+   with np.load(percorso) as dati:
+      if int(dati["lato_cifra"]) != LATO_CIFRA:
+         raise ValueError(f"Il modello {percorso} è stato addestrato con cifre di lato {int(dati['lato_cifra'])}, va riaddestrato")
+      return dati["template"]
+# endregion
+#---------------------------------------------------------------------------------#
+# ESTRAZIONE
+#---------------------------------------------------------------------------------#
+# region ESTRAZIONE
+def estrai_schema(percorso : str,
+                  template : np.ndarray = None) -> np.ndarray:
+   """Schema 9x9 di un'immagine (zeri per le celle vuote).
+      Input:
+         - percorso (str) immagine PNG;
+         - template (np.ndarray, default None) modello, se None viene caricato da MODELLO.
+   """
+   if template is None:
+      template = carica_modello()
+   return classifica(caratteristiche_immagine(percorso), template)
+
+def __elabora_blocco__(percorsi : list,
+                       template : np.ndarray) -> list:
+   """Elabora nel processo un blocco di immagini: caratteristiche delle celle e, se c'è un modello, schema estratto."""
+   risultati = []
+   for percorso in percorsi:
+      caratteristiche = caratteristiche_immagine(percorso)
+      risultati.append((caratteristiche, None if template is None else classifica(caratteristiche, template)))
+   return risultati
+
+def __elabora__(percorsi : list,
+                template : np.ndarray,
+                processi : int) -> tuple:
+   """Elabora le immagini su più processi a blocchi.
+      Output:
+         - risultati (list) per ogni immagine (caratteristiche, schema), nello stesso ordine di 'percorsi';
+         - statistiche (dict) {"immagini", "secondi", "immagini_al_secondo"}.
+   """
+   processi = processi or os.cpu_count() or 1
+   inizio = time.perf_counter()
+   risultati = []
+   if percorsi:
+      dimensione_blocco = max(1, math.ceil(len(percorsi) / (processi*4)))
+      blocchi = [percorsi[i:i+dimensione_blocco] for i in range(0, len(percorsi), dimensione_blocco)]
+      with ProcessPoolExecutor(max_workers=min(processi, len(blocchi))) as pool:
+         for blocco in pool.map(__elabora_blocco__, blocchi, [template]*len(blocchi)):
+            risultati.extend(blocco)
+   durata = time.perf_counter() - inizio
+   return risultati, {"immagini": len(percorsi),
+                      "secondi": round(durata, 3),
+                      "immagini_al_secondo": round(len(percorsi) / durata, 2) if durata > 0 else 0.0}
+
+def __percorsi__(cartella : str) -> list:
+   return sorted(glob.glob(os.path.join(cartella, "*.png")) + glob.glob(os.path.join(cartella, "*.PNG")))
+
+def estrai_cartella(cartella : str,
+                    template : np.ndarray = None,
+                    processi : int = None) -> tuple:
+   """Estrae gli schemi di tutte le immagini PNG di una cartella, su più processi.
+      Input:
+         - cartella (str) cartella delle immagini;
+         - template (np.ndarray, default None) modello, se None viene caricato da MODELLO;
+         - processi (int, default None) numero di processi, se None tutti i core disponibili.
+      Output:
+         - schemi (dict) {percorso: schema 9x9};
+         - statistiche (dict) {"immagini", "secondi", "immagini_al_secondo"}.
+   """
+   if template is None:
+      template = carica_modello()
+   percorsi = __percorsi__(cartella)
+   risultati, statistiche = __elabora__(percorsi, template, processi)
+   return {percorso: schema for percorso, (_, schema) in zip(percorsi, risultati)}, statistiche
+
+def verifica(schemi : dict,
+             records : list) -> dict:
+   """Confronta gli schemi estratti dalle immagini del corpus con 'schema_iniziale' dei record (vedi '__indice_immagine__').
+      Output:
+         - dizionario con chiavi:
+            - "immagini" (int) immagini confrontate;
+            - "schemi_corretti" (int) immagini con tutte le 81 celle corrette;
+            - "celle_errate" (int) celle diverse da 'schema_iniziale';
+            - "accuratezza_celle" (float) frazione delle celle corrette;
+            - "errori" (dict) {percorso: [(riga, colonna, letto, atteso), ...]} per le immagini con errori.
+   """
+   per_indice = dict(enumerate(records))
+   immagini, corretti, celle_errate, errori = 0, 0, 0, {}
+   for percorso, schema in schemi.items():
+      record = per_indice.get(__indice_immagine__(percorso))
+      if record is None:
+         continue
+      atteso = np.asarray(record["schema_iniziale"])
+      diverse = np.argwhere(schema != atteso)
+      immagini += 1
+      corretti += len(diverse) == 0
+      celle_errate += len(diverse)
+      if len(diverse):
+         errori[percorso] = [(int(r), int(c), int(schema[r,c]), int(atteso[r,c])) for r, c in diverse]
+   return {"immagini": immagini,
+           "schemi_corretti": corretti,
+           "celle_errate": celle_errate,
+           "accuratezza_celle": round(1 - celle_errate / max(1, 81*immagini), 5),
+           "errori": errori}
+
+def addestra_cartella(cartella : str,
+                      records : list,
+                      processi : int = None) -> np.ndarray:
+   """Addestra il modello sulle immagini del corpus di una cartella, con 'schema_iniziale' dei record come etichette."""
+   per_indice = dict(enumerate(records))
+   percorsi = [p for p in __percorsi__(cartella) if __indice_immagine__(p) in per_indice]
+   risultati, _ = __elabora__(percorsi, None, processi)
+   return addestra([caratteristiche for caratteristiche, _ in risultati],
+                   [per_indice[__indice_immagine__(p)]["schema_iniziale"] for p in percorsi])
+
+def validazione(cartella : str,
+                records : list,
+                processi : int = None) -> dict:
+   """Validazione incrociata a due blocchi: modello addestrato sulle immagini pari e verificato sulle dispari, e viceversa.
+      Le caratteristiche vengono calcolate una sola volta. Output come 'verifica', con in più le statistiche di elaborazione.
+   """
+   per_indice = dict(enumerate(records))
+   percorsi = [p for p in __percorsi__(cartella) if __indice_immagine__(p) in per_indice]
+   risultati, statistiche = __elabora__(percorsi, None, processi)
+   schemi = {}
+   for parte in (0, 1):
+      addestramento = [i for i in range(len(percorsi)) if i % 2 != parte]
+      template = addestra([risultati[i][0] for i in addestramento],
+                          [per_indice[__indice_immagine__(percorsi[i])]["schema_iniziale"] for i in addestramento])
+      for i in range(parte, len(percorsi), 2):
+         schemi[percorsi[i]] = classifica(risultati[i][0], template)
+   esito = verifica(schemi, records)
+   esito.update(statistiche)
+   return esito
+# endregion
+
+if __name__ == "__main__":
+   import argparse
+
+   parser = argparse.ArgumentParser(description="Estrarre gli schemi di sudoku da una cartella di immagini PNG.")
+   parser.add_argument("cartella", nargs="?", default="Data/Immagini", help="cartella delle immagini")
+   parser.add_argument("--corpus", default="Data/Sudoku.json", help="corpus json con gli schemi corretti")
+   parser.add_argument("--modello", default=MODELLO, help="file del modello a template")
+   parser.add_argument("--processi", type=int, default=None, help="numero di processi (default: tutti i core)")
+   parser.add_argument("--addestra", action="store_true", help="addestrare il modello sulle immagini del corpus e salvarlo")
+   parser.add_argument("--verifica", action="store_true", help="confrontare gli schemi estratti con il corpus")
+   parser.add_argument("--validazione", action="store_true", help="validazione incrociata a due blocchi sul corpus")
+   parser.add_argument("--output", default=None, help="file json in cui salvare gli schemi estratti")
+   args = parser.parse_args()
+
+   records = None
+   if args.addestra or args.verifica or args.validazione:
+      with open(args.corpus, encoding="utf-8") as f:
+         records = json.load(f)
+
+   def mostra(esito):
+      print(f"{esito['schemi_corretti']}/{esito['immagini']} schemi estratti correttamente, "
+            f"{esito['celle_errate']} celle errate (accuratezza {100*esito['accuratezza_celle']:.3f}%).")
+      for percorso, errori in esito["errori"].items():
+         print(f"   {os.path.basename(percorso)}: " + ", ".join(f"({r+1},{c+1}) letto {l} atteso {a}" for r, c, l, a in errori))
+
+   if args.validazione:
+      esito = validazione(args.cartella, records, args.processi)
+      print(f"{esito['immagini']} immagini in {esito['secondi']:.2f} secondi ({esito['immagini_al_secondo']:.1f} immagini/s).")
+      mostra(esito)
+   else:
+      if args.addestra:
+         salva_modello(addestra_cartella(args.cartella, records, args.processi), args.modello)
+         print(f"Modello salvato in {args.modello}.")
+      schemi, statistiche = estrai_cartella(args.cartella, carica_modello(args.modello), args.processi)
+      print(f"{statistiche['immagini']} immagini in {statistiche['secondi']:.2f} secondi "
+            f"({statistiche['immagini_al_secondo']:.1f} immagini/s).")
+      if args.verifica:
+         mostra(verifica(schemi, records))
+      if args.output:
+         with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({os.path.basename(p): s.tolist() for p, s in schemi.items()}, f, indent=3)
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Servizio asyncio per risolvere, controllare e suggerire sudoku, con richieste raggruppate in micro-batch.
+
+   Protocollo: una richiesta json per riga, una risposta json per riga (le risposte arrivano appena pronte, non in ordine,
+   e vanno associate alle richieste tramite "id"). Disponibile su TCP oppure su stdin/stdout.
+      richiesta: {"id": 1, "op": "solve" | "check" | "suggest" | "metriche", "schema": [[...9x9...]],
+                  "attuale": [[...]] (solo suggest, schema dell'utente), "scadenza": secondi (opzionale)}
+      risposta:  {"id": 1, "ok": true, "risultato": {...}, "latenza_ms": 1.2}
+                 {"id": 1, "ok": false, "errore": "...", "latenza_ms": 5000.0}
+
+   Le richieste in attesa vengono raccolte per al massimo 'attesa_batch' secondi (o fino a 'dimensione_batch' richieste)
+   ed eseguite insieme in un processo del pool, così l'event loop non resta mai bloccato su 'sudoku.solve' e il costo di
+   invio al processo viene ammortizzato. Ogni richiesta ha una scadenza: allo scadere riceve subito una risposta di errore,
+   se è ancora in coda viene scartata, se è già in un processo viene interrotta (solve) o saltata (vedi '__esegui_batch__').
+
+   Esempio:
+      python service.py --porta 8765
+      echo '{"id": 1, "op": "solve", "schema": [[0,0,...]]}' | python service.py --stdio
+"""
+
+import asyncio
+import collections
+import json
+import math
+import os
+import signal
+import stat
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from corpus import __risolvi_record__
+from sudoku import check_many, nome_unita, sudoku
+#---------------------------------------------------------------------------------#
+# ESECUZIONE NEI PROCESSI
+#---------------------------------------------------------------------------------#
+# region WORKER
+OPERAZIONI = ("solve", "check", "suggest")
+
+def __scadenza_valida__(scadenza) -> bool:
+   """True se la scadenza di una richiesta è un numero di secondi finito e maggiore di 0."""
+   return (isinstance(scadenza, (int, float)) and not isinstance(scadenza, bool)
+           and math.isfinite(scadenza) and scadenza > 0)
+
+# Istanze 'sudoku' usate di recente da 'suggest' nel processo, con la soluzione già calcolata (vedi 'sudoku.next_step').
+__ISTANZE__ = OrderedDict()
+CAPACITA_ISTANZE = 256
+
+def __istanza__(schema : list) -> sudoku:
+   """Istanza 'sudoku' dello schema, riutilizzata tra richieste 'suggest' successive sullo stesso schema."""
+   chiave = np.asarray(schema, dtype=np.uint8).tobytes()
+   S = __ISTANZE__.get(chiave)
+   if S is None:
+      S = sudoku(schema)
+      __ISTANZE__[chiave] = S
+      if len(__ISTANZE__) > CAPACITA_ISTANZE:
+         __ISTANZE__.popitem(last=False)
+   else:
+      __ISTANZE__.move_to_end(chiave)
+   return S
+
+def __esegui_batch__(lavori : list,
+                     engine : str) -> list:
+   """Esegue un micro-batch di richieste nel processo.
+      I controlli ('check') del batch vengono fatti tutti insieme con 'check_many', le altre richieste una alla volta.
+      Le richieste già scadute quando il processo arriva a loro vengono saltate, 'solve' viene interrotto alla scadenza.
+      Input:
+         - lavori (list) richieste (op, schema, attuale, scadenza) con scadenza in secondi dell'orologio di sistema (time.time);
+         - engine (str) engine passato a 'sudoku.solve'.
+      Output:
+         - lista di coppie (ok, risultato o messaggio di errore), nello stesso ordine dei lavori.
+   """
+   esiti = [None]*len(lavori)
+
+   # Gli schemi con forma sbagliata vengono controllati uno alla volta sotto, così l'errore resta della sola richiesta
+   controlli = [i for i, (op, schema, _, _) in enumerate(lavori) if op == "check" and np.shape(schema) == (9,9)]
+   if controlli:
+      validi, unita = check_many(np.array([lavori[i][1] for i in controlli]), return_units=True)
+      for i, valido, u in zip(controlli, validi.tolist(), unita.tolist()):
+         esiti[i] = (True, {"corretto": valido, "unita": None if valido else nome_unita(u)})
+
+   for i, (op, schema, attuale, scadenza) in enumerate(lavori):
+      if esiti[i] is not None:
+         continue
+      rimanente = scadenza - time.time()
+      if rimanente <= 0:
+         esiti[i] = (False, "Scadenza superata prima dell'esecuzione")
+         continue
+      try:
+         if op == "solve":
+            risultato = __risolvi_record__(schema, engine, timeout=rimanente)
+            esiti[i] = (False, risultato["errore"]) if risultato["errore"] else (True, risultato)
+         elif op == "check":
+            esiti[i] = (True, {"corretto": bool(sudoku(schema).check()), "unita": None})
+         else:
+            passo = __istanza__(schema).next_step(attuale)
+            esiti[i] = (True, passo)
+      except Exception as e:
+         esiti[i] = (False, f"{type(e).__name__}: {e}")
+   return esiti
+# endregion
+#---------------------------------------------------------------------------------#
+# SERVIZIO
+#---------------------------------------------------------------------------------#
+# region SERVIZIO
+class servizio_sudoku:
+   """Servizio asincrono: le richieste arrivano da 'richiesta' (o dai server TCP e stdin/stdout), vengono messe in coda,
+      raggruppate in micro-batch ed eseguite su un pool di processi.
+      Uso:
+         async with servizio_sudoku(processi=4) as servizio:
+            risposta = await servizio.richiesta("solve", schema, scadenza=2.0)
+   """
+   def __init__(self,
+                processi : int = None,
+                dimensione_batch : int = 32,
+                attesa_batch : float = 0.002,
+                scadenza : float = 5.0,
+                engine : str = "tecniche",
+                campioni_latenza : int = 1024):
+      """Input:
+            - processi (int, default None) numero di processi del pool, se None tutti i core disponibili;
+            - dimensione_batch (int, default 32) richieste massime per batch;
+            - attesa_batch (float, default 0.002) secondi di attesa massima per riempire un batch dopo la prima richiesta;
+            - scadenza (float, default 5.0) scadenza predefinita di ogni richiesta in secondi;
+            - engine (str, default "tecniche") engine passato a 'sudoku.solve';
+            - campioni_latenza (int, default 1024) latenze più recenti usate per i percentili di 'metriche'.
+      """
+      self.processi = processi or os.cpu_count() or 1
+      self.dimensione_batch = dimensione_batch
+      self.attesa_batch = attesa_batch
+      self.scadenza = scadenza
+      self.engine = engine
+
+      self.__pool__ = None
+      self.__coda__ = None
+      self.__raccoglitore__ = None
+      self.__batch_in_volo__ = set()
+      self.__posti_liberi__ = None
+
+      # Metriche (vedi 'metriche')
+      self.__contatori__ = collections.Counter()
+      self.__in_esecuzione__ = 0
+      self.__latenze__ = {op: collections.deque(maxlen=campioni_latenza) for op in OPERAZIONI}
+      self.__dimensioni_batch__ = collections.deque(maxlen=campioni_latenza)
+
+   async def avvia(self):
+      """Crea il pool di processi e avvia il raccoglitore dei batch."""
+      self.__pool__ = ProcessPoolExecutor(max_workers=self.processi)
+      # Avviare subito i processi (import di numpy e sudoku), così le prime richieste non ne pagano il costo
+      loop = asyncio.get_running_loop()
+      await asyncio.gather(*[loop.run_in_executor(self.__pool__, __esegui_batch__, [], self.engine) for _ in range(self.processi)])
+      self.__coda__ = asyncio.Queue()
+      # Al massimo due batch in volo per processo: uno in esecuzione ed uno pronto, il resto aspetta in coda
+      self.__posti_liberi__ = asyncio.Semaphore(2*self.processi)
+      self.__raccoglitore__ = asyncio.create_task(self.__raccogli__())
+
+   async def chiudi(self):
+      """Ferma il raccoglitore, attende i batch in volo e chiude il pool."""
+      if self.__raccoglitore__ is not None:
+         self.__raccoglitore__.cancel()
+         await asyncio.gather(self.__raccoglitore__, return_exceptions=True)
+         self.__raccoglitore__ = None
+      if self.__batch_in_volo__:
+         await asyncio.gather(*self.__batch_in_volo__, return_exceptions=True)
+      if self.__pool__ is not None:
+         self.__pool__.shutdown(wait=True, cancel_futures=True)
+         self.__pool__ = None
+
+   async def __aenter__(self):
+      await self.avvia()
+      return self
+
+   async def __aexit__(self, *args):
+      await self.chiudi()
+
+   #---------------------------------------------------------------------------------#
+   # RICHIESTE
+   async def richiesta(self,
+                       op : str,
+                       schema : list,
+                       attuale : list = None,
+                       scadenza : float = None) -> dict:
+      """Esegue una richiesta e ne attende la risposta.
+         Input:
+            - op (str) "solve", "check" o "suggest";
+            - schema (list) schema 9x9 (per "check" lo schema da controllare);
+            - attuale (list, default None) solo "suggest": schema attuale dell'utente, se None lo schema originale;
+            - scadenza (float, default None) secondi massimi per la risposta, se None quella predefinita del servizio.
+         Output:
+            - dizionario {"ok": bool, "risultato" oppure "errore", "latenza_ms"}.
+         Se chi attende viene cancellato (es. connessione chiusa) la richiesta viene scartata se ancora in coda.
+      """
+      inizio = time.perf_counter()
+      self.__contatori__["ricevute"] += 1
+      if op not in OPERAZIONI:
+         self.__contatori__["errori"] += 1
+         return {"ok": False, "errore": f"Operazione non riconosciuta: {op}", "latenza_ms": 0.0}
+
+      if scadenza is not None and not __scadenza_valida__(scadenza):
+         raise ValueError(f"Scadenza non valida: {scadenza!r}, deve essere un numero di secondi maggiore di 0")
+      scadenza = self.scadenza if scadenza is None else float(scadenza)
+      futuro = asyncio.get_running_loop().create_future()
+      await self.__coda__.put((op, schema, attuale, time.time() + scadenza, futuro))
+      try:
+         ok, esito = await asyncio.wait_for(futuro, timeout=scadenza)
+      except asyncio.TimeoutError:
+         ok, esito = False, f"Scadenza di {scadenza} secondi superata"
+         self.__contatori__["scadute"] += 1
+
+      latenza = time.perf_counter() - inizio
+      self.__latenze__[op].append(latenza)
+      self.__contatori__["completate" if ok else "errori"] += 1
+      risposta = {"ok": ok, "latenza_ms": round(1000*latenza, 3)}
+      risposta["risultato" if ok else "errore"] = esito
+      return risposta
+
+   async def __raccogli__(self):
+      """Raccoglie le richieste in coda in batch e li invia al pool, senza superare i batch in volo ammessi."""
+      while True:
+         await self.__posti_liberi__.acquire()
+         batch = [await self.__coda__.get()]
+         limite = time.perf_counter() + self.attesa_batch
+         while len(batch) < self.dimensione_batch:
+            attesa = limite - time.perf_counter()
+            try:
+               batch.append(self.__coda__.get_nowait() if self.__coda__.qsize() or attesa <= 0
+                            else await asyncio.wait_for(self.__coda__.get(), timeout=attesa))
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+               break
+
+         # Scartare le richieste già scadute o abbandonate mentre erano in coda
+         batch = [lavoro for lavoro in batch if not lavoro[4].done()]
+         if not batch:
+            self.__posti_liberi__.release()
+            continue
+         compito = asyncio.create_task(self.__esegui__(batch))
+         self.__batch_in_volo__.add(compito)
+         compito.add_done_callback(self.__batch_in_volo__.discard)
+
+   async def __esegui__(self,
+                        batch : list):
+      """Esegue un batch nel pool e consegna le risposte alle richieste ancora in attesa."""
+      self.__in_esecuzione__ += len(batch)
+      self.__dimensioni_batch__.append(len(batch))
+      self.__contatori__["batch"] += 1
+      lavori = [(op, schema, attuale, scadenza) for op, schema, attuale, scadenza, _ in batch]
+      try:
+         esiti = await asyncio.get_running_loop().run_in_executor(self.__pool__, __esegui_batch__, lavori, self.engine)
+      except BrokenProcessPool:
+         # Un processo è terminato in modo anomalo: errore per tutto il batch e nuovo pool per i successivi
+         self.__pool__.shutdown(wait=False)
+         self.__pool__ = ProcessPoolExecutor(max_workers=self.processi)
+         self.__contatori__["pool_riavviati"] += 1
+         esiti = [(False, "Processo terminato durante l'esecuzione")]*len(batch)
+      except Exception as e:
+         esiti = [(False, f"{type(e).__name__}: {e}")]*len(batch)
+      finally:
+         self.__in_esecuzione__ -= len(batch)
+         self.__posti_liberi__.release()
+
+      for (_, _, _, _, futuro), esito in zip(batch, esiti):
+         if not futuro.done():
+            futuro.set_result(esito)
+
+   #---------------------------------------------------------------------------------#
+   # METRICHE
+   def metriche(self) -> dict:
+      """Stato del servizio.
+         Output:
+            - dizionario con:
+               - "in_coda" richieste in attesa di un batch, "in_esecuzione" richieste nei processi;
+               - "contatori" richieste ricevute, completate, con errore, scadute, batch eseguiti, pool riavviati;
+               - "dimensione_media_batch" sugli ultimi batch;
+               - "latenza_ms" per operazione: p50, p95, p99 e massimo sulle ultime richieste.
+      """
+      latenze = {}
+      for op, campioni in self.__latenze__.items():
+         if campioni:
+            ms = 1000*np.array(campioni)
+            latenze[op] = {"richieste": len(ms),
+                           "p50": round(float(np.percentile(ms, 50)), 3),
+                           "p95": round(float(np.percentile(ms, 95)), 3),
+                           "p99": round(float(np.percentile(ms, 99)), 3),
+                           "max": round(float(ms.max()), 3)}
+      return {"in_coda": self.__coda__.qsize() if self.__coda__ is not None else 0,
+              "in_esecuzione": self.__in_esecuzione__,
+              "contatori": dict(self.__contatori__),
+              "dimensione_media_batch": round(float(np.mean(self.__dimensioni_batch__)), 2) if self.__dimensioni_batch__ else 0.0,
+              "latenza_ms": latenze}
+
+   #---------------------------------------------------------------------------------#
+   # PROTOCOLLO A RIGHE
+   async def __rispondi__(self,
+                          riga : str) -> dict:
+      """Esegue la richiesta json contenuta in una riga e restituisce la risposta (con lo stesso "id")."""
+      try:
+         messaggio = json.loads(riga)
+      except json.JSONDecodeError as e:
+         return {"id": None, "ok": False, "errore": f"Richiesta non valida: {e}"}
+      if not isinstance(messaggio, dict):
+         return {"id": None, "ok": False, "errore": "La richiesta deve essere un oggetto json"}
+
+      scadenza = messaggio.get("scadenza")
+      if scadenza is not None and not __scadenza_valida__(scadenza):
+         return {"id": messaggio.get("id"), "ok": False,
+                 "errore": f"Scadenza non valida: {scadenza!r}, deve essere un numero di secondi maggiore di 0"}
+
+      if messaggio.get("op") == "metriche":
+         risposta = {"ok": True, "risultato": self.metriche()}
+      else:
+         risposta = await self.richiesta(messaggio.get("op"), messaggio.get("schema"),
+                                         messaggio.get("attuale"), messaggio.get("scadenza"))
+      return {"id": messaggio.get("id"), **risposta}
+
+   async def __servi_flusso__(self,
+                              reader : asyncio.StreamReader,
+                              scrivi):
+      """Legge richieste da 'reader' finché non si chiude, gestendole in parallelo; 'scrivi' è la coroutine che invia una risposta."""
+      compiti = set()
+
+      async def gestisci(riga):
+         risposta = await self.__rispondi__(riga)
+         await scrivi((json.dumps(risposta, ensure_ascii=False, default=int) + "\n").encode("utf-8"))
+
+      try:
+         while True:
+            riga = await reader.readline()
+            if not riga:
+               break
+            if riga.strip():
+               compito = asyncio.create_task(gestisci(riga.decode("utf-8")))
+               compiti.add(compito)
+               compito.add_done_callback(compiti.discard)
+         # Fine dell'input: attendere le risposte ancora in sospeso
+         await asyncio.gather(*compiti, return_exceptions=True)
+      finally:
+         for compito in compiti:
+            compito.cancel()
+
+   async def servi_tcp(self,
+                       host : str = "127.0.0.1",
+                       porta : int = 8765):
+      """Serve il protocollo a righe su TCP finché non viene cancellato."""
+      async def connessione(reader, writer):
+         async def scrivi(dati):
+            writer.write(dati)
+            await writer.drain()
+         try:
+            await self.__servi_flusso__(reader, scrivi)
+         except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+         finally:
+            writer.close()
+
+      server = await asyncio.start_server(connessione, host, porta)
+      async with server:
+         await server.serve_forever()
+
+   async def servi_stdio(self):
+      """Serve il protocollo a righe su stdin/stdout, termina quando stdin viene chiuso."""
+      loop = asyncio.get_running_loop()
+      reader = asyncio.StreamReader()
+      lettore = None
+      modo = os.fstat(sys.stdin.fileno()).st_mode
+      if stat.S_ISFIFO(modo) or stat.S_ISSOCK(modo) or stat.S_ISCHR(modo):
+         await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+      else:
+         # File normale (es. 'python service.py --stdio < richieste.jsonl'): non è supportato da connect_read_pipe,
+         # le righe vengono lette in un thread e passate al reader
+         async def leggi_file():
+            while True:
+               riga = await loop.run_in_executor(None, sys.stdin.buffer.readline)
+               if not riga:
+                  break
+               reader.feed_data(riga)
+            reader.feed_eof()
+         lettore = asyncio.create_task(leggi_file())
+
+      async def scrivi(dati):
+         sys.stdout.buffer.write(dati)
+         sys.stdout.buffer.flush()
+
+      try:
+         await self.__servi_flusso__(reader, scrivi)
+      finally:
+         if lettore is not None:
+            lettore.cancel()
+# endregion
+
+if __name__ == "__main__":
+   import argparse
+
+   parser = argparse.ArgumentParser(description="Servizio per risolvere, controllare e suggerire sudoku (una richiesta json per riga).")
+   parser.add_argument("--stdio", action="store_true", help="leggere le richieste da stdin e scrivere le risposte su stdout")
+   parser.add_argument("--host", default="127.0.0.1")
+   parser.add_argument("--porta", type=int, default=8765)
+   parser.add_argument("--processi", type=int, default=None, help="numero di processi (default: tutti i core)")
+   parser.add_argument("--dimensione-batch", type=int, default=32, help="richieste massime per batch")
+   parser.add_argument("--attesa-batch", type=float, default=0.002, help="secondi di attesa per riempire un batch")
+   parser.add_argument("--scadenza", type=float, default=5.0, help="scadenza predefinita delle richieste in secondi")
+   parser.add_argument("--engine", default="tecniche", choices=["tecniche","ricerca","dlx"])
+   args = parser.parse_args()
+
+   async def main():
+      # SIGTERM ferma il servizio come Ctrl-C, chiudendo il pool invece di lasciare orfani i processi
+      try:
+         asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+      except NotImplementedError:
+         pass
+      async with servizio_sudoku(processi=args.processi, dimensione_batch=args.dimensione_batch,
+                                 attesa_batch=args.attesa_batch, scadenza=args.scadenza, engine=args.engine) as servizio:
+         if args.stdio:
+            await servizio.servi_stdio()
+         else:
+            print(f"Servizio in ascolto su {args.host}:{args.porta}", file=sys.stderr)
+            await servizio.servi_tcp(args.host, args.porta)
+
+   try:
+      asyncio.run(main())
+   except (KeyboardInterrupt, asyncio.CancelledError):
+      pass
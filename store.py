@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Archivio persistente su disco delle soluzioni, condiviso tra sessioni e processi.
+
+   Le soluzioni sono salvate in un database SQLite, con chiave lo schema iniziale codificato in 81 byte
+   (una cella per byte, come 'schema_compatto'). Per ogni schema vengono salvati la soluzione, l'esito,
+   l'engine usato e la traccia dei numeri aggiunti ('mappatura_numeri_aggiunti', usata da 'suggest').
+   Il database è in modalità WAL: più processi possono leggere e scrivere contemporaneamente, le scritture
+   concorrenti attendono il proprio turno fino a 'timeout' secondi.
+
+   Uso:
+      archivio = archivio_soluzioni("Data/soluzioni.sqlite")
+      S = sudoku(schema)
+      S.solve(archivio=archivio)   # se lo schema è già in archivio non viene risolto di nuovo
+
+   Riempimento da un corpus json:
+      python store.py Data/Sudoku.json --archivio Data/soluzioni.sqlite
+"""
+
+import math
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union
+
+import numpy as np
+
+from sudoku import sudoku
+#---------------------------------------------------------------------------------#
+# CODIFICA
+#---------------------------------------------------------------------------------#
+# region CODIFICA
+def __codifica_schema__(schema : Union[list, np.ndarray]) -> bytes:
+   """Schema 9x9 -> 81 byte, una cella per byte riga per riga."""
+   griglia = np.asarray(schema)
+   if griglia.shape != (9,9):
+      raise TypeError("La matrice deve essere in formato 9x9")
+   return griglia.astype(np.uint8).tobytes()
+
+def __codifica_traccia__(mappatura : dict) -> bytes:
+   """'mappatura_numeri_aggiunti' -> 2 byte per numero aggiunto (indice della cella, numero), in ordine di inserimento."""
+   traccia = bytearray()
+   for passo in sorted(mappatura):
+      riga, colonna = mappatura[passo]["cella"]
+      traccia += bytes((riga*9 + colonna, mappatura[passo]["soluzione"]))
+   return bytes(traccia)
+
+def __decodifica_traccia__(traccia : bytes) -> dict:
+   """Inverso di '__codifica_traccia__'."""
+   return {passo + 1: {"cella": divmod(traccia[2*passo], 9), "soluzione": traccia[2*passo + 1]}
+           for passo in range(len(traccia) // 2)}
+# endregion
+#---------------------------------------------------------------------------------#
+# ARCHIVIO
+#---------------------------------------------------------------------------------#
+# region ARCHIVIO
+class archivio_soluzioni:
+   """Archivio SQLite delle soluzioni.
+      La connessione viene aperta alla prima richiesta ed è legata al processo che l'ha aperta: l'oggetto può essere
+      passato ad altri processi (pickle o fork), ognuno aprirà la propria connessione sullo stesso file.
+   """
+   def __init__(self,
+                percorso : str = "Data/soluzioni.sqlite",
+                timeout : float = 30.0):
+      """Input:
+            - percorso (str, default "Data/soluzioni.sqlite") file del database, creato se non esiste;
+            - timeout (float, default 30.0) secondi di attesa massima quando un altro processo sta scrivendo.
+      """
+      self.percorso = percorso
+      self.timeout = timeout
+      self.__connessione__ = None
+      self.__pid__ = None
+
+   def __connetti__(self) -> sqlite3.Connection:
+      """Connessione del processo corrente, aperta (e tabella creata) se necessario."""
+      if self.__connessione__ is None or self.__pid__ != os.getpid():
+         connessione = sqlite3.connect(self.percorso, timeout=self.timeout, isolation_level=None)
+         connessione.execute("PRAGMA journal_mode=WAL")
+         connessione.execute("PRAGMA synchronous=NORMAL")
+         connessione.execute("""CREATE TABLE IF NOT EXISTS soluzioni (
+                                   schema    BLOB PRIMARY KEY,
+                                   soluzione BLOB NOT NULL,
+                                   risolto   INTEGER NOT NULL,
+                                   traccia   BLOB NOT NULL,
+                                   engine    TEXT NOT NULL
+                                ) WITHOUT ROWID""")
+         self.__connessione__ = connessione
+         self.__pid__ = os.getpid()
+      return self.__connessione__
+
+   def cerca(self,
+             schema : Union[list, np.ndarray]) -> dict:
+      """Cerca uno schema nell'archivio.
+         Input:
+            - schema ((list, np.ndarray)) schema iniziale 9x9.
+         Output:
+            - None se lo schema non è in archivio, altrimenti dizionario con chiavi:
+               - "soluzione" (np.ndarray) schema 9x9 restituito da 'solve';
+               - "solved" (bool) esito della risoluzione;
+               - "mappatura_numeri_aggiunti" (dict) traccia dei numeri aggiunti;
+               - "engine" (str) engine usato per risolverlo.
+      """
+      riga = self.__connetti__().execute("SELECT soluzione, risolto, traccia, engine FROM soluzioni WHERE schema = ?",
+                                         (__codifica_schema__(schema),)).fetchone()
+      if riga is None:
+         return None
+      soluzione, risolto, traccia, engine = riga
+      return {"soluzione": np.frombuffer(soluzione, dtype=np.uint8).reshape(9,9).astype(np.int64),
+              "solved": bool(risolto),
+              "mappatura_numeri_aggiunti": __decodifica_traccia__(traccia),
+              "engine": engine}
+
+   def salva(self,
+             S : sudoku):
+      """Salva il risultato di un'istanza 'sudoku' dopo 'solve'. Se lo schema è già presente viene tenuto quello salvato per primo."""
+      self.__connetti__().execute("INSERT OR IGNORE INTO soluzioni VALUES (?,?,?,?,?)",
+                                  (__codifica_schema__(S.original_schema),
+                                   __codifica_schema__(S.sudoku),
+                                   int(S.solved),
+                                   __codifica_traccia__(S.mappatura_numeri_aggiunti),
+                                   S.engine))
+
+   def contiene(self,
+                schemi : list) -> set:
+      """Codifiche (81 byte) degli schemi in 'schemi' già presenti in archivio."""
+      chiavi = [__codifica_schema__(schema) for schema in schemi]
+      presenti = set()
+      connessione = self.__connetti__()
+      for i in range(0, len(chiavi), 500): # Limite di parametri per query di SQLite
+         blocco = chiavi[i:i+500]
+         segnaposto = ",".join("?"*len(blocco))
+         presenti.update(r[0] for r in connessione.execute(f"SELECT schema FROM soluzioni WHERE schema IN ({segnaposto})", blocco))
+      return presenti
+
+   def chiudi(self):
+      if self.__connessione__ is not None and self.__pid__ == os.getpid():
+         self.__connessione__.close()
+      self.__connessione__ = None
+
+   def __len__(self) -> int:
+      return self.__connetti__().execute("SELECT COUNT(*) FROM soluzioni").fetchone()[0]
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, *args):
+      self.chiudi()
+
+   def __getstate__(self) -> dict:
+      # La connessione non può essere passata ad un altro processo, verrà riaperta
+      return {"percorso": self.percorso, "timeout": self.timeout}
+
+   def __setstate__(self, stato : dict):
+      self.__init__(**stato)
+# endregion
+#---------------------------------------------------------------------------------#
+# RIEMPIMENTO DA CORPUS
+#---------------------------------------------------------------------------------#
+# region RIEMPIMENTO
+def __riempi_blocco__(archivio : archivio_soluzioni,
+                      schemi : list,
+                      engine : str) -> int:
+   """Risolve nel processo un blocco di schemi salvando i risultati in archivio. Restituisce il numero di schemi risolti."""
+   risolti = 0
+   for schema in schemi:
+      S = sudoku(schema)
+      S.solve(engine=engine, archivio=archivio)
+      risolti += bool(S.solved)
+   archivio.chiudi()
+   return risolti
+
+def riempi(archivio : archivio_soluzioni,
+           records : list,
+           processi : int = None,
+           engine : str = "tecniche") -> dict:
+   """Riempie l'archivio con le soluzioni di un corpus, su più processi che scrivono direttamente nell'archivio.
+      Input:
+         - archivio (archivio_soluzioni) archivio da riempire;
+         - records (list) record nel formato di Data/Sudoku.json o schemi 9x9;
+         - processi (int, default None) numero di processi, se None tutti i core disponibili;
+         - engine (str, default "tecniche") engine passato a 'sudoku.solve'.
+      Output:
+         - dizionario con il numero di schemi nel corpus, già presenti in archivio, aggiunti e risolti.
+   """
+   schemi = [np.asarray(r["schema_iniziale"] if isinstance(r, dict) else r) for r in records]
+   presenti = archivio.contiene(schemi)
+   da_risolvere = list({__codifica_schema__(s): s for s in schemi if __codifica_schema__(s) not in presenti}.values())
+
+   risolti = 0
+   if da_risolvere:
+      processi = processi or os.cpu_count() or 1
+      dimensione_blocco = max(1, math.ceil(len(da_risolvere) / (processi*4)))
+      blocchi = [da_risolvere[i:i+dimensione_blocco] for i in range(0, len(da_risolvere), dimensione_blocco)]
+      with ProcessPoolExecutor(max_workers=processi) as pool:
+         risolti = sum(pool.map(__riempi_blocco__, [archivio]*len(blocchi), blocchi, [engine]*len(blocchi)))
+
+   return {"schemi": len(schemi),
+           "gia_presenti": len(presenti),
+           "aggiunti": len(da_risolvere),
+           "risolti": risolti}
+# endregion
+
+if __name__ == "__main__":
+   import argparse
+   import json
+
+   parser = argparse.ArgumentParser(description="Riempire l'archivio delle soluzioni con un corpus di sudoku in formato json.")
+   parser.add_argument("percorso", nargs="?", default="Data/Sudoku.json", help="file json del corpus")
+   parser.add_argument("--archivio", default="Data/soluzioni.sqlite", help="file SQLite dell'archivio")
+   parser.add_argument("--processi", type=int, default=None, help="numero di processi (default: tutti i core)")
+   parser.add_argument("--engine", default="tecniche", choices=["tecniche","ricerca","dlx"])
+   args = parser.parse_args()
+
+   with open(args.percorso, encoding="utf-8") as f:
+      records = json.load(f)
+
+   inizio = time.perf_counter()
+   with archivio_soluzioni(args.archivio) as archivio:
+      esito = riempi(archivio, records, processi=args.processi, engine=args.engine)
+      totale = len(archivio)
+   print(f"{esito['schemi']} sudoku nel corpus: {esito['gia_presenti']} già in archivio, {esito['aggiunti']} aggiunti "
+         f"({esito['risolti']} risolti) in {time.perf_counter() - inizio:.2f} secondi. Schemi in archivio: {totale}.")
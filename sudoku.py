@@ -3,8 +3,536 @@
 
 
 from typing import Union  # per specificare campi multipli nelll'input funzione
+import functools
+import itertools
+import math
+import random
+import sys
+import time
 import numpy as np
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+#---------------------------------------------------------------------------------#
+# MASCHERE DI BIT
+#---------------------------------------------------------------------------------#
+# I numeri presenti in una riga, colonna o quadrante vengono salvati come maschere di bit a 9 bit:
+# il bit (n-1) acceso indica che il numero n è presente.
+TUTTI_I_NUMERI = 0b111111111 # Maschera con tutti i numeri da 1 a 9
+
+# Tabella di conversione maschera -> numeri, calcolata una sola volta all'import del modulo.
+# Es. NUMERI_DA_MASCHERA[0b000000101] = (1, 3)
+NUMERI_DA_MASCHERA = tuple(tuple(n for n in range(1,10) if maschera & (1 << (n-1))) for maschera in range(TUTTI_I_NUMERI+1))
+
+# Numero di bit accesi (numero di candidati) per ogni maschera.
+CONTEGGIO_BIT = tuple(len(numeri) for numeri in NUMERI_DA_MASCHERA)
+
+# Per ogni cella, indicizzata da 0 a 80 (indice = riga*9 + colonna), la tupla (riga, colonna, quadrante).
+# Il quadrante va da 0 a 8, stesso ordine di 'coordinate_quadranti' (quadrante 1 -> 0).
+CELLE = tuple((i // 9, i % 9, (i // 27)*3 + (i % 9)//3) for i in range(81))
+
+# Per ogni cella la tupla (riga, colonna).
+COORDINATE = tuple((i // 9, i % 9) for i in range(81))
+
+# Unità (righe, colonne e quadranti) come tuple di indici di cella.
+UNITA_RIGHE = tuple(tuple(i for i in range(81) if CELLE[i][0] == u) for u in range(9))
+UNITA_COLONNE = tuple(tuple(i for i in range(81) if CELLE[i][1] == u) for u in range(9))
+UNITA_QUADRANTI = tuple(tuple(i for i in range(81) if CELLE[i][2] == u) for u in range(9))
+UNITA = UNITA_RIGHE + UNITA_COLONNE + UNITA_QUADRANTI # Le 27 unità: righe 0-8, colonne 9-17, quadranti 18-26
+
+# Per ogni cella le 20 celle vicine, ovvero nella stessa riga, colonna o quadrante.
+VICINI = tuple(tuple(j for j in range(81) if j != i and any(CELLE[i][k] == CELLE[j][k] for k in range(3))) for i in range(81))
+
+#---------------------------------------------------------------------------------#
+# TABELLE PER SCHEMI DI QUALSIASI DIMENSIONE
+#---------------------------------------------------------------------------------#
+@functools.lru_cache(maxsize=None)
+def tabelle_box(box : int = 3) -> dict:
+   """Tabelle di celle, unità e vicini per uno schema (box^2)x(box^2): box=3 per il 9x9, 4 per il 16x16, 5 per il 25x25.
+      Calcolate una sola volta per dimensione e condivise da tutte le istanze.
+      Output:
+         - dizionario con chiavi:
+            - "box", "n" (int) lato del quadrante e dello schema (n = box^2, anche numero di cifre);
+            - "tutti_i_numeri" (int) maschera di bit con tutte le cifre da 1 a n;
+            - "celle" (tuple) per ogni cella (indice = riga*n + colonna) la tupla (riga, colonna, quadrante);
+            - "unita" (tuple) le 3n unità come tuple di indici di cella: righe, colonne, quadranti;
+            - "unita_np" (np.ndarray) le unità in formato (3n,n);
+            - "vicini" (tuple) per ogni cella le celle nella stessa riga, colonna o quadrante;
+            - "segmenti" (tuple) intersezioni tra righe (poi colonne) e quadranti, box celle ciascuna;
+            - "intersezioni" (tuple) per ogni segmento: indici degli altri segmenti della stessa riga (o colonna) e dello
+              stesso quadrante, celle della riga (o colonna) e del quadrante fuori dal segmento;
+            - "coordinate_quadranti" (dict) coordinate delle celle di ogni quadrante (quadranti numerati da 1 a n);
+            - "reverse_quadranti" (dict) quadrante (da 1 a n) di ogni coordinata.
+   """
+   n = box*box
+   celle = tuple((i // n, i % n, (i // (n*box))*box + (i % n)//box) for i in range(n*n))
+   unita = tuple(tuple(i for i in range(n*n) if celle[i][k] == u) for k in range(3) for u in range(n))
+   vicini = tuple(tuple(sorted({j for u in unita if i in u for j in u} - {i})) for i in range(n*n))
+   # Segmenti come (k, linea, quadrante), k=0 per le righe e k=1 per le colonne
+   chiavi = ([(0, u, (u // box)*box + b) for u in range(n) for b in range(box)] +
+             [(1, u, b*box + u // box) for u in range(n) for b in range(box)])
+   segmenti = tuple(tuple(i for i in unita[k*n + u] if celle[i][2] == q) for k, u, q in chiavi)
+   intersezioni = tuple((tuple(j for j, (k2, u2, _) in enumerate(chiavi) if j != s and (k2, u2) == (k, u)),
+                         tuple(j for j, (k2, _, q2) in enumerate(chiavi) if j != s and (k2, q2) == (k, q)),
+                         tuple(i for i in unita[k*n + u] if i not in segmenti[s]),
+                         tuple(i for i in unita[2*n + q] if i not in segmenti[s]))
+                        for s, (k, u, q) in enumerate(chiavi))
+   coordinate_quadranti = {q+1: [(i // n, i % n) for i in unita[2*n + q]] for q in range(n)}
+   reverse_quadranti = {coordinata: q for q, coordinate in coordinate_quadranti.items() for coordinata in coordinate}
+   return {"box": box,
+           "n": n,
+           "tutti_i_numeri": (1 << n) - 1,
+           "celle": celle,
+           "unita": unita,
+           "unita_np": np.array(unita),
+           "vicini": vicini,
+           "segmenti": segmenti,
+           "intersezioni": intersezioni,
+           "coordinate_quadranti": coordinate_quadranti,
+           "reverse_quadranti": reverse_quadranti}
+
+# Coordinate delle celle di ogni quadrante (quadranti numerati da 1 a 9) e quadrante di ogni cella.
+# Calcolate una sola volta all'import e condivise da tutte le istanze.
+COORDINATE_QUADRANTI = tabelle_box(3)["coordinate_quadranti"]
+REVERSE_QUADRANTI = tabelle_box(3)["reverse_quadranti"]
+# Tecniche usate da 'sudoku.rate', dalla più semplice alla più difficile, con il loro peso nel punteggio.
+TECNICHE_DIFFICOLTA = {"singoli": 1, "quadrante": 2, "riga": 3, "colonna": 3, "x_wing": 5, "xy_wing": 6, "ricerca": 8}
+
+# Regole del pipeline delle tecniche di 'solve' (vedi '__pipeline_tecniche__'), dalla meno costosa alla più costosa.
+# I singoli (celle con un solo candidato) non sono in elenco: vengono completati prima di ogni altra regola.
+REGOLE_PIPELINE = ("singoli_nascosti", "intersezioni", "coppie_nude", "coppie_nascoste",
+                   "triple_nude", "triple_nascoste", "x_wing", "xy_wing", "swordfish", "jellyfish")
+# Per ogni cella le sue tre unità (riga, 9 + colonna, 18 + quadrante), indici di UNITA.
+UNITA_DI_CELLA = tuple((r, 9 + c, 18 + q) for r, c, q in CELLE)
+# Intersezioni tra righe (o colonne) e quadranti, vedi 'tabelle_box', e segmenti contenuti in ogni unità.
+SEGMENTI = tabelle_box(3)["segmenti"]
+INTERSEZIONI = tabelle_box(3)["intersezioni"]
+SEGMENTI_UNITA = tuple(tuple(s for s, celle in enumerate(SEGMENTI) if set(celle) <= set(UNITA[u])) for u in range(27))
+# Posizione (0-8) di ogni cella nelle sue tre unità, nello stesso ordine di UNITA_DI_CELLA: è il bit della cella
+# negli indici delle posizioni di ogni numero (vedi '__prepara_pipeline__').
+POSIZIONE_IN_UNITA = tuple((c, r, (r % 3)*3 + c % 3) for r, c, _ in CELLE)
+# Vicini di ogni cella come insieme di bit a 81 bit (bit i per la cella i) e vicini in comune di ogni coppia di celle.
+VICINI_BIT = tuple(sum(1 << j for j in VICINI[i]) for i in range(81))
+VICINI_COMUNI = tuple(tuple(VICINI_BIT[a] & VICINI_BIT[b] for b in range(81)) for a in range(81))
+
+def __indici_bit__(insieme : int):
+   """Indici dei bit a 1 di un insieme di bit, dal più basso."""
+   while insieme:
+      bit = insieme & -insieme
+      yield bit.bit_length() - 1
+      insieme ^= bit
+#---------------------------------------------------------------------------------#
+# RICERCA IN PROFONDITÀ
+#---------------------------------------------------------------------------------#
+class BudgetEsaurito(Exception):
+   """Sollevata quando il tempo o i nodi concessi a 'solve' sono finiti (vedi 'budget').
+      Attributi:
+         - motivo (str) "tempo_scaduto" oppure "nodi_esauriti";
+         - migliore (list) inserimenti (cella, numero) dello stato più completo raggiunto dalla ricerca, aggiunti da chi la interrompe.
+   """
+   def __init__(self,
+                motivo : str):
+      super().__init__(motivo)
+      self.motivo = motivo
+      self.migliore = []
+
+# Nodi di ricerca tra due letture dell'orologio in 'budget.nodo'.
+CONTROLLO_TEMPO_NODI = 64
+
+class budget:
+   """Limiti di lavoro di una risoluzione, controllati in modo cooperativo dal ciclo delle tecniche e dalle ricerche.
+      Il tempo viene letto ogni CONTROLLO_TEMPO_NODI nodi, così il costo del controllo resta trascurabile.
+   """
+   def __init__(self,
+                timeout : float = None,
+                max_nodes : int = None):
+      """Input:
+            - timeout (float, default None) secondi concessi a partire da ora, None senza limite;
+            - max_nodes (int, default None) nodi di ricerca concessi, None senza limite.
+      """
+      self.scadenza = None if timeout is None else time.perf_counter() + timeout
+      self.max_nodi = max_nodes
+      self.nodi = 0
+
+   def controlla(self):
+      """Solleva 'BudgetEsaurito' se il tempo è finito."""
+      if self.scadenza is not None and time.perf_counter() > self.scadenza:
+         raise BudgetEsaurito("tempo_scaduto")
+
+   def nodo(self):
+      """Conta un nodo di ricerca, solleva 'BudgetEsaurito' se i nodi o il tempo sono finiti."""
+      self.nodi += 1
+      if self.max_nodi is not None and self.nodi > self.max_nodi:
+         raise BudgetEsaurito("nodi_esauriti")
+      if self.nodi % CONTROLLO_TEMPO_NODI == 0:
+         self.controlla()
+
+def __cerca_soluzioni__(griglia : list,
+                        limite : int = 1,
+                        statistiche : dict = None,
+                        budget : budget = None) -> tuple:
+   """Ricerca in profondità con propagazione, usata da 'sudoku.solve' e 'sudoku.count_solutions'.
+      Ad ogni nodo:
+         - vengono inseriti tutti i numeri forzati (celle con un solo candidato), dopo ogni inserimento
+           vengono ricontrollate solo le 20 celle vicine;
+         - se una cella resta senza candidati si torna indietro;
+         - altrimenti si prova ogni candidato della cella con meno candidati (la più vincolata).
+      Gli inserimenti vengono annullati in modo economico togliendo i bit dalle maschere di riga, colonna e quadrante.
+      Input:
+         - griglia (list) schema in formato lista piatta di 81 celle (più veloce da leggere di un np.array), zeri per le celle vuote;
+         - limite (int, default 1) la ricerca si ferma dopo aver trovato 'limite' soluzioni;
+         - statistiche (dict, default None) se fornito vengono aggiornate le chiavi "nodi", "backtrack" e "profondita_massima";
+         - budget (budget, default None) limiti di tempo e nodi, allo scadere viene sollevata 'BudgetEsaurito' con gli
+           inserimenti dello stato più completo raggiunto.
+      Output:
+         - numero di soluzioni trovate (al massimo 'limite', 0 se lo schema contiene numeri ripetuti);
+         - prima soluzione trovata (lista di 81 celle), None se non ce ne sono;
+         - celle inserite per arrivare alla prima soluzione, in ordine di inserimento.
+   """
+   griglia = list(griglia)
+   if statistiche is None:
+      statistiche = {"nodi":0, "backtrack":0, "profondita_massima":0}
+
+   # Maschere dei numeri presenti, un numero ripetuto rende lo schema senza soluzioni
+   righe, colonne, quadranti = [0]*9, [0]*9, [0]*9
+   for i in range(81):
+      if griglia[i]:
+         riga, colonna, quadrante = CELLE[i]
+         bit = 1 << (griglia[i]-1)
+         if (righe[riga] | colonne[colonna] | quadranti[quadrante]) & bit:
+            return 0, None, []
+         righe[riga] |= bit
+         colonne[colonna] |= bit
+         quadranti[quadrante] |= bit
+
+   celle_vuote = [i for i in range(81) if griglia[i] == 0]
+   traccia = [] # Celle inserite durante la ricerca, in ordine di inserimento
+   trovate = {"numero":0, "soluzione":None, "traccia":[]}
+   migliore = [] # Inserimenti (cella, numero) dello stato più completo, restituiti se il budget finisce
+
+   def inserisci(i, numero):
+      riga, colonna, quadrante = CELLE[i]
+      bit = 1 << (numero-1)
+      griglia[i] = numero
+      righe[riga] |= bit
+      colonne[colonna] |= bit
+      quadranti[quadrante] |= bit
+      traccia.append(i)
+
+   def annulla(lunghezza_traccia):
+      # Togliere tutti gli inserimenti fatti dopo che la traccia aveva lunghezza 'lunghezza_traccia'
+      while len(traccia) > lunghezza_traccia:
+         i = traccia.pop()
+         riga, colonna, quadrante = CELLE[i]
+         bit = ~(1 << (griglia[i]-1))
+         griglia[i] = 0
+         righe[riga] &= bit
+         colonne[colonna] &= bit
+         quadranti[quadrante] &= bit
+
+   def propaga(coda):
+      # Dopo un inserimento controllare solo le celle vicine: quelle rimaste con un solo candidato vengono completate
+      # e messe a loro volta in coda. Output: False se una cella resta senza candidati.
+      while coda:
+         for j in VICINI[coda.pop()]:
+            if griglia[j] == 0:
+               riga, colonna, quadrante = CELLE[j]
+               maschera = TUTTI_I_NUMERI & ~(righe[riga] | colonne[colonna] | quadranti[quadrante])
+               if maschera == 0:
+                  return False
+               if CONTEGGIO_BIT[maschera] == 1:
+                  inserisci(j, NUMERI_DA_MASCHERA[maschera][0])
+                  coda.append(j)
+      return True
+
+   def scegli():
+      # Restituire la cella più vincolata.
+      # Output: (None, 0) se lo schema è completo, (-1, 0) se c'è una contraddizione, (cella, maschera candidati) altrimenti.
+      while True:
+         cella_scelta, maschera_scelta, minimo = None, 0, 10
+         singoli = []
+         for i in celle_vuote:
+            if griglia[i] != 0:
+               continue
+            riga, colonna, quadrante = CELLE[i]
+            maschera = TUTTI_I_NUMERI & ~(righe[riga] | colonne[colonna] | quadranti[quadrante])
+            n_candidati = CONTEGGIO_BIT[maschera]
+            if n_candidati == 0:
+               return -1, 0
+            if n_candidati == 1:
+               singoli.append(i)
+            elif n_candidati < minimo:
+               cella_scelta, maschera_scelta, minimo = i, maschera, n_candidati
+         if not singoli:
+            return cella_scelta, maschera_scelta
+
+         # Celle con un solo candidato (presenti solo allo schema iniziale): inserirle, propagare e ripetere la scelta
+         for i in singoli:
+            if griglia[i] == 0:
+               riga, colonna, quadrante = CELLE[i]
+               maschera = TUTTI_I_NUMERI & ~(righe[riga] | colonne[colonna] | quadranti[quadrante])
+               if maschera == 0:
+                  return -1, 0
+               inserisci(i, NUMERI_DA_MASCHERA[maschera][0])
+               if not propaga([i]):
+                  return -1, 0
+
+   def cerca(profondita):
+      # Output: True quando sono state trovate 'limite' soluzioni e la ricerca va interrotta
+      if profondita > statistiche["profondita_massima"]:
+         statistiche["profondita_massima"] = profondita
+      cella, maschera = scegli()
+      if cella is None:
+         trovate["numero"] += 1
+         if trovate["soluzione"] is None:
+            trovate["soluzione"], trovate["traccia"] = list(griglia), list(traccia)
+         return trovate["numero"] >= limite
+      if cella == -1:
+         return False
+      if budget is not None and len(traccia) > len(migliore):
+         migliore[:] = [(i, griglia[i]) for i in traccia]
+
+      lunghezza_traccia = len(traccia)
+      for numero in NUMERI_DA_MASCHERA[maschera]:
+         statistiche["nodi"] += 1
+         if budget is not None:
+            budget.nodo()
+         inserisci(cella, numero)
+         if propaga([cella]) and cerca(profondita + 1):
+            return True
+         annulla(lunghezza_traccia)
+         statistiche["backtrack"] += 1
+      return False
+
+   try:
+      cerca(0)
+   except BudgetEsaurito as e:
+      e.migliore = migliore
+      raise
+   return trovate["numero"], trovate["soluzione"], trovate["traccia"]
+
+# Nodi del primo tentativo di '__cerca_soluzioni_box__' prima di ricominciare.
+NODI_PRIMO_RIAVVIO = 100
+
+def __cerca_soluzioni_box__(griglia : list,
+                            box : int,
+                            limite : int = 1,
+                            statistiche : dict = None,
+                            budget : budget = None) -> tuple:
+   """Ricerca in profondità con propagazione per schemi di qualsiasi dimensione (vedi 'tabelle_box'), usata per box diverso da 3.
+      I candidati di ogni cella sono una maschera di bit (interi python, n bit), così anche 25 cifre costano una sola operazione.
+      Ad ogni nodo la propagazione alterna:
+         - singoli: una cella con un solo candidato toglie la sua cifra dalle celle vicine;
+         - singoli nascosti: una cifra con una sola posizione possibile in un'unità viene assegnata a quella cella
+           (solo nelle unità modificate dall'ultimo controllo);
+         - intersezioni tra linee e quadranti, quando le regole precedenti non bastano;
+      finché non ci sono più progressi, poi si provano i candidati della cella più vincolata su una copia dei candidati.
+      La cella più vincolata tiene conto anche delle contraddizioni causate nei rami già visitati e la ricerca riparte
+      con un budget di nodi crescente: sugli schemi 25x25 evita di restare bloccati sotto una scelta sbagliata vicino alla radice.
+      Input:
+         - griglia (list) schema in formato lista piatta di n*n celle, zeri per le celle vuote;
+         - box (int) lato del quadrante;
+         - limite (int, default 1) la ricerca si ferma dopo aver trovato 'limite' soluzioni;
+         - statistiche (dict, default None) se fornito vengono aggiornate le chiavi "nodi", "backtrack" e "profondita_massima";
+         - budget (budget, default None) limiti di tempo e nodi (vedi '__cerca_soluzioni__').
+      Output:
+         - numero di soluzioni trovate (al massimo 'limite', 0 se lo schema contiene numeri ripetuti);
+         - prima soluzione trovata (lista di n*n celle), None se non ce ne sono.
+   """
+   tabelle = tabelle_box(box)
+   tutti, vicini, unita = tabelle["tutti_i_numeri"], tabelle["vicini"], tabelle["unita"]
+   segmenti, intersezioni = tabelle["segmenti"], tabelle["intersezioni"]
+   n = tabelle["n"]
+   unita_di_cella = [(riga, n + colonna, 2*n + quadrante) for riga, colonna, quadrante in tabelle["celle"]]
+   if statistiche is None:
+      statistiche = {"nodi":0, "backtrack":0, "profondita_massima":0}
+   trovate = {"numero":0, "soluzione":None}
+   pesi = [1]*len(griglia)
+   migliore = {"decise":0, "candidati":None} # Stato con più celle decise, restituito se il budget finisce
+   ordine = list(range(len(griglia)))
+   caso = random.Random(0)  # Seme fisso: stesso schema, stessa ricerca
+
+   def singoli(candidati, coda, sporche):
+      # Togliere la cifra di ogni cella in coda dalle celle vicine, mettendo in coda quelle rimaste con un solo candidato.
+      # Le unità delle celle modificate vengono segnate in 'sporche' per il controllo dei singoli nascosti.
+      while coda:
+         i = coda.pop()
+         bit = candidati[i]
+         sporche.update(unita_di_cella[i])
+         for j in vicini[i]:
+            maschera = candidati[j]
+            if maschera & bit:
+               maschera ^= bit
+               if not maschera:
+                  pesi[j] += 1
+                  return False
+               candidati[j] = maschera
+               sporche.update(unita_di_cella[j])
+               if not maschera & (maschera - 1):
+                  coda.append(j)
+      return True
+
+   def singoli_nascosti(candidati, coda, sporche):
+      # Cifre con una sola posizione possibile in un'unità, le celle assegnate vengono messe in coda.
+      # Vengono controllate solo le unità con celle modificate dall'ultimo controllo.
+      while sporche:
+         celle = unita[sporche.pop()]
+         una_volta, piu_volte = 0, 0
+         for i in celle:
+            maschera = candidati[i]
+            piu_volte |= una_volta & maschera
+            una_volta |= maschera
+         if una_volta != tutti:
+            for i in celle:
+               pesi[i] += 1
+            return False
+         unici = una_volta & ~piu_volte
+         while unici:
+            bit = unici & -unici
+            unici ^= bit
+            for i in celle:
+               if candidati[i] & bit:
+                  if candidati[i] != bit:
+                     candidati[i] = bit
+                     coda.append(i)
+                  break
+      return True
+
+   def incroci(candidati, coda, sporche):
+      # Intersezioni tra linee e quadranti: una cifra che in un quadrante (o in una linea) è possibile solo nel
+      # segmento in comune viene tolta dal resto della linea (o del quadrante).
+      # Output: -1 se una cella resta senza candidati, altrimenti il numero di candidati tolti.
+      maschere = [0]*len(segmenti)
+      for s, celle in enumerate(segmenti):
+         for i in celle:
+            maschere[s] |= candidati[i]
+      tolti = 0
+      for s, (altri_linea, altri_quadrante, resto_linea, resto_quadrante) in enumerate(intersezioni):
+         fuori_linea, fuori_quadrante = 0, 0
+         for j in altri_linea:
+            fuori_linea |= maschere[j]
+         for j in altri_quadrante:
+            fuori_quadrante |= maschere[j]
+         for bits, resto in ((maschere[s] & ~fuori_linea & fuori_quadrante, resto_quadrante),
+                             (maschere[s] & ~fuori_quadrante & fuori_linea, resto_linea)):
+            if bits:
+               for i in resto:
+                  maschera = candidati[i]
+                  if maschera & bits:
+                     maschera &= ~bits
+                     if not maschera:
+                        pesi[i] += 1
+                        return -1
+                     candidati[i] = maschera
+                     sporche.update(unita_di_cella[i])
+                     tolti += 1
+                     if not maschera & (maschera - 1):
+                        coda.append(i)
+      return tolti
+
+   def propaga_tutto(candidati, coda, sporche):
+      while True:
+         if not singoli(candidati, coda, sporche) or not singoli_nascosti(candidati, coda, sporche):
+            return False
+         if not coda:
+            tolti = incroci(candidati, coda, sporche)
+            if tolti < 0:
+               return False
+            if not tolti:
+               return True
+
+   def cerca(candidati, profondita):
+      # Output: True quando sono state trovate 'limite' soluzioni e la ricerca va interrotta
+      if profondita > statistiche["profondita_massima"]:
+         statistiche["profondita_massima"] = profondita
+
+      # Cella con il minor rapporto tra candidati e contraddizioni causate finora (le celle che hanno già
+      # portato a vicoli ciechi vengono decise prima, evitando di ripetere lo stesso errore in rami diversi)
+      cella_scelta, punteggio_minimo, indecise = None, float("inf"), 0
+      for i in ordine:
+         maschera = candidati[i]
+         if maschera & (maschera - 1):
+            indecise += 1
+            punteggio = maschera.bit_count() / pesi[i]
+            if punteggio < punteggio_minimo:
+               cella_scelta, punteggio_minimo = i, punteggio
+      if budget is not None and len(candidati) - indecise > migliore["decise"]:
+         migliore["decise"], migliore["candidati"] = len(candidati) - indecise, candidati
+      if cella_scelta is None:
+         trovate["numero"] += 1
+         if trovate["soluzione"] is None:
+            trovate["soluzione"] = [maschera.bit_length() for maschera in candidati]
+         return trovate["numero"] >= limite
+
+      # Alternative da provare: i candidati della cella scelta oppure, se ne ha più di due,
+      # le due sole posizioni di una cifra in un'unità (sugli schemi grandi riduce molto i nodi visitati)
+      maschera = candidati[cella_scelta]
+      alternative = []
+      while maschera:
+         bit = maschera & -maschera
+         maschera ^= bit
+         alternative.append((cella_scelta, bit))
+      if len(alternative) > 2:
+         alternative = coppia_nascosta(candidati) or alternative
+
+      for cella, bit in alternative:
+         statistiche["nodi"] += 1
+         if budget is not None:
+            budget.nodo()
+         trovate["nodi"] += 1
+         if trovate["nodi"] > trovate["budget"]:
+            trovate["interrotta"] = True
+            return True
+         copia = candidati.copy()
+         copia[cella] = bit
+         if propaga_tutto(copia, [cella], set()) and cerca(copia, profondita + 1):
+            return True
+         statistiche["backtrack"] += 1
+      return False
+
+   def coppia_nascosta(candidati):
+      # Prima cifra con esattamente due posizioni possibili in un'unità, None se non ce ne sono
+      for celle in unita:
+         una_volta, due_volte, tre_volte = 0, 0, 0
+         for i in celle:
+            maschera = candidati[i]
+            tre_volte |= due_volte & maschera
+            due_volte |= una_volta & maschera
+            una_volta |= maschera
+         coppie = due_volte & ~tre_volte
+         if coppie:
+            bit = coppie & -coppie
+            return [(i, bit) for i in celle if candidati[i] & bit]
+      return None
+
+   # Numeri dello schema: candidati con una sola cifra, da propagare ai vicini
+   candidati = [tutti]*len(griglia)
+   coda = []
+   for i, numero in enumerate(griglia):
+      if numero:
+         bit = 1 << (numero-1)
+         if any(griglia[j] == numero for j in vicini[i]):
+            return 0, None
+         candidati[i] = bit
+         coda.append(i)
+   # Riavvii con budget di nodi crescente: i pesi imparati nei tentativi interrotti guidano le scelte dei successivi,
+   # evitando che una scelta sbagliata vicino alla radice costringa ad esplorare un sottoalbero enorme.
+   # Il budget raddoppia ad ogni riavvio, quindi la ricerca resta completa (conteggio delle soluzioni esatto).
+   if propaga_tutto(candidati, coda, set(range(len(unita)))):
+      trovate["budget"] = NODI_PRIMO_RIAVVIO
+      while True:
+         trovate.update(numero=0, soluzione=None, nodi=0, interrotta=False)
+         caso.shuffle(ordine)  # A parità di punteggio la cella scelta cambia ad ogni tentativo
+         try:
+            cerca(candidati, 0)
+         except BudgetEsaurito as e:
+            if migliore["candidati"] is not None:
+               e.migliore = [(i, maschera.bit_length()) for i, maschera in enumerate(migliore["candidati"])
+                             if griglia[i] == 0 and not maschera & (maschera - 1)]
+            raise
+         if not trovate["interrotta"]:
+            break
+         trovate["budget"] *= 2
+   return trovate["numero"], trovate["soluzione"]
+
 #---------------------------------------------------------------------------------#
 # CREAZIONE CLASSE
 #---------------------------------------------------------------------------------#
@@ -24,15 +552,24 @@ class sudoku:
    # region INIT
    def __init__(self,
                 X : Union[list, np.ndarray],
-                verbose: bool = False ):
+                verbose: bool = False,
+                box : int = 3):
       """Inizializzare la classe.  
       Va passata una matrice 9x9, che sarà il sudoku da risolvere. La matrice può essere fornita in input come una:
          - lista di liste;
          - np.array.
       Input:
          - X ((list, np.ndarray), default None) schema del sudoku;
-         - verbose (bool, default False) se mostrare più o meno output testuale.
+         - verbose (bool, default False) se mostrare più o meno output testuale;
+         - box (int, default 3) lato del quadrante: 3 per il 9x9, 4 per il 16x16, 5 per il 25x25.
+           Gli schemi più grandi del 9x9 vengono risolti solo con la ricerca (vedi '__cerca_soluzioni_box__').
       """
+      # Dimensione dello schema, usata anche dal controllo dell'input.
+      if box < 2:
+         raise ValueError("Il lato del quadrante deve essere almeno 2")
+      self.box = box
+      self.n = box*box
+
       # Controllare che il sudoku in input sia nel formato giusto.
       self.__input_check__(X)      
 
@@ -46,6 +583,18 @@ class sudoku:
       
       # Inizializzare il contatore dei suggerimenti, verrà utilizzata dalla funzione 'suggest'.
       self.suggerimento = 0
+
+      # Metodo di risoluzione usato dall'ultima chiamata a 'solve', riutilizzato da 'suggest' e 'find_errors'.
+      self.engine = "tecniche"
+
+      # Profilo delle tecniche di risoluzione, popolato da 'solve(profile=True)'.
+      self.profilo = None
+
+      # Schema originale (in bytes) dell'ultima risoluzione completa, None se non ancora risolto (vedi '__risolvi_se_necessario__').
+      self.schema_risolto = None
+
+      # Esito dell'ultima chiamata a 'solve' (vedi 'solve'), None se non ancora risolto.
+      self.stato = None
       
       # Ricavare il numero di numeri da inserire (celle vuote indicate tramite zeri).
       self.numeri_mancanti = np.count_nonzero(matrix.flatten()==0)
@@ -53,45 +602,9 @@ class sudoku:
          # Contare il numero di zeri (numeri mancanti) e restituirlo.
          print(f"Numeri mancanti: {self.numeri_mancanti}")
 
-      # Definire le coordinate dei quadranti.
-      self.coordinate_quadranti = { 1:[(0, 0), (0, 1), (0, 2),(1, 0), (1, 1), (1, 2),(2, 0), (2, 1), (2, 2)],
-                                    2:[(0, 3), (0, 4), (0, 5),(1, 3), (1, 4), (1, 5),(2, 3), (2, 4), (2, 5)],
-                                    3:[(0, 6), (0, 7), (0, 8),(1, 6), (1, 7), (1, 8),(2, 6), (2, 7), (2, 8)],
-                                    
-                                    4:[(3, 0), (3, 1), (3, 2),(4, 0), (4, 1), (4, 2),(5, 0), (5, 1), (5, 2)],
-                                    5:[(3, 3), (3, 4), (3, 5),(4, 3), (4, 4), (4, 5),(5, 3), (5, 4), (5, 5)],
-                                    6:[(3, 6), (3, 7), (3, 8),(4, 6), (4, 7), (4, 8),(5, 6), (5, 7), (5, 8)],
-
-                                    7:[(6, 0), (6, 1), (6, 2),(7, 0), (7, 1), (7, 2),(8, 0), (8, 1), (8, 2)],
-                                    8:[(6, 3), (6, 4), (6, 5),(7, 3), (7, 4), (7, 5),(8, 3), (8, 4), (8, 5)],
-                                    9:[(6, 6), (6, 7), (6, 8),(7, 6), (7, 7), (7, 8),(8, 6), (8, 7), (8, 8)]}
-      
-      self.reverse_quadranti = { # Primo quadrante 
-                                 (0, 0): 1,(0, 1): 1, (0, 2): 1, (1, 0): 1, (1, 1): 1, (1, 2): 1, (2, 0): 1,(2, 1): 1,(2, 2): 1,
-                                 
-                                 # Secondo quadrante
-                                 (0, 3): 2, (0, 4): 2,(0, 5): 2,(1, 3): 2,(1, 4): 2,(1, 5): 2,(2, 3): 2,(2, 4): 2,(2, 5): 2,
-                                 
-                                 # Terzo quadrante
-                                 (0, 6): 3, (0, 7): 3,(0, 8): 3,(1, 6): 3,(1, 7): 3,(1, 8): 3,(2, 6): 3,(2, 7): 3,(2, 8): 3,
-                                 
-                                 # Quarto quadrante 
-                                 (3, 0): 4, (3, 1): 4,(3, 2): 4,(4, 0): 4,(4, 1): 4,(4, 2): 4,(5, 0): 4,(5, 1): 4,(5, 2): 4,
-                                 
-                                 # Quinto quadrante 
-                                 (3, 3): 5, (3, 4): 5,(3, 5): 5,(4, 3): 5,(4, 4): 5,(4, 5): 5,(5, 3): 5,(5, 4): 5,(5, 5): 5,
-                                 
-                                 # Sesto quadrante
-                                 (3, 6): 6, (3, 7): 6,(3, 8): 6,(4, 6): 6,(4, 7): 6,(4, 8): 6,(5, 6): 6,(5, 7): 6,(5, 8): 6,
-                                 
-                                 # Settimo quadrante
-                                 (6, 0): 7, (6, 1): 7,(6, 2): 7,(7, 0): 7,(7, 1): 7,(7, 2): 7,(8, 0): 7,(8, 1): 7,(8, 2): 7,
-                                 
-                                 # Ottavo quadrante
-                                 (6, 3): 8, (6, 4): 8,(6, 5): 8,(7, 3): 8,(7, 4): 8,(7, 5): 8,(8, 3): 8,(8, 4): 8,(8, 5): 8,
-                                 
-                                 # Nono quadrante
-                                 (6, 6): 9, (6, 7): 9,(6, 8): 9,(7, 6): 9,(7, 7): 9,(7, 8): 9,(8, 6): 9,(8, 7): 9,(8, 8): 9}
+      # Coordinate dei quadranti, tabelle condivise da tutte le istanze della stessa dimensione (vedi 'tabelle_box').
+      self.coordinate_quadranti = tabelle_box(box)["coordinate_quadranti"]
+      self.reverse_quadranti = tabelle_box(box)["reverse_quadranti"]
 
    def __input_check__(self,
                        X : Union[list, np.ndarray],
@@ -106,12 +619,12 @@ class sudoku:
          raise TypeError("L'input deve essere una matrice")
 
       ## Se 
-      if len(X) != 9:
-         raise TypeError("La matrice deve essere in formato 9x9")
+      if len(X) != self.n:
+         raise TypeError(f"La matrice deve essere in formato {self.n}x{self.n}")
 
       for i in X:
-         if len(i) != 9:
-            raise TypeError("La matrice deve essere in formato 9x9")              
+         if len(i) != self.n:
+            raise TypeError(f"La matrice deve essere in formato {self.n}x{self.n}")              
    # endregion
    #---------------------------------------------------------------------------------#
    # SHOW
@@ -135,95 +648,33 @@ class sudoku:
       else:
          self.__input_check__(schema)      
 
-      print(" -----------------------")
-      for i in range(0,9):
-         for j in range(0,9):
+      # Larghezza delle celle: una cifra fino al 9x9, due per il 16x16 e il 25x25.
+      larghezza = len(str(self.n))
+      separatore = " " + "-"*((larghezza + 1)*self.n + 2*self.box - 1)
+
+      print(separatore)
+      for i in range(0,self.n):
+         for j in range(0,self.n):
                if j== 0 :
                   print("| ",end="")
-               if  j == 2 or j== 5  :
+               if  j % self.box == self.box - 1 and j != self.n - 1:
                      if (len(coordinate) > 0) & ((i,j) in coordinate): # Se ci sono dei colori da inserire in particolari celle li inserisce
-                        print(f"{colore}{schema[i][j]}\033[0m", end = ' | ')
+                        print(f"{colore}{schema[i][j]:>{larghezza}}\033[0m", end = ' | ')
                      else:
-                        print(schema[i][j], end = ' | ')
+                        print(f"{schema[i][j]:>{larghezza}}", end = ' | ')
 
                else:
                   if (len(coordinate) > 0) & ((i,j) in coordinate): # Se ci sono dei colori da inserire in particolari celle li inserisce
-                     print(f"{colore}{schema[i][j]}\033[0m",end = ' ')
+                     print(f"{colore}{schema[i][j]:>{larghezza}}\033[0m",end = ' ')
                   else:
-                     print(schema[i][j], end = ' ')
+                     print(f"{schema[i][j]:>{larghezza}}", end = ' ')
                      
          print('|')
          
-         if i == 2 or i == 5 or i == 8 :
-               print(" -----------------------")
+         if i % self.box == self.box - 1:
+               print(separatore)
    #---------------------------------------------------------------------------------#
    # region CHECK
-   def __check_rows__(self,
-                      schema : np.array):
-      """Controllare per errori nelle righe.
-         Output:
-         -  True se non ci sono errori.
-         -  False se ci sono errori.
-      """
-
-      # Iterate over the rows
-      for row_id in range(0,9):
-
-         # Assegnare ad una variabile la i-esima riga
-         row = schema[row_id,:]
-
-         # Il primo valore viene assegnato, poi si itera sugli altri per capire se ci sono duplicati e quindi errori.
-         row_values = [row[0]]
-         for i in  range(1,9):
-            if row[i] in row_values:
-               return False
-
-            row_values.append(row[i])
-      return True
-   
-   def __check_columns__(self,
-                         schema : np.array):
-      """Controllare per errori nelle colonne.
-         Output:
-         -  True se non ci sono errori.
-         -  False se ci sono errori.
-      """
-      # Iterate over the columns
-      for col_id in range(0,9):
-
-         # Assegnare ad una variabile la i-esima riga
-         col = schema[:,col_id]
-
-         # Il primo valore viene assegnato, poi si itera sugli altri per capire se ci sono duplicati e quindi errori.
-         col_values = [col[0]]
-         for i in  range(1,9):
-            if col[i] in col_values:
-               return False
-
-            col_values.append(col[i])
-      return True
-
-   def __check_quadranti__(self,
-                           schema : np.array):
-      """Controllare per errori nei quadranti.
-         Output:
-         -  True se non ci sono errori.
-         -  False se ci sono errori.
-      """
-      # Primo loop per prendere le coordinate del ennesimo quadrante
-      for quadrante in self.coordinate_quadranti.keys():
-         coordinates = self.coordinate_quadranti[quadrante]
-
-         # Secondo loop, controllare che nello stesso quadrante tutti i numeri siano diversi
-         valori_quadrante = [schema[coordinates[0]]] 
-         for i in range(1,9):
-
-            valore_xy = schema[coordinates[i]] 
-            if valore_xy in valori_quadrante:
-               return False
-            valori_quadrante.append(valore_xy)
-      return True
-
    def check(self,
              schema : Union[list, np.ndarray] = None,
              verbose : bool = False):
@@ -241,13 +692,14 @@ class sudoku:
          
       # Se lo schema è una lista metterlo in formato numpy.
       if  isinstance(schema,list):
-         schema = np.array(X)
+         schema = np.array(schema)
        
       # Controllare lo schema
       self.__input_check__(schema)
 
       # Se ci sono errori (duplicati) in riga, in  colonna  o in quadrante c'è un errore.
-      if (self.__check_columns__(schema=schema) == False) or ( self.__check_rows__(schema=schema) == False ) or (self.__check_quadranti__(schema=schema) == False):
+      # Il controllo è lo stesso di 'check_many' applicato ad un blocco di un solo schema.
+      if not check_many(np.asarray(schema)[None], box=self.box)[0]:
          if verbose:
             print("Ci sono errori nella risoluzione del sudoku")
          return False
@@ -259,40 +711,99 @@ class sudoku:
    # endregion   
    #---------------------------------------------------------------------------------#
    # FIND ERRORS
+   def grade(self,
+             consegne : Union[list, np.ndarray]):
+      """Corregge una o più soluzioni consegnate confrontandole con la soluzione dello schema originale.
+         La soluzione di riferimento viene calcolata una sola volta (vedi '__risolvi_se_necessario__') ed il confronto
+         di tutto il blocco di consegne è fatto con operazioni numpy vettoriali.
+         Input:
+            - consegne ((list, np.ndarray)) una soluzione 9x9 oppure un blocco (N,9,9) ((N,16,16) con box=4, ecc.),
+                                             zeri per le celle lasciate vuote.
+         Output:
+            - per ogni consegna un dizionario (lista di dizionari se è stato passato un blocco) con chiavi:
+               - "corretto" (bool) True se la consegna è completa e coincide con la soluzione;
+               - "errori" (list) celle sbagliate, come dizionari {"cella": (riga,colonna), "atteso": int, "inserito": int};
+               - "celle_vuote" (int) celle non completate;
+               - "unita_in_conflitto" (list) unità con un numero ripetuto (es. "riga 1", vedi 'nome_unita').
+      """
+      consegne = np.asarray(consegne)
+      singola = consegne.ndim == 2
+      consegne = consegne.reshape(-1,self.n,self.n)
+
+      self.__risolvi_se_necessario__()
+      if not self.solved:
+         raise ValueError("Lo schema originale non ha soluzione, impossibile correggere")
+      soluzione = self.sudoku
+
+      sbagliate = (consegne != 0) & (consegne != soluzione)                   # (N,9,9)
+      n_vuote = (consegne == 0).sum(axis=(1,2)).tolist()
+      conflitti = __duplicati_per_unita__(consegne, ignora_zeri=True, unita_np=tabelle_box(self.box)["unita_np"]) # (N,3n)
+
+      # Tutte le celle sbagliate del blocco in una volta, poi divise per consegna
+      k, righe, colonne = np.nonzero(sbagliate)
+      celle = list(zip(righe.tolist(), colonne.tolist()))
+      attesi, inseriti = soluzione[righe,colonne].tolist(), consegne[k,righe,colonne].tolist()
+      confini = np.searchsorted(k, np.arange(len(consegne)+1)).tolist()
+      k_conflitti, unita_conflitti = np.nonzero(conflitti)
+      confini_conflitti = np.searchsorted(k_conflitti, np.arange(len(consegne)+1)).tolist()
+      nomi = [nome_unita(u, self.n) for u in unita_conflitti.tolist()]
+
+      risultati = []
+      for k in range(len(consegne)):
+         inizio, fine = confini[k], confini[k+1]
+         errori = [{"cella": celle[j], "atteso": attesi[j], "inserito": inseriti[j]} for j in range(inizio, fine)]
+         risultati.append({"corretto": inizio == fine and n_vuote[k] == 0,
+                           "errori": errori,
+                           "celle_vuote": n_vuote[k],
+                           "unita_in_conflitto": nomi[confini_conflitti[k]:confini_conflitti[k+1]]})
+      return risultati[0] if singola else risultati
+
+   def show_errors(self,
+                   consegna : Union[list, np.ndarray],
+                   risultato : dict = None):
+      """Mostra a schermo la correzione di una consegna: elenco degli errori, consegna con gli errori in rosso
+         e soluzione con i numeri corretti in verde.
+         Input:
+            - consegna ((list, np.ndarray)) soluzione 9x9 consegnata;
+            - risultato (dict, default None) output di 'grade' per la consegna, se None viene calcolato.
+      """
+      GREEN_BOLD = "\033[1;32m"
+      RED_BOLD = "\033[1;31m"
+      RESET = "\033[0m"
+      if risultato is None:
+         risultato = self.grade(consegna)
+
+      for errore in risultato["errori"]:
+         riga, colonna = errore["cella"]
+         print(f"Errore in posizione {riga+1,colonna+1}.{GREEN_BOLD} Numero corretto {errore['atteso']}{RESET},{RED_BOLD} Numero inserito {errore['inserito']} {RESET}.")
+      if risultato["celle_vuote"]:
+         print(f"Celle non completate: {risultato['celle_vuote']}.")
+      if risultato["unita_in_conflitto"]:
+         print(f"Numeri ripetuti in: {', '.join(risultato['unita_in_conflitto'])}.")
+
+      coordinate_sbagliate = [errore["cella"] for errore in risultato["errori"]]
+      self.show(schema=np.asarray(consegna),coordinate = coordinate_sbagliate,colore=RED_BOLD)
+      self.show(schema=self.sudoku.copy(),coordinate = coordinate_sbagliate,colore=GREEN_BOLD)
+
    def find_errors(self,
                    soluzione : Union[list, np.ndarray] = None,
                    verbose : bool = True
-                  ):
+                  ) -> dict:
       """Funzione per identificare eventuali errori nella soluzione fornita in input.
          Confronta la risoluzione dell'algoritmo con quella fornita ed individua eventuali errori restituendo la loro posizione ed il corretto numero.
          Input:
             - schema ((list, np.ndarray),default None)
             -  verbose (bool, default True) se True printa a schermo l'intero sudoku evidenziando gli errori e le soluzioni giuste.
+         Output:
+            - risultato della correzione, vedi 'grade'.
       """
       # Controllare che il sudoku contenente la soluzione che si vuole controllare fornita input sia nel formato giusto.
       self.__input_check__(soluzione)      
 
-      # Convert to NumPy array la soluzione è una lista, se invece è un array numpy  lasciare cosi.
-      if   isinstance(soluzione,list):
-         soluzione = np.array(soluzione)
-         
-      GREEN_BOLD = "\033[1;32m"
-      RED_BOLD = "\033[1;31m"
-      RESET = "\033[0m"
-      coordinate_sbagliate = []
-
-      self.solve()   
-      for i in range(0,9):
-         for j in range(0,9):
-            if soluzione[i,j] != self.sudoku[i,j]:
-               print(f"Errore in posizione {i+1,j+1}.{GREEN_BOLD} Numero corretto {self.sudoku[i,j]}{RESET},{RED_BOLD} Numero inserito {soluzione[i,j]} {RESET}.")
-               coordinate_sbagliate.append((i,j))
-
+      risultato = self.grade(soluzione)
       if verbose:
-         self.show(schema=soluzione,coordinate = coordinate_sbagliate,colore="\033[1;31m")
-         self.show(schema=self.sudoku.copy(),coordinate = coordinate_sbagliate,colore="\033[1;32m")
-         
-         
+         self.show_errors(soluzione, risultato)
+      return risultato
 
    #---------------------------------------------------------------------------------#
    # SUGGEST  
@@ -309,7 +820,8 @@ class sudoku:
       if restore_suggestion:
          self.suggerimento = 0
       
-      self.solve()   
+      # La traccia della risoluzione viene ricalcolata solo se lo schema è cambiato
+      self.__risolvi_se_necessario__()
          
       for i in range(n_suggestions):
          self.suggerimento += 1
@@ -318,66 +830,195 @@ class sudoku:
             break
          print(f'Inserire il numero {self.mappatura_numeri_aggiunti[self.suggerimento]["soluzione"]} in posizione: {(self.mappatura_numeri_aggiunti[self.suggerimento]["cella"][0]+1,self.mappatura_numeri_aggiunti[self.suggerimento]["cella"][1]+1)}')
          
+   def __risolvi_se_necessario__(self):
+      """Risolve lo schema originale solo se non è già stato risolto o se è stato modificato dopo l'ultima risoluzione.
+         Soluzione ('self.sudoku') e mappatura dei numeri aggiunti restano così in memoria tra una richiesta e l'altra."""
+      if self.schema_risolto != self.original_schema.tobytes():
+         self.solve(engine=self.engine)
+
+   def next_step(self,
+                 schema : Union[list, np.ndarray] = None) -> dict:
+      """Calcola il prossimo passo logico a partire da uno schema parzialmente completato dall'utente, senza risolverlo.
+         Le tecniche vengono provate dalla più semplice:
+            - "errore": un numero inserito è diverso dalla soluzione, viene indicato il numero corretto;
+            - "singoli": cella con un solo candidato;
+            - "quadrante", "riga", "colonna": numero con una sola posizione possibile nell'unità;
+            - "ricerca": nessuna delle tecniche precedenti basta, viene indicata la cella con meno candidati ed il suo numero.
+         La soluzione dello schema originale serve solo per "errore" e "ricerca" e viene calcolata una sola volta
+         (vedi '__risolvi_se_necessario__'), perciò il costo di ogni richiesta è quello di una scansione dello schema.
+         Input:
+            - schema ((list, np.ndarray), default None) schema attuale dell'utente, se None lo schema originale.
+         Output:
+            - dizionario {"cella": (riga,colonna), "numero": int, "tecnica": str}, None se lo schema è completo
+              o se non ci sono passi possibili (schema senza soluzione).
+      """
+      if self.box != 3:
+         raise ValueError("'next_step' supporta solo schemi 9x9")
+      griglia = [int(numero) for numero in np.asarray(self.original_schema if schema is None else schema).flatten()]
+      self.__risolvi_se_necessario__()
+      soluzione = [int(numero) for numero in self.sudoku.flatten()] if self.solved else None
+
+      # Numeri inseriti sbagliati
+      if soluzione is not None:
+         for i in range(81):
+            if griglia[i] and griglia[i] != soluzione[i]:
+               return {"cella": COORDINATE[i], "numero": soluzione[i], "tecnica": "errore"}
+
+      righe, colonne, quadranti = [0]*9, [0]*9, [0]*9
+      for i in range(81):
+         if griglia[i]:
+            riga, colonna, quadrante = CELLE[i]
+            bit = 1 << (griglia[i]-1)
+            righe[riga] |= bit
+            colonne[colonna] |= bit
+            quadranti[quadrante] |= bit
+
+      # Singoli, tenendo da parte la cella con meno candidati
+      candidati = [0]*81
+      cella_minima, minimo = None, 10
+      for i in range(81):
+         if griglia[i] == 0:
+            riga, colonna, quadrante = CELLE[i]
+            maschera = TUTTI_I_NUMERI & ~(righe[riga] | colonne[colonna] | quadranti[quadrante])
+            if maschera == 0:
+               return None
+            if CONTEGGIO_BIT[maschera] == 1:
+               return {"cella": COORDINATE[i], "numero": NUMERI_DA_MASCHERA[maschera][0], "tecnica": "singoli"}
+            candidati[i] = maschera
+            if CONTEGGIO_BIT[maschera] < minimo:
+               cella_minima, minimo = i, CONTEGGIO_BIT[maschera]
+      if cella_minima is None:
+         return None
+
+      # Numeri con una sola posizione possibile nell'unità: quadranti, righe e colonne
+      for nome, unita in (("quadrante", UNITA_QUADRANTI), ("riga", UNITA_RIGHE), ("colonna", UNITA_COLONNE)):
+         for celle in unita:
+            una_volta, piu_volte = 0, 0
+            for i in celle:
+               piu_volte |= una_volta & candidati[i]
+               una_volta |= candidati[i]
+            unici = una_volta & ~piu_volte
+            if unici:
+               numero = NUMERI_DA_MASCHERA[unici][0]
+               bit = 1 << (numero-1)
+               for i in celle:
+                  if candidati[i] & bit:
+                     return {"cella": COORDINATE[i], "numero": numero, "tecnica": nome}
+
+      if soluzione is None:
+         return None
+      return {"cella": COORDINATE[cella_minima], "numero": soluzione[cella_minima], "tecnica": "ricerca"}
+
    #---------------------------------------------------------------------------------#
    # EXTRACT SCHEMA  
-   def __get_schema_from_image__(self):
-      """Estrarre sudoku dalle immagini"""
-      pass   
+   def __get_schema_from_image__(self,
+                                 percorso : str,
+                                 template : np.ndarray = None) -> np.ndarray:
+      """Estrarre sudoku dalle immagini (vedi immagini.py: griglia, 81 celle e cifre classificate con un modello a template).
+         Input:
+            - percorso (str) immagine PNG dello schema;
+            - template (np.ndarray, default None) modello delle cifre, se None quello salvato in 'immagini.MODELLO'.
+         Output:
+            - schema 9x9 letto dall'immagine, zeri per le celle vuote. Lo schema dell'istanza non viene modificato.
+      """
+      import immagini # Import locale: immagini.py non serve per risolvere
+      return immagini.estrai_schema(percorso, template)
 
    #---------------------------------------------------------------------------------#
    # region SOLVE
+   def __inizializza_maschere__(self):
+      """Costruisce le maschere di bit dei numeri già presenti in ogni riga, colonna e quadrante di 'self.sudoku'.
+         Le maschere vengono poi mantenute aggiornate da '__assegna_numero__' ad ogni numero inserito.
+      """
+      if self.box != 3:
+         raise ValueError("Le maschere delle tecniche supportano solo schemi 9x9")
+      self.maschere_righe = [0]*9       # Una maschera per riga
+      self.maschere_colonne = [0]*9     # Una maschera per colonna
+      self.maschere_quadranti = [0]*9   # Una maschera per quadrante, indice 0 per il quadrante 1 e così via.
+      self.celle_vuote = 0              # Contatore delle celle ancora da riempire, sostituisce la ricerca degli zeri nello schema.
+
+      for riga in range(0,9):
+         for colonna in range(0,9):
+            numero = int(self.sudoku[riga,colonna])
+            if numero != 0:
+               bit = 1 << (numero-1)
+               self.maschere_righe[riga] |= bit
+               self.maschere_colonne[colonna] |= bit
+               self.maschere_quadranti[(riga//3)*3 + colonna//3] |= bit
+            else:
+               self.celle_vuote += 1
+
+   def __assegna_numero__(self,
+                          cella : tuple,
+                          numero : int):
+      """Inserisce un numero nello schema in risoluzione aggiornando maschere di bit, contatore delle celle vuote e mappatura dei numeri aggiunti.
+         Il numero viene tolto dai candidati ('numeri_ammissibili_cella') delle sole 20 celle vicine; quelle che restano
+         con un solo candidato vengono aggiunte a 'coda_singoli'.
+         Input:
+            - cella (tuple) coordinate (riga,colonna) della cella;
+            - numero (int) numero da inserire.
+      """
+      riga, colonna = cella
+      numero = int(numero)
+      bit = 1 << (numero-1)
+
+      self.sudoku[riga,colonna] = numero
+      self.maschere_righe[riga] |= bit
+      self.maschere_colonne[colonna] |= bit
+      self.maschere_quadranti[(riga//3)*3 + colonna//3] |= bit
+
+      self.celle_vuote -= 1
+
+      # Tenere traccia della soluzione trovata
+      self.numeri_aggiunti += 1
+      self.mappatura_numeri_aggiunti[self.numeri_aggiunti] = {"cella":(riga,colonna),
+                                                              "soluzione":numero}
+
+      # Propagazione ai vicini
+      candidati = self.numeri_ammissibili_cella
+      candidati.pop((riga,colonna), None)
+      for vicino in VICINI[riga*9 + colonna]:
+         cella_vicina = COORDINATE[vicino]
+         numeri_candidati = candidati.get(cella_vicina)
+         if numeri_candidati is not None and numero in numeri_candidati:
+            numeri_candidati.discard(numero)
+            if len(numeri_candidati) == 1:
+               self.coda_singoli.append(cella_vicina)
+
+   def __maschera_candidati__(self,
+                              riga : int,
+                              colonna : int) -> int:
+      """Restituisce la maschera di bit dei numeri candidati per la cella (riga,colonna)."""
+      maschera = TUTTI_I_NUMERI & ~(self.maschere_righe[riga] | self.maschere_colonne[colonna] | self.maschere_quadranti[(riga//3)*3 + colonna//3])
+
+      # Rimuove i numeri non ammissibili trovati tramite le tecniche di livello 5: XY WINGS, X WING, Color Pairs, Remote pairs
+      non_ammissibili_tramite_tecniche_livello5 = self.elenco_numero_NON_ammissibili.get((riga,colonna))
+      if non_ammissibili_tramite_tecniche_livello5:
+         for numero in non_ammissibili_tramite_tecniche_livello5:
+            maschera &= ~(1 << (numero-1))
+      return maschera
+
    def __elenco_numero_ammissibili__(self,
-                                         schema : np.array,
-                                         row : int ,
-                                         column : int ):
+                                     row : int ,
+                                     column : int ):
       """Input:
-         - un sudoku;
-         - coordinate di una sua cella.
+         - coordinate di una cella dello schema in risoluzione.
          Output in formato dictionary:
          - dizionario dei numeri NON ammissibili per quella cella : dict;
          - dizionario dei numeri ammissibili per quella cella : dict;
          - index della cella formato tupla : tuple;
          - riga della cella : int;
          - colonna della cella: int.
+         I candidati vengono letti dalle maschere di bit di riga, colonna e quadrante (vedi '__maschera_candidati__').
       """
-      # region Identificare nella riga, colonna e quadrante per le coordinate fornite.
-      # Identificare numeri candidati di riga e renderlo un set.
-      già_in_riga = set(schema[row,:]) 
-   
-      # Identificare numeri candidati di colonna e renderlo un set.
-      già_in_colonna = set(schema[:,column])
-      
-      # Identificare numeri candidati del quadrante e renderlo un sset
-      quadrante = self.reverse_quadranti[(row,column)] # Ottenere il quadrante corrispondente alle 
-                                                       # coordinate (row,column) in input 
-      
-      ## Estrarre tutte le coordinate dei numeri in un quadrante
-      indici_quadrante = self.coordinate_quadranti[quadrante] 
-      rows, cols = zip(*indici_quadrante) # Rendere le le coordinate dei numeri in un quadrante in un
-                                          # formato adatto per estrarre tutti 
-                                          # i numeri di quel quadrante da un np.array
-      ## Identificare numeri candidati del quadrante                                   
-      già_in_quadrante = set(schema[rows, cols]) 
-      # endregion
-      #----------#
-      # region Identificazione numeri non ammissibili e ammissibili (numeri candidati)
-      # Definire il set dei NON numeri ammisibili
-      numeri_non_ammissibili = set([0]) # Aggiungere lo zero nel set perchè è il placeholder che
-                                        # indica una cella da riempire, perciò non è ammissibile
-                                        
-      numeri_non_ammissibili.update(già_in_riga) # Aggiungere i numeri non ammissibili per quella riga
-      numeri_non_ammissibili.update(già_in_colonna)  # Aggiungere i numeri non ammissibili per quella colonna
-      numeri_non_ammissibili.update(già_in_quadrante)  # Aggiungere i numeri non ammissibili per quel quadrante
-      
-      # Rimuove i numeri non ammissibili trovati tramite le tecniche di livello 5: XY WINGS, X WING, Color Pairs, Remote pairs
-      if len(self.elenco_numero_NON_ammissibili) > 0:
-         if (row,column) in self.elenco_numero_NON_ammissibili.keys():
-            non_ammissibili_tramite_tecniche_livello5 = self.elenco_numero_NON_ammissibili[(row,column)]
-            numeri_non_ammissibili.update(non_ammissibili_tramite_tecniche_livello5)
+      maschera = self.__maschera_candidati__(row,column)
+
+      numeri_candidati = set(NUMERI_DA_MASCHERA[maschera])
+
+      # Lo zero è il placeholder che indica una cella da riempire, perciò non è ammissibile
+      numeri_non_ammissibili = set(NUMERI_DA_MASCHERA[TUTTI_I_NUMERI & ~maschera])
+      numeri_non_ammissibili.add(0)
 
-      # Rimuovere i numeri non ammissibili dai numeri possibili, ovvero 1,2,3,4,5,6,7,8,9
-      numeri_candidati = set([1,2,3,4,5,6,7,8,9]).difference(numeri_non_ammissibili)
-      # endregion
       return {"numeri_candidati":numeri_candidati,
               "numero_non_ammissibili": numeri_non_ammissibili,
               "row":row,
@@ -425,7 +1066,7 @@ class sudoku:
       # Come valori una lista contenente i numeri candidati per ogni  cella di quella riga/colonna.
       
       # Iterare sul numero di riga e colonna
-      for i in range(0,8):
+      for i in range(0,9):
          # Dizionari per salvare tutta una riga/colonna sotto unica chiave.
          dizionario_riga_provvisorio = {}
          dizionario_colonna_provvisorio = {}         
@@ -450,59 +1091,44 @@ class sudoku:
    def __basic_solver__(self): 
       """Compila le celle vuote seguendo il criterio più semplice basato sul controllo delle possibili 
          soluzioni di una determinata cella. Se controllando riga, colonna e quadrante c'è una sola soluzione possibile per quella cella questa viene inserita.
+         I candidati di ogni cella vengono calcolati una sola volta; poi ogni numero inserito aggiorna solo le 20 celle vicine
+         (vedi '__assegna_numero__') e le vicine rimaste con un solo candidato vengono messe in coda per essere completate.
       """
-
+      # Dizionario che tiene conto di ogni soluzione ammissibile per ogni cella da risolvere.
+      self.numeri_ammissibili_cella = {}
+      # Celle con un solo candidato, in attesa di essere completate.
+      self.coda_singoli = []
+
+      for riga, colonna in COORDINATE:
+         # Zero è il placeholder dei numeri che bisogna identificare.
+         # Perciò se il numero della cella di index (riga,colonna) è uno ZERO bisogna trovare i numeri candidati per quella posizione.
+         if self.sudoku[riga,colonna] == 0:
+            numeri_candidati = set(NUMERI_DA_MASCHERA[self.__maschera_candidati__(riga,colonna)])
+            self.numeri_ammissibili_cella[(riga,colonna)] = numeri_candidati
+            if len(numeri_candidati) == 1:
+               self.coda_singoli.append((riga,colonna))
+
+      # Inserire i numeri forzati finchè la coda non si svuota.
+      while self.coda_singoli:
+         cella = self.coda_singoli.pop()
+         numeri_candidati = self.numeri_ammissibili_cella.get(cella)
+         # La cella potrebbe essere già stata completata o essere rimasta senza candidati (contraddizione).
+         if numeri_candidati is not None and len(numeri_candidati) == 1:
+            self.__assegna_numero__(cella, next(iter(numeri_candidati)))
       
-      # While loop per la risoluzione del sudoku. Affinchè in ogni loop completo su righe e colonne si trova almeno una soluzione
-      # questo while loop continuerà l'esecuzione. Qualora in un loop intero non si trova soluzione significa che l'algoritmo è bloccato e il while loop viene fermato.
-      while True:
-         
-         self.numeri_ammissibili_cella = {} # Dizionario che tiene conto di ogni soluzione ammissibile per ogni cella da risolvere.
-         # region Risoluzione con controllo di riga colonna e quadrante (se in quella riga c'è una sola soluzione possibile assegnarla)
-         soluzione_trovata_in_questa_iterazione = False 
-         for riga in range(0,9): 
-            for colonna in range(0,9):
-               
-               # Zero è il placeholder dei numeri che bisogna identificare.
-               # Perciò se il numero della cella di index (riga,colonna) è uno ZERO bisogna trovare i numeri candidati per quella posizione.
-               if self.sudoku[riga,colonna] == 0: 
-
-                  # Trovare l'elenco dei numeri ammissibili e non ammissibili per la cella in considerazione.
-                  output__elenco_numero_ammissibili__= self.__elenco_numero_ammissibili__(self.sudoku.copy(),
-                                                                                          riga,
-                                                                                          colonna)
-                  
-                  # Assegnare i numeri candidati ad una nuova variabile così da rendere il codice più leggibile
-                  numeri_candidati = output__elenco_numero_ammissibili__["numeri_candidati"]            
-
-                  # Salvare il set numeri ammissibili per la cella in considerazione.
-                  self.numeri_ammissibili_cella[(riga,colonna)] = numeri_candidati
-               
-                  # Adesso che si hanno i numeri candidati per la posizione (riga,colonna) se c'è un solo candidato
-                  # ovvero len(set) == 1 inserire in quella posizione quel numero.
-                  if len(numeri_candidati) == 1:
-                     soluzione = numeri_candidati.pop() # Estrarre il numero che rappresenta la soluzione
-                     
-                     # Assegnare la soluzione nel dizionario che tiene traccia delle soluzioni
-                     self.numeri_aggiunti += 1
-                     self.mappatura_numeri_aggiunti[self.numeri_aggiunti] = {"cella":(riga,colonna),
-                                                                             "soluzione":soluzione}
-                     
-                     # Assegnare la soluzione 
-                     self.sudoku[riga,colonna] = soluzione # Estrarre l'elemento 
-                     soluzione_trovata_in_questa_iterazione = True # Aggiornare questo parametro in modo da fare un nuovo loop visto che una soluzione è stata trovata.  
-
-         # endregion      
-      
-         # Se non ci sono zeri nel sudoku significa che è stato risolto quindi fermare il loop.
-         if 0 not in self.sudoku.flatten():
-            self.solved = True      
-            break   
-         
-
-         # Se in un'intera iterazione nessuan soluzione è stata trovata il risolutore è bloccato, perciò fermare il loop.         
-         if soluzione_trovata_in_questa_iterazione == False:
-            break 
+      # Se non ci sono celle vuote il sudoku è stato risolto.
+      if self.celle_vuote == 0:
+         self.solved = True      
+
+   def __inserimento_ammissibile__(self,
+                                   cella : tuple,
+                                   numero : int) -> bool:
+      """Controlla che la cella sia ancora vuota e che il numero sia ancora tra i suoi candidati.
+         I solver per quadrante, riga e colonna lavorano su elenchi di candidati calcolati prima degli inserimenti
+         fatti durante la stessa passata, questo controllo evita di inserire numeri ormai non più validi.
+      """
+      riga, colonna = cella
+      return self.sudoku[riga,colonna] == 0 and bool(self.__maschera_candidati__(riga,colonna) & (1 << (numero-1)))
 
    def __solver_per_quadrante__(self):
       """Questa funzione controlla  riga colonna e quadrante, se in tutte le altre celle del quadrante quel numero non può essere assegnato metterlo nell'unico posto possibile."""
@@ -518,15 +1144,11 @@ class sudoku:
          # Scorrere per tutte le possibili soluzioni per ogni numero
          for numero,lista_possibili_posizioni in numeri_posizioni.items():
             # Se un numero ha una sola possibile soluzione assegnarla.
-            if len(lista_possibili_posizioni) == 1:
-            
-               self.sudoku[lista_possibili_posizioni[0]] = numero
-               self.numeri_aggiunti += 1
-               self.mappatura_numeri_aggiunti[self.numeri_aggiunti] = {"cella":(lista_possibili_posizioni[0]),
-                                                                       "soluzione":numero}
+            if len(lista_possibili_posizioni) == 1 and self.__inserimento_ammissibile__(lista_possibili_posizioni[0],numero):
+               self.__assegna_numero__(lista_possibili_posizioni[0],numero)
          
-         # Se non ci sono zeri nel sudoku significa che è stato risolto quindi fermare il loop.
-         if 0 not in self.sudoku.flatten():
+         # Se non ci sono celle vuote significa che è stato risolto quindi fermare il loop.
+         if self.celle_vuote == 0:
             self.solved = True
             break    
          
@@ -542,14 +1164,11 @@ class sudoku:
             # Scorrere per tutte le possibili soluzioni per ogni numero
             for numero,lista_possibili_posizioni in numeri_posizioni.items():
                # Se un numero ha una sola possibile soluzione assegnarla.
-               if len(lista_possibili_posizioni) == 1:
-                  self.sudoku[lista_possibili_posizioni[0]] = numero
-                  self.numeri_aggiunti += 1
-                  self.mappatura_numeri_aggiunti[self.numeri_aggiunti] = {"cella":(lista_possibili_posizioni[0]),
-                                                                          "soluzione":numero}
-
-               # Se non ci sono zeri nel sudoku significa che è stato risolto quindi fermare il loop.
-               if 0 not in self.sudoku.flatten():
+               if len(lista_possibili_posizioni) == 1 and self.__inserimento_ammissibile__(lista_possibili_posizioni[0],numero):
+                  self.__assegna_numero__(lista_possibili_posizioni[0],numero)
+
+               # Se non ci sono celle vuote significa che è stato risolto.
+               if self.celle_vuote == 0:
                   self.solved = True
 
    def __solver_per_colonna__(self):
@@ -564,155 +1183,605 @@ class sudoku:
             # Scorrere per tutte le possibili soluzioni per ogni numero
             for numero,lista_possibili_posizioni in numeri_posizioni.items():
                # Se un numero ha una sola possibile soluzione assegnarla.
-               if len(lista_possibili_posizioni) == 1:
-                  self.sudoku[lista_possibili_posizioni[0]] = numero
-                  self.numeri_aggiunti += 1
-                  self.mappatura_numeri_aggiunti[self.numeri_aggiunti] = {"cella":(lista_possibili_posizioni[0]),
-                                                                          "soluzione":numero}
-
-               # Se non ci sono zeri nel sudoku significa che è stato risolto quindi fermare il loop.
-               if 0 not in self.sudoku.flatten():
+               if len(lista_possibili_posizioni) == 1 and self.__inserimento_ammissibile__(lista_possibili_posizioni[0],numero):
+                  self.__assegna_numero__(lista_possibili_posizioni[0],numero)
+
+               # Se non ci sono celle vuote significa che è stato risolto.
+               if self.celle_vuote == 0:
                   self.solved = True
 
-   def __share_unit__(self,a, b):
-      """Funzione di supporto per le funzioni:
-         - __xy_wing__
-         - __x_wing__
+   #---------------------------------------------------------------------------------#
+   # region PIPELINE DELLE TECNICHE
+   def __prepara_pipeline__(self):
+      """Prepara lo stato del pipeline delle tecniche (vedi '__pipeline_tecniche__'):
+            - 'candidati_celle': maschera di bit dei candidati di ogni cella (indice riga*9 + colonna), 0 per le celle piene;
+            - 'coda_singoli': celle con un solo candidato da completare;
+            - '__modifiche__': contatore di inserimenti ed esclusioni, per sapere se una regola ha fatto progressi;
+            - '__modifiche_unita__': per ogni unità (indice di UNITA) il valore di '__modifiche__' all'ultimo cambiamento
+              dei suoi candidati, all'inizio tutte cambiate;
+            - '__ultima_esecuzione__': per ogni regola il valore di '__modifiche__' alla sua ultima esecuzione, le unità
+              cambiate dopo sono quelle da ricontrollare;
+            - 'posizioni_numeri': per ogni numero e per ogni unità la maschera delle posizioni (0-8, vedi POSIZIONE_IN_UNITA)
+              in cui il numero è candidato, usata da sottoinsiemi nascosti e fish;
+            - 'celle_numeri': per ogni numero l'insieme di bit (81 bit) delle celle in cui è candidato, usato da XY-Wing.
+         Gli indici vengono aggiornati ad ogni candidato tolto (vedi '__togli_indici__').
       """
-      (r1, c1), (r2, c2) = a, b
-      return r1 == r2 or c1 == c2 or (r1 // 3, c1 // 3) == (r2 // 3, c2 // 3)
-
-   def __xy_wing__(self):
-      """Algoritmo di risuluzione XY-WING implementato da chatGPT"""
-      candidates = self.numeri_ammissibili_cella.copy()      
-      bivalue_cells = [cell for cell, vals in candidates.items() if len(vals) == 2]
-
-      for pivot in bivalue_cells:
-         x, y = list(candidates[pivot])
-         wings = []
-         for other in bivalue_cells:
-               if other == pivot:
+      self.candidati_celle = [0]*81
+      self.coda_singoli = []
+      self.__contraddizione__ = False
+      self.__modifiche__ = 1
+      for i, (riga, colonna, _) in enumerate(CELLE):
+         if self.sudoku[riga,colonna] == 0:
+            maschera = self.__maschera_candidati__(riga,colonna)
+            self.candidati_celle[i] = maschera
+            if CONTEGGIO_BIT[maschera] <= 1:
+               self.coda_singoli.append((riga,colonna))
+      self.__modifiche_unita__ = [1]*27
+      self.__ultima_esecuzione__ = dict.fromkeys(REGOLE_PIPELINE, 0)
+
+      self.posizioni_numeri = [[0]*27 for _ in range(9)]
+      self.celle_numeri = [0]*9
+      for i, maschera in enumerate(self.candidati_celle):
+         for numero in NUMERI_DA_MASCHERA[maschera]:
+            posizioni = self.posizioni_numeri[numero-1]
+            for u, p in zip(UNITA_DI_CELLA[i], POSIZIONE_IN_UNITA[i]):
+               posizioni[u] |= 1 << p
+            self.celle_numeri[numero-1] |= 1 << i
+
+   def __togli_indici__(self,
+                        i : int,
+                        bits : int):
+      """Toglie la cella i dagli indici delle posizioni dei numeri in 'bits'."""
+      for numero in NUMERI_DA_MASCHERA[bits]:
+         posizioni = self.posizioni_numeri[numero-1]
+         for u, p in zip(UNITA_DI_CELLA[i], POSIZIONE_IN_UNITA[i]):
+            posizioni[u] &= ~(1 << p)
+         self.celle_numeri[numero-1] &= ~(1 << i)
+
+   def __segna_cella__(self,
+                       i : int):
+      """Segna come cambiate le tre unità della cella i."""
+      self.__modifiche__ += 1
+      modifiche_unita = self.__modifiche_unita__
+      for u in UNITA_DI_CELLA[i]:
+         modifiche_unita[u] = self.__modifiche__
+
+   def __togli_candidati__(self,
+                           i : int,
+                           bits : int,
+                           esclusione : bool = True):
+      """Toglie i numeri in 'bits' dai candidati della cella i.
+         Input:
+            - i (int) indice della cella;
+            - bits (int) maschera dei numeri da togliere, quelli che non sono candidati vengono ignorati;
+            - esclusione (bool, default True) se True i numeri vengono salvati anche in 'elenco_numero_NON_ammissibili',
+              così '__maschera_candidati__' resta coerente. False per i numeri già esclusi dalle maschere di unità.
+      """
+      bits &= self.candidati_celle[i]
+      if not bits:
+         return
+      maschera = self.candidati_celle[i] & ~bits
+      self.candidati_celle[i] = maschera
+      self.__togli_indici__(i, bits)
+      if esclusione:
+         self.elenco_numero_NON_ammissibili[COORDINATE[i]].update(NUMERI_DA_MASCHERA[bits])
+      self.__segna_cella__(i)
+      if maschera == 0:
+         self.__contraddizione__ = True
+      elif not maschera & (maschera - 1):
+         self.coda_singoli.append(COORDINATE[i])
+
+   def __inserisci__(self,
+                     i : int,
+                     numero : int):
+      """Inserisce un numero nella cella i (vedi '__assegna_numero__') e lo toglie dai candidati delle 20 celle vicine."""
+      bit = 1 << (numero-1)
+      self.__assegna_numero__(COORDINATE[i], numero)
+      self.__togli_indici__(i, self.candidati_celle[i])
+      self.candidati_celle[i] = 0
+      self.__segna_cella__(i)
+      for j in VICINI[i]:
+         if self.candidati_celle[j] & bit:
+            self.__togli_candidati__(j, bit, esclusione=False)
+
+   def __maschera_unita__(self,
+                          u : int) -> int:
+      """Maschera dei numeri già presenti nell'unità u (indice di UNITA)."""
+      if u < 9:
+         return self.maschere_righe[u]
+      if u < 18:
+         return self.maschere_colonne[u-9]
+      return self.maschere_quadranti[u-18]
+
+   def __singoli__(self):
+      """Completa le celle in 'coda_singoli' finché la coda non si svuota (naked singles)."""
+      candidati = self.candidati_celle
+      while self.coda_singoli and not self.__contraddizione__:
+         riga, colonna = self.coda_singoli.pop()
+         i = riga*9 + colonna
+         if self.sudoku[riga,colonna] != 0:
+            continue
+         maschera = candidati[i]
+         if maschera == 0:
+            self.__contraddizione__ = True
+         elif not maschera & (maschera - 1):
+            self.__inserisci__(i, NUMERI_DA_MASCHERA[maschera][0])
+
+   def __singoli_nascosti__(self,
+                            unita : list):
+      """Numeri con una sola posizione possibile nell'unità (hidden singles), solo sulle unità in 'unita'.
+         Un numero che non è né presente né candidato in un'unità indica una contraddizione.
+      """
+      candidati = self.candidati_celle
+      for u in unita:
+         una_volta, piu_volte = 0, 0
+         for i in UNITA[u]:
+            piu_volte |= una_volta & candidati[i]
+            una_volta |= candidati[i]
+         if (una_volta | self.__maschera_unita__(u)) != TUTTI_I_NUMERI:
+            self.__contraddizione__ = True
+            return
+         for numero in NUMERI_DA_MASCHERA[una_volta & ~piu_volte]:
+            bit = 1 << (numero-1)
+            for i in UNITA[u]:
+               if candidati[i] & bit:
+                  self.__inserisci__(i, numero)
+                  break
+
+   def __intersezioni__(self,
+                        unita : list):
+      """Intersezioni tra linee e quadranti, sui segmenti delle unità in 'unita':
+            - pointing: un numero che nel quadrante è possibile solo nel segmento viene tolto dal resto della riga (o colonna);
+            - box-line reduction: un numero che nella riga (o colonna) è possibile solo nel segmento viene tolto dal resto del quadrante.
+      """
+      candidati = self.candidati_celle
+      for s in {s for u in unita for s in SEGMENTI_UNITA[u]}:
+         _, _, resto_linea, resto_quadrante = INTERSEZIONI[s]
+         nel_segmento = 0
+         for i in SEGMENTI[s]:
+            nel_segmento |= candidati[i]
+         if not nel_segmento:
+            continue
+         fuori_linea, fuori_quadrante = 0, 0
+         for i in resto_linea:
+            fuori_linea |= candidati[i]
+         for i in resto_quadrante:
+            fuori_quadrante |= candidati[i]
+         for bits, resto in ((nel_segmento & ~fuori_quadrante & fuori_linea, resto_linea),
+                             (nel_segmento & ~fuori_linea & fuori_quadrante, resto_quadrante)):
+            if bits:
+               for i in resto:
+                  self.__togli_candidati__(i, bits)
+
+   def __sottoinsiemi_nudi__(self,
+                             unita : list,
+                             k : int):
+      """Naked subsets: k celle di un'unità con in tutto k candidati, che vengono tolti dalle altre celle dell'unità.
+         Input:
+            - unita (list) unità da controllare;
+            - k (int) 2 per le coppie, 3 per le triple.
+      """
+      candidati = self.candidati_celle
+      for u in unita:
+         celle = [i for i in UNITA[u] if 2 <= CONTEGGIO_BIT[candidati[i]] <= k]
+         for gruppo in itertools.combinations(celle, k):
+            unione = 0
+            for i in gruppo:
+               unione |= candidati[i]
+            if CONTEGGIO_BIT[unione] == k:
+               for i in UNITA[u]:
+                  if i not in gruppo:
+                     self.__togli_candidati__(i, unione)
+
+   def __sottoinsiemi_nascosti__(self,
+                                 unita : list,
+                                 k : int):
+      """Hidden subsets: k numeri possibili in tutto solo in k celle di un'unità, da quelle celle vengono tolti gli altri candidati.
+         Input:
+            - unita (list) unità da controllare;
+            - k (int) 2 per le coppie, 3 per le triple.
+      """
+      for u in unita:
+         celle = UNITA[u]
+         numeri = [numero for numero in range(1,10) if 2 <= CONTEGGIO_BIT[self.posizioni_numeri[numero-1][u]] <= k]
+         for gruppo in itertools.combinations(numeri, k):
+            unione, bits = 0, 0
+            for numero in gruppo:
+               unione |= self.posizioni_numeri[numero-1][u]
+               bits |= 1 << (numero-1)
+            if CONTEGGIO_BIT[unione] == k:
+               for p in NUMERI_DA_MASCHERA[unione]:
+                  self.__togli_candidati__(celle[p-1], ~bits & TUTTI_I_NUMERI)
+
+   def __pesce__(self,
+                 k : int):
+      """Fish di dimensione k (X-Wing k=2, Swordfish k=3, Jellyfish k=4) con gli indici delle posizioni di ogni numero.
+         Se in k righe un numero è possibile solo in k colonne in tutto, il numero viene tolto dalle altre celle di quelle
+         colonne (e viceversa scambiando righe e colonne). Le righe (o colonne) di base e le colonne coperte sono maschere di bit.
+         Input:
+            - k (int) numero di righe (o colonne) di base.
+      """
+      for numero in range(1,10):
+         posizioni = self.posizioni_numeri[numero-1]
+         for base, copertura in ((0, 9), (9, 0)): # Righe di base e colonne coperte, poi il contrario
+            linee = [u for u in range(9) if 2 <= CONTEGGIO_BIT[posizioni[base + u]] <= k]
+            for gruppo in itertools.combinations(linee, k):
+               coperte, maschera_base = 0, 0
+               for u in gruppo:
+                  coperte |= posizioni[base + u]
+                  maschera_base |= 1 << u
+               if CONTEGGIO_BIT[coperte] != k:
                   continue
-               if self.__share_unit__(pivot, other):
-                  vals = candidates[other]
-                  if x in vals or y in vals:
-                     wings.append(other)
-
-         for i in range(len(wings)):
-               for j in range(i + 1, len(wings)):
-                  w1, w2 = wings[i], wings[j]
-                  v1, v2 = candidates[w1], candidates[w2]
-                  common = (v1 | v2) - {x, y}
-                  if len(common) == 1:
-                     z = next(iter(common))
-                     if ({x, z} == v1 and {y, z} == v2) or ({y, z} == v1 and {x, z} == v2):
-                           for cell in candidates:
-                              if cell not in (pivot, w1, w2):
-                                 if self.__share_unit__(cell, w1) and self.__share_unit__(cell, w2):
-                                       if z in candidates[cell]:
-                                          self.elenco_numero_NON_ammissibili[cell].add(z)
-                                          #print("__xy_wing__",cell,z)
-  
+               for v in NUMERI_DA_MASCHERA[coperte]:
+                  # Posizioni del numero nella linea coperta fuori dalle linee di base
+                  for w in NUMERI_DA_MASCHERA[posizioni[copertura + v-1] & ~maschera_base]:
+                     riga, colonna = (w-1, v-1) if base == 0 else (v-1, w-1)
+                     self.__togli_candidati__(riga*9 + colonna, 1 << (numero-1))
+
    def __x_wing__(self):
-      """Algoritmo di risuluzione X-WING implementato da chatGPT"""
-      candidates = self.numeri_ammissibili_cella.copy()  
-      
-      # Controlla per righe
-      for digit in range(1, 10):
-         rows_with_digit = defaultdict(list)
-         for (r, c), vals in candidates.items():
-            if digit in vals:
-                  rows_with_digit[r].append(c)
-
-         # Cerca due righe con lo stesso set di 2 colonne
-         for r1 in rows_with_digit:
-            if len(rows_with_digit[r1]) == 2:
-                  for r2 in rows_with_digit:
-                     if r2 <= r1:
-                        continue
-                     if rows_with_digit[r2] == rows_with_digit[r1]:
-                        c1, c2 = rows_with_digit[r1]
-                        
-                        # Elimina digit da altre celle nelle stesse colonne
-                        for r in range(9):
-                              if r not in (r1, r2):
-                                 for c in (c1, c2):
-                                    if digit in candidates.get((r, c), set()):
-                                          self.elenco_numero_NON_ammissibili[(r, c)].add(digit)
-                                          #print("__x_wing__",(r, c),digit)
-
-      # Controlla per colonne
-      for digit in range(1, 10):
-         cols_with_digit = defaultdict(list)
-         for (r, c), vals in candidates.items():
-            if digit in vals:
-                  cols_with_digit[c].append(r)
-
-         # Cerca due colonne con lo stesso set di 2 righe
-         for c1 in cols_with_digit:
-            if len(cols_with_digit[c1]) == 2:
-                  for c2 in cols_with_digit:
-                     if c2 <= c1:
-                        continue
-                     if cols_with_digit[c2] == cols_with_digit[c1]:
-                        r1, r2 = cols_with_digit[c1]
-                        
-                        # Elimina digit da altre celle nelle stesse righe
-                        for c in range(9):
-                              if c not in (c1, c2):
-                                 for r in (r1, r2):
-                                    if digit in candidates.get((r, c), set()):
-                                          self.elenco_numero_NON_ammissibili[(r, c)].add(digit)
-                                          #print("__x_wing__",(r, c),digit)
-
-   def __backtracking_valide__(self,
-                               idx=0,
-                               scelta_corrente=None,
-                               usati_primo=None, 
-                               usati_secondo=None):
-      if scelta_corrente is None:
-         scelta_corrente = {}
-      if usati_primo is None:
-         usati_primo = {}
-      if usati_secondo is None:
-         usati_secondo = {}
-         
-      if idx == len(self.chiavi):
-         return [scelta_corrente.copy()]
-      
-      tutte_soluzioni = []
-      chiave = self.chiavi[idx]
-      primo, secondo = chiave
-      
-      for v in self.dizionario[chiave]:
-         if v not in usati_primo.get(primo, set()) and v not in usati_secondo.get(secondo, set()):
-               usati_primo.setdefault(primo, set()).add(v)
-               usati_secondo.setdefault(secondo, set()).add(v)
-               scelta_corrente[chiave] = v
-               
-               tutte_soluzioni.extend(self.__backtracking_valide__(idx + 1, scelta_corrente, usati_primo, usati_secondo))
-               
-               usati_primo[primo].remove(v)
-               usati_secondo[secondo].remove(v)
-               del scelta_corrente[chiave]
-      return tutte_soluzioni
+      """X-Wing, fish di dimensione 2 (vedi '__pesce__')."""
+      self.__pesce__(2)
 
-   def solve(self,
-             verbose : bool = False
-             ):
-      """ 
-         Funzione  per risolvere  sudoku, è basata su metodi basici di controllo di riga,colonna e quadrante.
-         Per i sudoku più difficile viene utilizzato un algoritmo di risoluzione basato sul backtracking.
+   def __xy_wing__(self):
+      """XY-Wing: una cella pivot con candidati {x,y} vede due celle (wing) con candidati {x,z} e {y,z},
+         z viene tolto dalle celle che vedono entrambe le wing. Celle bivalore e vicini sono insiemi di bit a 81 bit,
+         le celle che vedono entrambe le wing sono lette da VICINI_COMUNI.
+      """
+      candidati = self.candidati_celle
+      bivalore = 0
+      for i in range(81):
+         if CONTEGGIO_BIT[candidati[i]] == 2:
+            bivalore |= 1 << i
+
+      for pivot in __indici_bit__(bivalore):
+         # Le esclusioni fatte durante la passata possono lasciare una cella bivalore con un solo candidato
+         maschera_pivot = candidati[pivot]
+         if CONTEGGIO_BIT[maschera_pivot] != 2:
+            continue
+         # Wing per numero z: celle vicine bivalore con uno solo dei candidati del pivot, divise per numero condiviso
+         wing = defaultdict(list)
+         for w in __indici_bit__(bivalore & VICINI_BIT[pivot]):
+            maschera = candidati[w]
+            condiviso = maschera & maschera_pivot
+            if CONTEGGIO_BIT[maschera] == 2 and condiviso and maschera != maschera_pivot:
+               wing[maschera & ~maschera_pivot].append((condiviso, w))
+         for z, celle in wing.items():
+            for (condiviso1, w1), (condiviso2, w2) in itertools.combinations(celle, 2):
+               if condiviso1 != condiviso2:
+                  for i in __indici_bit__(self.celle_numeri[NUMERI_DA_MASCHERA[z][0]-1] & VICINI_COMUNI[w1][w2]):
+                     self.__togli_candidati__(i, z)
+
+   def __pipeline_tecniche__(self):
+      """Tecniche di risoluzione di 'solve(engine="tecniche")' con uno scheduler delle regole.
+         Le regole (REGOLE_PIPELINE) sono ordinate dalla meno costosa: singoli nascosti, intersezioni (pointing e
+         box-line reduction), coppie e triple nude e nascoste, X-Wing, XY-Wing, Swordfish e Jellyfish. Prima di ogni regola vengono completati
+         i singoli in coda. Ogni regola lavora solo sulle unità i cui candidati sono cambiati dalla sua ultima esecuzione
+         e, appena una regola fa progressi, si riparte dalla meno costosa. Il ciclo si ferma a schema completo, quando
+         nessuna regola ha più unità da controllare oppure quando i candidati sono in contraddizione.
+         Ogni passo passa da '__esegui_tecnica__' (profilo e budget).
+      """
+      self.__prepara_pipeline__()
+      regole = {"singoli_nascosti": self.__singoli_nascosti__,
+                "intersezioni": self.__intersezioni__,
+                "coppie_nude": lambda unita: self.__sottoinsiemi_nudi__(unita, 2),
+                "coppie_nascoste": lambda unita: self.__sottoinsiemi_nascosti__(unita, 2),
+                "triple_nude": lambda unita: self.__sottoinsiemi_nudi__(unita, 3),
+                "triple_nascoste": lambda unita: self.__sottoinsiemi_nascosti__(unita, 3),
+                "x_wing": lambda unita: self.__x_wing__(),
+                "xy_wing": lambda unita: self.__xy_wing__(),
+                "swordfish": lambda unita: self.__pesce__(3),
+                "jellyfish": lambda unita: self.__pesce__(4)}
+
+      while self.celle_vuote > 0 and not self.__contraddizione__:
+         if self.profilo is not None:
+            self.profilo["iterazioni"] += 1
+         if self.coda_singoli:
+            self.__esegui_tecnica__("singoli", self.__singoli__)
+            continue
+         for nome in REGOLE_PIPELINE:
+            ultima = self.__ultima_esecuzione__[nome]
+            unita = [u for u in range(27) if self.__modifiche_unita__[u] > ultima]
+            if not unita:
+               continue
+            modifiche = self.__ultima_esecuzione__[nome] = self.__modifiche__
+            self.__esegui_tecnica__(nome, functools.partial(regole[nome], unita))
+            if self.__modifiche__ != modifiche:
+               break
+         else:
+            break # Nessuna regola ha unità da controllare
+   # endregion
+
+   def __ricerca__(self) -> bool:
+      """Ricerca in profondità con propagazione (vedi '__cerca_soluzioni__'), sostituisce il vecchio backtracking
+         che elencava tutte le disposizioni. Si ferma alla prima soluzione trovata.
+         Le statistiche vengono salvate in 'self.statistiche_ricerca'.
+         Output:
+            - True se è stata trovata una soluzione (inserita in 'self.sudoku'), False altrimenti.
+         Se il budget di 'solve' finisce solleva 'BudgetEsaurito', lasciando in 'self.sudoku' lo stato più completo raggiunto.
+      """
+      griglia = [int(numero) for numero in self.sudoku.flatten()]
+      try:
+         trovate, soluzione, traccia = __cerca_soluzioni__(griglia, 1, self.statistiche_ricerca, self.__budget__)
+      except BudgetEsaurito as e:
+         # Budget finito: nello schema resta lo stato più completo raggiunto dalla ricerca
+         for i, numero in e.migliore:
+            self.__assegna_numero__(divmod(i,9), numero)
+         raise
+      if not trovate:
+         return False
+
+      # Riportare la soluzione trovata nello schema, mantenendo la mappatura dei numeri aggiunti
+      for i in traccia:
+         self.__assegna_numero__(divmod(i,9), soluzione[i])
+      return True
+
+   def __risolvi_box__(self,
+                       limiti : budget = None):
+      """Risoluzione degli schemi più grandi del 9x9 (box diverso da 3) con '__cerca_soluzioni_box__': le tecniche e
+         Dancing Links sono scritti per il 9x9, la ricerca con i candidati in maschere di bit funziona per ogni dimensione.
+         Aggiorna gli stessi attributi di 'solve' ('sudoku', 'solved', 'stato', 'mappatura_numeri_aggiunti', 'statistiche_ricerca', ...).
          Input:
-            - verbose (bool, default False) se True più output testuale;
-            - schema (list,np.array, default None) se None risolve il sudoku passato in input alla   
-                creazione della classe, altrimenti risolve il sudoku passato in input alla funzione.
-         """
-      
+            - limiti (budget, default None) limiti di tempo e nodi, allo scadere nello schema resta lo stato più completo raggiunto.
+      """
+      self.engine = "ricerca"
+      self.sudoku = self.original_schema.copy()
+      self.mappatura_numeri_aggiunti = {}
+      self.numeri_aggiunti = 0
+      self.statistiche_ricerca = {"attivazioni":1, "nodi":0, "backtrack":0, "profondita_massima":0}
+      self.profilo = None
+
+      griglia = [int(numero) for numero in self.sudoku.flatten()]
+      self.stato = None
+      try:
+         trovate, soluzione = __cerca_soluzioni_box__(griglia, self.box, 1, self.statistiche_ricerca, limiti)
+         inseriti = [(i, soluzione[i]) for i in range(len(griglia)) if griglia[i] == 0] if trovate else []
+      except BudgetEsaurito as e:
+         trovate, inseriti, self.stato = 0, e.migliore, e.motivo
+
+      # Mappatura dei numeri aggiunti riga per riga (la ricerca non ha un ordine di inserimento significativo)
+      for i, numero in inseriti:
+         self.numeri_aggiunti += 1
+         self.mappatura_numeri_aggiunti[self.numeri_aggiunti] = {"cella":divmod(i, self.n),
+                                                                 "soluzione":numero}
+         self.sudoku[divmod(i, self.n)] = numero
+
+      self.celle_vuote = int(np.count_nonzero(self.sudoku == 0))
+      self.solved = bool(trovate) and self.check(self.sudoku)
+      if self.stato is None:
+         self.stato = "risolto" if self.solved else "senza_soluzione"
+         self.schema_risolto = self.original_schema.tobytes()
+
+   def count_solutions(self,
+                       limit : int = 2,
+                       schema : Union[list, np.ndarray] = None) -> int:
+      """Conta le soluzioni dello schema fermandosi appena ne ha trovate 'limit'.
+         Usa la stessa ricerca in profondità con propagazione di 'solve(engine="ricerca")', senza modificare lo stato dell'istanza.
+         Input:
+            - limit (int, default 2) numero di soluzioni oltre il quale smettere di contare;
+            - schema ((list, np.ndarray), default None) schema da analizzare, se None quello passato all'inizializzazione.
+         Output:
+            - numero di soluzioni, al massimo 'limit' (0 anche se lo schema contiene numeri ripetuti).
+      """
+      if schema is None:
+         schema = self.original_schema
+      griglia = [int(numero) for numero in np.asarray(schema).flatten()]
+      if self.box != 3:
+         return __cerca_soluzioni_box__(griglia, self.box, limit)[0]
+      return __cerca_soluzioni__(griglia, limit)[0]
+
+   def is_unique(self,
+                 schema : Union[list, np.ndarray] = None) -> bool:
+      """True se lo schema ha una ed una sola soluzione ('count_solutions(limit=2) == 1')."""
+      return self.count_solutions(limit=2, schema=schema) == 1
+
+   def __dlx__(self) -> bool:
+      """Risoluzione come problema di exact cover con l'algoritmo X di Knuth implementato tramite Dancing Links.
+         Il sudoku è modellato con le 324 colonne standard (vincoli):
+            -   0- 80 ogni cella contiene un numero;
+            -  81-161 ogni riga contiene ogni numero;
+            - 162-242 ogni colonna contiene ogni numero;
+            - 243-323 ogni quadrante contiene ogni numero.
+         Ogni riga del problema è una coppia (cella, numero) e copre esattamente 4 vincoli.
+         I vincoli già soddisfatti dai numeri presenti nello schema non vengono creati, così come le coppie (cella, numero) non ammissibili.
+         Le liste doppiamente collegate sono salvate in liste python parallele (L, R, U, D, C) indicizzate per nodo, il nodo 0 è la radice.
+         Output:
+            - True se è stata trovata una soluzione (inserita in 'self.sudoku'), False altrimenti.
+      """
+      righe, colonne, quadranti = self.maschere_righe, self.maschere_colonne, self.maschere_quadranti
+      statistiche = self.statistiche_ricerca
+
+      # region Costruzione della matrice sparsa
+      L, R, U, D, C, S = [0], [0], [0], [0], [0], [0] # Sinistra, destra, sopra, sotto, intestazione di colonna, dimensione colonna
+      coppia_del_nodo = [None]                          # Per ogni nodo la coppia (cella, numero) che rappresenta
+
+      # Vincoli ancora da soddisfare
+      intestazioni = {}
+      for vincolo in range(324):
+         tipo, indice = divmod(vincolo, 81)
+         unita, cifra = divmod(indice, 9)
+         if tipo == 0:
+            soddisfatto = self.sudoku[divmod(indice,9)] != 0
+         elif tipo == 1:
+            soddisfatto = righe[unita] & (1 << cifra)
+         elif tipo == 2:
+            soddisfatto = colonne[unita] & (1 << cifra)
+         else:
+            soddisfatto = quadranti[unita] & (1 << cifra)
+         if soddisfatto:
+            continue
+
+         h = len(L)
+         L.append(h-1); R.append(0); U.append(h); D.append(h); C.append(h); S.append(0); coppia_del_nodo.append(None)
+         R[h-1] = h
+         L[0] = h
+         intestazioni[vincolo] = h
+
+      # Coppie (cella, numero) ammissibili
+      for i in range(81):
+         riga, colonna, quadrante = CELLE[i]
+         if self.sudoku[riga,colonna] != 0:
+            continue
+         maschera = TUTTI_I_NUMERI & ~(righe[riga] | colonne[colonna] | quadranti[quadrante])
+         for numero in NUMERI_DA_MASCHERA[maschera]:
+            cifra = numero-1
+            primo = None
+            for vincolo in (i, 81 + riga*9 + cifra, 162 + colonna*9 + cifra, 243 + quadrante*9 + cifra):
+               h = intestazioni[vincolo]
+               x = len(L)
+               # Inserire il nodo in fondo alla colonna
+               U.append(U[h]); D.append(h); C.append(h); coppia_del_nodo.append((i, numero))
+               D[U[h]] = x
+               U[h] = x
+               S[h] += 1
+               # Inserire il nodo nella riga
+               if primo is None:
+                  L.append(x); R.append(x)
+                  primo = x
+               else:
+                  L.append(L[primo]); R.append(primo)
+                  R[L[primo]] = x
+                  L[primo] = x
+      # endregion
+
+      def copri(c):
+         L[R[c]] = L[c]
+         R[L[c]] = R[c]
+         i = D[c]
+         while i != c:
+            j = R[i]
+            while j != i:
+               U[D[j]] = U[j]
+               D[U[j]] = D[j]
+               S[C[j]] -= 1
+               j = R[j]
+            i = D[i]
+
+      def scopri(c):
+         i = U[c]
+         while i != c:
+            j = L[i]
+            while j != i:
+               S[C[j]] += 1
+               U[D[j]] = j
+               D[U[j]] = j
+               j = L[j]
+            i = U[i]
+         L[R[c]] = c
+         R[L[c]] = c
+
+      soluzione = [] # Nodi scelti
+      migliore = []  # Nodi scelti nello stato più completo raggiunto, inseriti se il budget finisce
+      limiti = self.__budget__
+
+      def cerca(profondita):
+         if profondita > statistiche["profondita_massima"]:
+            statistiche["profondita_massima"] = profondita
+         if R[0] == 0: # Tutti i vincoli sono coperti
+            return True
+
+         # Scegliere la colonna con meno nodi
+         c = R[0]
+         colonna_scelta, minimo = c, S[c]
+         while c != 0 and minimo > 1:
+            if S[c] < minimo:
+               colonna_scelta, minimo = c, S[c]
+            c = R[c]
+         if minimo == 0:
+            return False
+
+         if limiti is not None and len(soluzione) > len(migliore):
+            migliore[:] = soluzione
+
+         copri(colonna_scelta)
+         r = D[colonna_scelta]
+         while r != colonna_scelta:
+            statistiche["nodi"] += 1
+            if limiti is not None:
+               limiti.nodo()
+            soluzione.append(r)
+            j = R[r]
+            while j != r:
+               copri(C[j])
+               j = R[j]
+            if cerca(profondita + 1):
+               return True
+            j = L[r]
+            while j != r:
+               scopri(C[j])
+               j = L[j]
+            soluzione.pop()
+            statistiche["backtrack"] += 1
+            r = D[r]
+         scopri(colonna_scelta)
+         return False
+
+      try:
+         trovata = cerca(0)
+      except BudgetEsaurito:
+         for nodo in migliore:
+            i, numero = coppia_del_nodo[nodo]
+            self.__assegna_numero__(divmod(i,9), numero)
+         raise
+      if not trovata:
+         return False
+
+      for nodo in soluzione:
+         i, numero = coppia_del_nodo[nodo]
+         self.__assegna_numero__(divmod(i,9), numero)
+      return True
+
+   def __conta_candidati__(self) -> int:
+      """Numero totale di candidati nelle celle vuote dello schema in risoluzione, usato dal profilo delle tecniche."""
+      totale = 0
+      for riga, colonna, _ in CELLE:
+         if self.sudoku[riga,colonna] == 0:
+            totale += CONTEGGIO_BIT[self.__maschera_candidati__(riga,colonna)]
+      return totale
+
+   def __esegui_tecnica__(self,
+                          nome : str,
+                          tecnica):
+      """Esegue una tecnica di risoluzione. Se il profilo è attivo ('solve(profile=True)') registra in 'self.profilo["tecniche"][nome]':
+            - chiamate: numero di chiamate;
+            - tempo: secondi cumulati;
+            - numeri_inseriti: numeri aggiunti allo schema;
+            - candidati_eliminati: candidati tolti dalle celle vuote (sia per inserimento di numeri che per esclusione).
+         Con il profilo disattivato il costo è quello di un solo controllo.
+         Input:
+            - nome (str) nome della tecnica nel profilo;
+            - tecnica (callable) metodo da eseguire.
+         Output:
+            - il valore restituito dalla tecnica.
+         Se 'solve' ha limiti di tempo il controllo viene fatto prima di ogni tecnica (vedi 'budget').
+      """
+      if self.__budget__ is not None:
+         self.__budget__.controlla()
+      if self.profilo is None:
+         return tecnica()
+
+      statistiche = self.profilo["tecniche"].setdefault(nome, {"chiamate":0, "tempo":0.0, "numeri_inseriti":0, "candidati_eliminati":0})
+      numeri_prima = self.numeri_aggiunti
+      candidati_prima = self.__conta_candidati__()
+
+      inizio = time.perf_counter()
+      risultato = tecnica()
+      statistiche["tempo"] += time.perf_counter() - inizio
+
+      statistiche["chiamate"] += 1
+      statistiche["numeri_inseriti"] += self.numeri_aggiunti - numeri_prima
+      statistiche["candidati_eliminati"] += candidati_prima - self.__conta_candidati__()
+      return risultato
+
+   def __inizializza_stato__(self,
+                             profile : bool = False):
+      """Prepara lo stato di risoluzione a partire dallo schema originale, usato da 'solve' e 'rate'."""
       # Copiare lo schema originale ed assegnarlo al nome sudoku 
       self.sudoku  = self.original_schema.copy()   # Al contrario del 'self.original schema', il 'self.sudoku'  
                                                    # verrà aggiornato con i numeri soluzione trovati dall'algoritmo di risoluzione.
 
+      # Maschere di bit dei numeri già presenti in ogni riga, colonna e quadrante.
+      self.__inizializza_maschere__()
+
       # Inizializzare il dizionario dei numeri non ammissibili, verrà aggiornato dalle funzioni X e XY WING
       # funzioni dedicate all'esclusione di numeri ammissibli.
       self.elenco_numero_NON_ammissibili = defaultdict(set)
@@ -723,80 +1792,567 @@ class sudoku:
       
        # Contatore per tenere traccia dei numeri aggiunti
       self.numeri_aggiunti = 0
-      
-      # Parametri per tenere sotto controllo il while loop
-      self.solved = False # Per bloccare il while loop una volta trovata la soluzione
-      iterazioni = 0      # Contatore i loop completi, utile per fermare l'algoritmo dopo tot iterazioni
-          
 
-      while not self.solved:
-         self.__basic_solver__()
-         self.__solver_per_quadrante__()
+      # Candidati di ogni cella vuota e coda delle celle con un solo candidato, vedi '__basic_solver__'.
+      self.numeri_ammissibili_cella = {}
+      self.coda_singoli = []
 
+      # Statistiche della ricerca in profondità, restano a zero se le tecniche bastano a risolvere il sudoku.
+      # 'attivazioni' indica se è stato necessario passare alla ricerca (anche senza tentativi).
+      self.statistiche_ricerca = {"attivazioni":0, "nodi":0, "backtrack":0, "profondita_massima":0}
 
-         self.__basic_solver__()
-         self.__elenco_numeri_ammissibili_riga_colonna__()
-         self.__solver_per_riga__()
+      # Profilo delle tecniche, None se disattivato.
+      self.profilo = {"iterazioni":0, "tempo_totale":0.0, "tecniche":{}} if profile else None
 
-         self.__basic_solver__()
-         self.__elenco_numeri_ammissibili_riga_colonna__()
-         self.__solver_per_colonna__()
-         
-         self.__xy_wing__()
-         self.__x_wing__()
-         
-         # Ad ogni iterazione nel caso peggiore va inserito un solo numero
-         # Perciò le iterazioni massime sono date dal numero massimo di numeri mancanti
-         if iterazioni > self.numeri_mancanti:
-            break 
-
-         iterazioni += 1 
-      # Se non ci sono zeri nel sudoku  e non ci sono errori significa che è stato risolto correttamente.
-      if (0 not in self.sudoku.flatten()) & (self.check(self.sudoku)):
-         self.solved = True
-          
-      else:
-         
-         # Risoluzione tramite il backtracking
-         self.dizionario = self.numeri_ammissibili_cella.copy()
-         self.chiavi = list(self.dizionario.keys())         
-         
-         # Disposizioni possibili tramite backtracking
-         disposizioni_valide = self.__backtracking_valide__()
-      
-         # Controllare quale disposizione ottenuta tramite backtracking sia corretta
-         for d in disposizioni_valide:
-            numeri_aggiunti_provvisori = 0 # Statistica solo per print, permette di aggiornare il numero di soluzione trovate.
-            schema = self.sudoku.copy()   
-            mappatura_numeri_aggiunti_provvisoria = {} # Per avere una mappatura provvisorio della probabile soluzione.
-            for index, numero in d.items():
-               schema[index] = numero          # Inserire nello schema provvisorio la probabile soluzione
-               numeri_aggiunti_provvisori += 1 # Aggiornare il contatore dei numeri provvisori inseriti
-               
-               # Per tenere conto della mappatura dei numeri anche se viene utilizzato il backtracking
-               mappatura_numeri_aggiunti_provvisoria[numeri_aggiunti_provvisori] = {"cella":index,
-                                                                                    "soluzione":numero}
-            if (0 not in schema.flatten()) & (self.check(schema=schema)):
-               self.solved = True
-               self.sudoku = schema.copy()
-               
-               # Aggiornare il conteggio dei numeri aggiunti. Vengono aggiunti i numeri identificati tramite backtracking
-               self.numeri_aggiunti += numeri_aggiunti_provvisori    
+      # Lo stato non corrisponde più ad una risoluzione completa dello schema originale (vedi '__risolvi_se_necessario__').
+      self.schema_risolto = None
+      self.stato = None
 
-               # Aggiungere al dizionario originale della mappatura_numeri_aggiunti i risultati ottenuti tramite backtracking
-               for chiave, elementi in mappatura_numeri_aggiunti_provvisoria.items():             
-                  self.mappatura_numeri_aggiunti[chiave] = elementi
-               break
+      # Limiti di tempo e nodi della risoluzione in corso (vedi 'solve'), None senza limiti.
+      self.__budget__ = None
+
+   def __carica_da_archivio__(self,
+                              archivio) -> bool:
+      """Legge dall'archivio il risultato dello schema originale, se presente.
+         Output:
+            - True se lo schema era in archivio ('self.sudoku', 'self.solved' e 'self.mappatura_numeri_aggiunti' aggiornati).
+      """
+      risultato = archivio.cerca(self.original_schema)
+      if risultato is None:
+         return False
+
+      self.sudoku = risultato["soluzione"]
+      self.solved = risultato["solved"]
+      self.mappatura_numeri_aggiunti = risultato["mappatura_numeri_aggiunti"]
+      self.numeri_aggiunti = len(self.mappatura_numeri_aggiunti)
+      self.celle_vuote = int(np.count_nonzero(self.sudoku == 0))
+      self.statistiche_ricerca = {"attivazioni":0, "nodi":0, "backtrack":0, "profondita_massima":0}
+      self.profilo = None
+      self.da_archivio = True
+      self.schema_risolto = self.original_schema.tobytes()
+      self.stato = "risolto" if self.solved else "senza_soluzione"
+      return True
+
+   def solve(self,
+             verbose : bool = False,
+             engine : str = "tecniche",
+             profile : bool = False,
+             archivio = None,
+             timeout : float = None,
+             max_nodes : int = None
+             ):
+      """ 
+         Funzione  per risolvere  sudoku, è basata su metodi basici di controllo di riga,colonna e quadrante.
+         Per i sudoku più difficile viene utilizzata una ricerca in profondità con propagazione (vedi '__ricerca__').
+         Input:
+            - verbose (bool, default False) se True più output testuale;
+            - engine (str, default "tecniche") metodo di risoluzione:
+                 - "tecniche": tecniche di risoluzione "umane" (vedi '__pipeline_tecniche__'), se non bastano si passa alla ricerca;
+                 - "ricerca": solo ricerca in profondità con propagazione;
+                 - "dlx": exact cover risolto con Dancing Links (vedi '__dlx__'), tempi che non dipendono dalle tecniche applicabili.
+                 Per gli schemi con box diverso da 3 viene sempre usata la ricerca (vedi '__risolvi_box__').
+            - profile (bool, default False) se True registra in 'self.profilo' il costo di ogni tecnica (vedi '__esegui_tecnica__')
+                 ed il numero di passi dello scheduler delle tecniche.
+            - archivio (archivio_soluzioni, default None) archivio persistente delle soluzioni (vedi store.py): se lo schema
+                 è già in archivio soluzione e mappatura dei numeri aggiunti vengono lette da lì senza risolvere,
+                 altrimenti il risultato viene salvato in archivio.
+            - timeout (float, default None) secondi massimi di risoluzione, controllati prima di ogni tecnica e durante la ricerca;
+            - max_nodes (int, default None) nodi massimi della ricerca in profondità (o di Dancing Links).
+         Le statistiche della ricerca (nodi visitati, backtrack, profondità massima) sono in 'self.statistiche_ricerca'.
+         L'esito è in 'self.stato':
+            - "risolto": schema risolto;
+            - "senza_soluzione": lo schema non ha soluzione (es. numeri iniziali in conflitto);
+            - "tempo_scaduto", "nodi_esauriti": il budget è finito, in 'self.sudoku' resta lo schema più completo raggiunto
+              (numeri dedotti dalle tecniche più gli ultimi tentativi della ricerca, senza conflitti tra loro).
+              I risultati parziali non vengono salvati in archivio e non vengono usati da 'suggest'.
+         """
+      if engine not in ("tecniche","ricerca","dlx"):
+         raise ValueError(f"Engine non riconosciuto: {engine}")
+      self.engine = engine
+      self.da_archivio = False
+      limiti = budget(timeout, max_nodes) if timeout is not None or max_nodes is not None else None
+
+      # Schemi più grandi del 9x9: solo ricerca (vedi '__risolvi_box__'), l'archivio codifica schemi 9x9
+      if self.box != 3:
+         if archivio is not None:
+            raise ValueError("L'archivio delle soluzioni supporta solo schemi 9x9")
+         self.__risolvi_box__(limiti)
+         if verbose:
+            print(f"Sudoku {'completato' if self.solved else 'non risolto'}. "
+                  f"Ricerca: {self.statistiche_ricerca['nodi']} nodi visitati, {self.statistiche_ricerca['backtrack']} backtrack.")
+            self.show(self.sudoku)
+         return
+
+      if archivio is not None and self.__carica_da_archivio__(archivio):
+         if verbose:
+            print(f"Sudoku letto dall'archivio. Numeri aggiunti: {self.numeri_aggiunti}.")
+            self.show(self.sudoku)
+         return
       
-                
+      # Stato iniziale della risoluzione: schema, maschere, candidati, mappatura, statistiche e profilo.
+      self.__inizializza_stato__(profile)
+      self.__budget__ = limiti
+      inizio = time.perf_counter()
+      
+      # Per bloccare il while loop una volta trovata la soluzione
+      self.solved = False
+      try:
+         self.__risolvi__(engine)
+      except BudgetEsaurito as e:
+         self.stato = e.motivo
+         self.solved = False
+      finally:
+         self.__budget__ = None
+      if self.stato is None:
+         self.stato = "risolto" if self.solved else "senza_soluzione"
+
+      if self.profilo is not None:
+         self.profilo["tempo_totale"] = time.perf_counter() - inizio
+
+      # I risultati parziali (budget finito) non vengono salvati e non valgono come risoluzione dello schema
+      if self.stato in ("risolto", "senza_soluzione"):
+         if archivio is not None:
+            archivio.salva(self)
+
+         # Schema a cui si riferiscono soluzione e mappatura dei numeri aggiunti, usato da 'suggest' e 'next_step'
+         self.schema_risolto = self.original_schema.tobytes()
 
       if verbose:
          if self.solved:
             print(f"Sudoku completato. Sono stati aggiunti {self.numeri_aggiunti} numeri.")      
+         elif self.stato in ("tempo_scaduto", "nodi_esauriti"):
+            print(f"Risoluzione interrotta ({self.stato.replace('_',' ')}). Numeri aggiunti finora: {self.numeri_aggiunti}.")
          else:
             print(f"Sudoku non risolto. Nonostante siano stati aggiunti {self.numeri_aggiunti} numeri.")
+         if self.statistiche_ricerca["nodi"] > 0:
+            print(f"Ricerca: {self.statistiche_ricerca['nodi']} nodi visitati, {self.statistiche_ricerca['backtrack']} backtrack.")
          self.show(self.sudoku)
+
+   def __risolvi__(self,
+                   engine : str):
+      """Pipeline delle tecniche (vedi '__pipeline_tecniche__') e ricerca finale di 'solve'. Con un budget attivo può sollevare 'BudgetEsaurito'."""
+      if engine == "tecniche":
+         self.__pipeline_tecniche__()
+
+      # Se non ci sono celle vuote e non ci sono errori significa che è stato risolto correttamente.
+      if self.celle_vuote == 0 and self.check(self.sudoku):
+         self.solved = True
+          
+      else:
+         self.solved = False
+
+         # Risoluzione tramite ricerca in profondità o Dancing Links, si ferma alla prima soluzione valida.
+         self.statistiche_ricerca["attivazioni"] += 1
+         if engine == "dlx":
+            trovata = self.__esegui_tecnica__("dlx", self.__dlx__)
+         else:
+            trovata = self.__esegui_tecnica__("ricerca", self.__ricerca__)
+         if trovata:
+            self.solved = self.check(self.sudoku)
    # endregion
+   #---------------------------------------------------------------------------------#
+   # RATE
+   # region RATE
+   def __riga__(self):
+      self.__elenco_numeri_ammissibili_riga_colonna__()
+      self.__solver_per_riga__()
+
+   def __colonna__(self):
+      self.__elenco_numeri_ammissibili_riga_colonna__()
+      self.__solver_per_colonna__()
+
+   def __wing_rate__(self,
+                     tecnica):
+      # X-Wing e XY-Wing lavorano sugli indici del pipeline, ricostruiti dai candidati attuali
+      self.__prepara_pipeline__()
+      tecnica()
+
+   def rate(self) -> dict:
+      """Valuta la difficoltà dello schema originale in base alla tecnica più difficile necessaria per risolverlo.
+         Le tecniche vengono provate dalla più semplice alla più difficile (vedi TECNICHE_DIFFICOLTA) e dopo ogni
+         progresso si riparte dalla più semplice, così ogni tecnica viene usata solo quando le precedenti non bastano:
+            - "singoli": celle con un solo candidato ('__basic_solver__');
+            - "quadrante", "riga", "colonna": numero con una sola posizione possibile nell'unità
+              ('__solver_per_quadrante__', '__solver_per_riga__', '__solver_per_colonna__');
+            - "x_wing", "xy_wing": esclusione di candidati ('__x_wing__', '__xy_wing__');
+            - "ricerca": ricerca in profondità quando nessuna tecnica fa progressi.
+         Al termine l'istanza resta nello stato di risoluzione come dopo 'solve(engine="tecniche")'.
+         Output:
+            - dizionario con chiavi:
+               - "tecnica" (str) tecnica più difficile usata;
+               - "punteggio" (float) peso della tecnica più difficile (TECNICHE_DIFFICOLTA) più la frazione delle celle
+                 vuote completate con tecniche diverse dai singoli, più log2(1 + nodi) se è servita la ricerca;
+               - "passi" (dict) numero di applicazioni con progressi di ogni tecnica;
+               - "celle_vuote" (int) celle vuote dello schema originale;
+               - "solved" (bool) se lo schema è stato risolto.
+      """
+      # Le tecniche lavorano sulle tabelle 9x9 (maschere, unità, wing): per gli schemi più grandi il punteggio non avrebbe senso
+      if self.box != 3:
+         raise ValueError("'rate' supporta solo schemi 9x9")
+      self.engine = "tecniche"
+      self.__inizializza_stato__()
+      self.solved = False
+
+      tecniche = {"singoli": self.__basic_solver__,
+                  "quadrante": self.__solver_per_quadrante__,
+                  "riga": self.__riga__,
+                  "colonna": self.__colonna__,
+                  "x_wing": lambda: self.__wing_rate__(self.__x_wing__),
+                  "xy_wing": lambda: self.__wing_rate__(self.__xy_wing__)}
+      passi = dict.fromkeys(TECNICHE_DIFFICOLTA, 0)
+      numeri_non_singoli = 0
+
+      while self.celle_vuote > 0:
+         for nome in tecniche:
+            numeri_prima, candidati_prima = self.numeri_aggiunti, self.__conta_candidati__()
+            tecniche[nome]()
+            if self.numeri_aggiunti > numeri_prima or self.__conta_candidati__() < candidati_prima:
+               passi[nome] += 1
+               if nome != "singoli":
+                  numeri_non_singoli += self.numeri_aggiunti - numeri_prima
+               break
+         else:
+            # Nessuna tecnica fa progressi: ricerca
+            passi["ricerca"] += 1
+            self.statistiche_ricerca["attivazioni"] += 1
+            self.__ricerca__()
+            break
+
+      self.solved = self.celle_vuote == 0 and self.check(self.sudoku)
+      tecnica = max((nome for nome in passi if passi[nome]), key=list(TECNICHE_DIFFICOLTA).index, default="singoli")
+      punteggio = TECNICHE_DIFFICOLTA[tecnica] + numeri_non_singoli / max(1, int(self.numeri_mancanti))
+      if tecnica == "ricerca":
+         punteggio += math.log2(1 + self.statistiche_ricerca["nodi"])
+      return {"tecnica": tecnica,
+              "punteggio": round(punteggio, 3),
+              "passi": passi,
+              "celle_vuote": int(self.numeri_mancanti),
+              "solved": bool(self.solved)}
+   # endregion
+#---------------------------------------------------------------------------------#
+# SCHEMA COMPATTO
+#---------------------------------------------------------------------------------#
+# region SCHEMA COMPATTO
+class schema_compatto:
+   """Rappresentazione compatta di un sudoku, pensata per tenere in memoria milioni di schemi in attesa in una coda di lavoro.
+      Lo schema è salvato in un oggetto bytes di 81 byte (una cella per byte, riga per riga, 0 per le celle vuote) ed è immutabile.
+      Non ci sono attributi oltre a quelli in '__slots__': tabelle di unità e vicini (CELLE, UNITA, VICINI, ...) sono
+      a livello di modulo, calcolate una sola volta all'import e condivise da tutti gli schemi.
+      Per risolverlo si crea l'istanza 'sudoku' solo quando serve ('to_sudoku').
+
+      Occupazione in memoria per schema (CPython 3.11, 64 bit, misurabile con 'schema_compatto.occupazione_memoria()'):
+         - schema_compatto: circa 170 byte (56 byte dell'oggetto con __slots__ + 114 byte del bytes);
+         - sudoku appena creato: circa 0.9 KB (dizionario degli attributi + np.array 9x9 di interi a 64 bit, prima che le tabelle
+           dei quadranti fossero condivise erano circa 4.8 KB), che diventano circa 20 KB dopo 'solve' per i dizionari dei candidati.
+   """
+   __slots__ = ("celle", "indice", "difficolta")
+
+   def __init__(self,
+                X : Union[list, np.ndarray, bytes, str],
+                indice = None,
+                difficolta : int = None):
+      """Input:
+            - X (list, np.ndarray, bytes, str) schema 9x9, oppure 81 byte, oppure stringa di 81 caratteri ('.' o '0' per le celle vuote);
+            - indice (default None) identificativo dello schema, es. 'indice' di Data/Sudoku.json;
+            - difficolta (int, default None) livello di difficoltà.
+      """
+      if isinstance(X, str):
+         X = X.replace(".", "0")
+         if len(X) != 81 or not X.isdigit():
+            raise TypeError("La stringa deve contenere 81 cifre")
+         celle = bytes(int(c) for c in X)
+      elif isinstance(X, (bytes, bytearray)):
+         celle = bytes(X)
+      else:
+         matrice = np.asarray(X)
+         if matrice.shape != (9,9):
+            raise TypeError("La matrice deve essere in formato 9x9")
+         celle = matrice.astype(np.uint8).tobytes()
+
+      if len(celle) != 81 or max(celle) > 9:
+         raise TypeError("Lo schema deve avere 81 celle con valori da 0 a 9")
+
+      self.celle = celle
+      self.indice = indice
+      self.difficolta = difficolta
+
+   def to_array(self) -> np.ndarray:
+      """Schema in formato np.array 9x9 (vista in sola lettura sui byte, senza copia)."""
+      return np.frombuffer(self.celle, dtype=np.uint8).reshape(9,9)
+
+   def to_sudoku(self) -> "sudoku":
+      """Crea l'istanza 'sudoku' corrispondente, pronta per 'solve'."""
+      return sudoku(self.to_array())
+
+   def celle_vuote(self) -> int:
+      """Numero di celle ancora da riempire."""
+      return self.celle.count(0)
+
+   def __str__(self) -> str:
+      return "".join(str(c) for c in self.celle)
+
+   def __repr__(self) -> str:
+      return f"schema_compatto('{self}', indice={self.indice!r}, difficolta={self.difficolta!r})"
+
+   def __eq__(self, altro) -> bool:
+      return isinstance(altro, schema_compatto) and self.celle == altro.celle
+
+   def __hash__(self) -> int:
+      return hash(self.celle)
+
+   @staticmethod
+   def occupazione_memoria(n : int = 100000) -> dict:
+      """Misura con tracemalloc la memoria occupata per schema da 'n' schemi compatti e da 'n' istanze 'sudoku' appena create.
+         Output:
+            - dizionario {"schema_compatto": byte per schema, "sudoku": byte per istanza}.
+      """
+      import tracemalloc
+      schema = np.zeros((9,9), dtype=np.int64)
+      risultati = {}
+      for nome, crea, numero in (("schema_compatto", lambda i: schema_compatto(bytes([i % 10]) + bytes(80)), n),
+                                 ("sudoku", lambda i: sudoku(schema), max(1, n // 10))):
+         tracemalloc.start()
+         inizio = tracemalloc.get_traced_memory()[0]
+         oggetti = [crea(i) for i in range(numero)]
+         risultati[nome] = (tracemalloc.get_traced_memory()[0] - inizio - sys.getsizeof(oggetti)) / numero
+         tracemalloc.stop()
+         del oggetti
+      return risultati
+# endregion
+#---------------------------------------------------------------------------------#
+# CONTROLLO IN BLOCCO
+#---------------------------------------------------------------------------------#
+# region CHECK MANY
+# Indici delle celle di ogni unità in formato numpy (27,9), per estrarre tutte le unità di un blocco di schemi in un colpo solo.
+UNITA_NP = np.array(UNITA)
+
+def __duplicati_per_unita__(griglie : np.ndarray,
+                            ignora_zeri : bool = False,
+                            unita_np : np.ndarray = UNITA_NP) -> np.ndarray:
+   """Per un blocco di schemi (N,9,9) restituisce una matrice booleana (N,27), True per ogni unità con un valore ripetuto.
+      Le unità seguono l'ordine di UNITA: righe 0-8, colonne 9-17, quadranti 18-26.
+      Ogni unità viene ordinata, così un valore ripetuto diventa una coppia di elementi adiacenti uguali.
+      Input:
+         - griglie (np.ndarray) blocco di schemi;
+         - ignora_zeri (bool, default False) se True le celle vuote ripetute non sono un errore;
+         - unita_np (np.ndarray, default UNITA_NP) unità degli schemi, per gli schemi più grandi 'tabelle_box(box)["unita_np"]'.
+   """
+   unita = np.sort(griglie.reshape(griglie.shape[0],-1)[:,unita_np], axis=2)  # (N,27,9)
+   uguali = unita[:,:,1:] == unita[:,:,:-1]
+   if ignora_zeri:
+      uguali &= unita[:,:,1:] != 0
+   return uguali.any(axis=2)
+
+def nome_unita(indice : int,
+               n : int = 9) -> str:
+   """Descrizione leggibile di un'unità dato il suo indice in UNITA (es. 0 -> "riga 1", 26 -> "quadrante 9").
+      Per gli schemi più grandi 'n' è il lato dello schema (unità come in 'tabelle_box')."""
+   tipo, numero = divmod(int(indice), n)
+   return f"{('riga','colonna','quadrante')[tipo]} {numero+1}"
+
+def check_many(grids : Union[list, np.ndarray],
+               return_units : bool = False,
+               box : int = 3):
+   """Controlla un blocco di schemi in una volta sola, con lo stesso criterio di 'sudoku.check':
+      uno schema è corretto se nessun valore è ripetuto in una riga, in una colonna o in un quadrante.
+      Input:
+         - grids ((list, np.ndarray)) schemi in formato (N,9,9), (N,16,16) con box=4, ecc.;
+         - return_units (bool, default False) se True restituisce anche la prima unità con errori di ogni schema;
+         - box (int, default 3) lato del quadrante (vedi 'tabelle_box').
+      Output:
+         - validi (np.ndarray) vettore booleano (N,), True per ogni schema corretto;
+         - unita (np.ndarray, solo se return_units) vettore (N,) con l'indice in UNITA della prima unità con errori
+           (righe 0-8, colonne 9-17, quadranti 18-26, vedi 'nome_unita'), -1 per gli schemi corretti.
+   """
+   griglie = np.asarray(grids)
+   n = box*box
+   if griglie.ndim != 3 or griglie.shape[1:] != (n,n):
+      raise TypeError(f"L'input deve essere un blocco di matrici in formato (N,{n},{n})")
+
+   errori = __duplicati_per_unita__(griglie, unita_np=UNITA_NP if box == 3 else tabelle_box(box)["unita_np"])
+   validi = ~errori.any(axis=1)
+   if not return_units:
+      return validi
+   return validi, np.where(validi, -1, errori.argmax(axis=1))
+
+# Istanze 'sudoku' degli schemi corretti di recente, con la soluzione di riferimento già calcolata (vedi 'grade_submissions').
+__SCHEMI_CORRETTI__ = OrderedDict()
+CAPACITA_SCHEMI_CORRETTI = 1024
+
+def grade_submissions(schema : Union[list, np.ndarray],
+                      consegne : Union[list, np.ndarray]) -> list:
+   """Corregge un blocco di consegne per uno schema (vedi 'sudoku.grade').
+      La soluzione di riferimento viene calcolata alla prima richiesta per lo schema e poi riutilizzata:
+      sono tenuti in memoria gli ultimi CAPACITA_SCHEMI_CORRETTI schemi, eliminando quello usato meno di recente.
+      Input:
+         - schema ((list, np.ndarray)) schema iniziale 9x9;
+         - consegne ((list, np.ndarray)) soluzioni consegnate in formato (N,9,9).
+      Output:
+         - lista dei risultati, uno per consegna.
+   """
+   schema = np.asarray(schema)
+   chiave = schema.astype(np.uint8).tobytes()
+   S = __SCHEMI_CORRETTI__.get(chiave)
+   if S is None:
+      S = sudoku(schema)
+      __SCHEMI_CORRETTI__[chiave] = S
+      if len(__SCHEMI_CORRETTI__) > CAPACITA_SCHEMI_CORRETTI:
+         __SCHEMI_CORRETTI__.popitem(last=False)
+   else:
+      __SCHEMI_CORRETTI__.move_to_end(chiave)
+   return S.grade(np.asarray(consegne).reshape(-1,9,9))
+# endregion
+#---------------------------------------------------------------------------------#
+# RISOLUZIONE IN BLOCCO
+#---------------------------------------------------------------------------------#
+# region SOLVE MANY
+# Tabelle numpy per lavorare sulle maschere di bit di interi blocchi di schemi.
+CONTEGGIO_BIT_NP = np.array(CONTEGGIO_BIT, dtype=np.int8)                                                           # maschera -> numero di candidati
+NUMERO_SINGOLO_NP = np.array([numeri[0] if len(numeri) == 1 else 0 for numeri in NUMERI_DA_MASCHERA], dtype=np.int8) # maschera con un solo bit -> numero
+
+def __maschere_unita__(griglie : np.ndarray):
+   """Per un blocco di schemi (N,9,9) restituisce le maschere di bit (N,9,9) dei numeri già presenti
+      nella riga, nella colonna e nel quadrante di ogni cella, calcolate con operazioni numpy su tutto il blocco.
+   """
+   n = griglie.shape[0]
+   griglie = griglie.astype(np.int16)
+   bit = np.where(griglie > 0, np.left_shift(1, np.maximum(griglie,1) - 1), 0).astype(np.int16)
+
+   righe = np.bitwise_or.reduce(bit, axis=2)                         # (N,9)
+   colonne = np.bitwise_or.reduce(bit, axis=1)                       # (N,9)
+   quadranti = np.bitwise_or.reduce(bit.reshape(n,3,3,3,3), axis=(2,4)) # (N,3,3)
+   quadranti = np.repeat(np.repeat(quadranti,3,axis=1),3,axis=2)     # Riportare ogni quadrante sulle sue 9 celle
+
+   return righe[:,:,None] | colonne[:,None,:] | quadranti
+
+def __duplicati__(griglie : np.ndarray) -> np.ndarray:
+   """Per un blocco di schemi (N,9,9) restituisce un vettore booleano (N,) True per gli schemi con numeri ripetuti in riga, colonna o quadrante.
+      Le celle vuote (zeri) non vengono considerate.
+   """
+   return __duplicati_per_unita__(griglie, ignora_zeri=True).any(axis=1)
+
+def solve_many(batch : Union[list, np.ndarray],
+               engine : str = "ricerca",
+               dimensione_blocco : int = 10000):
+   """Risolve un blocco di sudoku in una volta sola.
+      Numeri forzati (una sola possibilità nella cella) e numeri con una sola posizione in riga, colonna o quadrante vengono
+      inseriti su tutti gli schemi contemporaneamente tramite operazioni numpy sulle maschere di bit. Solo gli schemi che
+      restano incompleti passano alla risoluzione del singolo sudoku ('sudoku(schema).solve(engine=engine)').
+      Input:
+         - batch ((list, np.ndarray)) schemi in formato (N,9,9), zeri per le celle vuote;
+         - engine (str, default "ricerca") engine usato per gli schemi non completati dalla propagazione in blocco;
+         - dimensione_blocco (int, default 10000) numero massimo di schemi elaborati insieme, limita la memoria usata.
+      Output:
+         - risultati (np.ndarray) schemi (N,9,9) risolti. Gli schemi non risolvibili vengono restituiti come in input;
+         - risolti (np.ndarray) vettore booleano (N,), True per ogni schema risolto.
+   """
+   griglie = np.array(batch, dtype=np.int8)
+   if griglie.ndim != 3 or griglie.shape[1:] != (9,9):
+      raise TypeError("L'input deve essere un blocco di matrici in formato (N,9,9)")
+
+   risultati = griglie.copy()
+   risolti = np.zeros(griglie.shape[0], dtype=bool)
+
+   for inizio in range(0, griglie.shape[0], dimensione_blocco):
+      blocco = risultati[inizio:inizio+dimensione_blocco]   # Vista, le modifiche finiscono direttamente in 'risultati'
+      n = blocco.shape[0]
+      validi = ~__duplicati__(blocco)                       # Schemi senza contraddizioni
+      attivi = validi.copy()                                # Schemi ancora da propagare
+
+      while attivi.any():
+         griglie_attive = blocco[attivi]
+         vuote = griglie_attive == 0
+
+         # region Numeri candidati
+         candidati = np.where(vuote, TUTTI_I_NUMERI & ~__maschere_unita__(griglie_attive), 0)
+         conteggio = CONTEGGIO_BIT_NP[candidati]
+         contraddizione = (vuote & (conteggio == 0)).any(axis=(1,2))
+         # endregion
+
+         # region Numeri forzati (naked singles)
+         nuovi = NUMERO_SINGOLO_NP[candidati]
+         # endregion
+
+         # region Numeri con una sola posizione nell'unità (hidden singles)
+         m = griglie_attive.shape[0]
+         piani = ((candidati[...,None] >> np.arange(9)) & 1).astype(bool)    # (M,9,9,9) [schema, riga, colonna, numero-1]
+         unico_riga = piani.sum(axis=2, keepdims=True) == 1
+         unico_colonna = piani.sum(axis=1, keepdims=True) == 1
+         unico_quadrante = piani.reshape(m,3,3,3,3,9).sum(axis=(2,4), keepdims=True) == 1
+         unico_quadrante = np.broadcast_to(unico_quadrante, (m,3,3,3,3,9)).reshape(m,9,9,9)
+         nascosti = piani & (unico_riga | unico_colonna | unico_quadrante)
+         n_nascosti = nascosti.sum(axis=3)
+
+         # Due numeri diversi che devono stare nella stessa cella indicano una contraddizione
+         contraddizione |= (n_nascosti > 1).any(axis=(1,2))
+         nuovi = np.where((nuovi == 0) & (n_nascosti == 1), nascosti.argmax(axis=3) + 1, nuovi).astype(np.int8)
+         # endregion
+
+         # region Aggiornamento degli schemi
+         nuovi[contraddizione] = 0
+         griglie_attive = np.where(nuovi > 0, nuovi, griglie_attive)
+         contraddizione |= __duplicati__(griglie_attive)
+
+         indici = np.flatnonzero(attivi)
+         blocco[indici[~contraddizione]] = griglie_attive[~contraddizione]
+         validi[indici[contraddizione]] = False
+
+         # Restano attivi solo gli schemi a cui è stato aggiunto almeno un numero e che hanno ancora celle vuote
+         progresso = (nuovi > 0).any(axis=(1,2)) & ~contraddizione
+         attivi[indici] = progresso & (griglie_attive == 0).any(axis=(1,2))
+         # endregion
+
+      completi = validi & ~(blocco == 0).any(axis=(1,2))
+      risolti[inizio:inizio+n] = completi
+
+      # Schemi da completare singolarmente tramite ricerca
+      for i in np.flatnonzero(validi & ~completi):
+         schema = sudoku(blocco[i])
+         schema.solve(engine=engine)
+         if schema.solved:
+            blocco[i] = schema.sudoku
+            risolti[inizio+i] = True
+
+      # Schemi impossibili: restituire lo schema di partenza
+      impossibili = np.flatnonzero(~risolti[inizio:inizio+n])
+      blocco[impossibili] = griglie[inizio+impossibili]
+
+   return risultati, risolti
+# endregion
+#---------------------------------------------------------------------------------#
+# DIFFICOLTÀ IN BLOCCO
+#---------------------------------------------------------------------------------#
+# region RATE MANY
+def livello_stimato(valutazione : dict) -> int:
+   """Livello di difficoltà (1-5, scala di Data/Sudoku.json) stimato dall'output di 'sudoku.rate'.
+      Soglie tarate su Data/Sudoku.json (vedi 'benchmark.py --calibrazione'): le etichette assegnate a mano dipendono
+      soprattutto dal numero di celle vuote, le tecniche distinguono il livello 5 e separano i livelli intermedi.
+         - 5 se servono x_wing, xy_wing o ricerca, oppure se ci sono almeno 49 celle vuote;
+         - 1 se ci sono al massimo 44 celle vuote;
+         - altrimenti da 2 a 4 in base a celle vuote, tecnica più difficile e numero di passi per quadrante/riga/colonna.
+   """
+   celle_vuote, tecnica, passi = valutazione["celle_vuote"], valutazione["tecnica"], valutazione["passi"]
+   if TECNICHE_DIFFICOLTA[tecnica] >= TECNICHE_DIFFICOLTA["x_wing"] or celle_vuote >= 49:
+      return 5
+   if celle_vuote <= 44:
+      return 1
+   punteggio = (celle_vuote - 45) + (tecnica != "singoli") + (passi["quadrante"] + passi["riga"] + passi["colonna"] >= 2)
+   return 2 if punteggio <= 1 else 3 if punteggio <= 2 else 4
+
+def rate_many(batch : Union[list, np.ndarray]) -> list:
+   """Valuta la difficoltà di un blocco di schemi (vedi 'sudoku.rate'), es. per ordinare un flusso di sudoku per costo.
+      Input:
+         - batch ((list, np.ndarray)) schemi in formato (N,9,9).
+      Output:
+         - lista delle valutazioni, con in più la chiave "livello" (vedi 'livello_stimato').
+   """
+   valutazioni = []
+   for schema in np.asarray(batch):
+      valutazione = sudoku(schema).rate()
+      valutazione["livello"] = livello_stimato(valutazione)
+      valutazioni.append(valutazione)
+   return valutazioni
+# endregion
 #---------------------------------------------------------------------------------#
 # CREAZIONE INPUT PER TESTARE LE FUNZIONI DELLA CLASSE   
 #---------------------------------------------------------------------------------#